@@ -1,6 +1,11 @@
 # pages/0_Analysis_History.py
 import streamlit as st
-from utils.firebase_client import get_all_analyses
+from utils.repository import get_repository
+from utils.live_history import list_analyses, search_analyses, analysis_industries, history_version
+from utils.analytics_mirror import analytics_mirror_enabled, industry_summary
+from utils.report_store import set_session_report, clear_session_report, PRE_QA_BACKUP
+from utils.session_memory import track_session, track_fragment_run
+from utils.profiling import profile_page
 from datetime import datetime
 import time
 
@@ -10,24 +15,52 @@ if not st.session_state.get("authenticated", False):
     st.page_link("streamlit_app.py", label="Back to Login")
     st.stop()
 # --- End Auth Check ---
+track_session()
+profile_page()
 
 st.title("Analysis History")
 st.write("Load a previously completed analysis to review its reports.")
 
-analyses = get_all_analyses()
+# Seconds between checks for changes to the list; it is read from memory, not Firestore
+HISTORY_REFRESH_SECONDS = 5
+HISTORY_PAGE_SIZE = 25  # Tiles drawn at first, and added by each "Show more"
 
-if not analyses:
+if not list_analyses():
     st.info("No completed analyses found in the database. Run a new analysis to get started.")
     st.page_link("pages/2_Run_Analysis.py", label="Run New Analysis")
     st.stop()
 
 st.write("Click 'Load Report' to set a company as the active analysis, then use the sidebar to navigate its reports.")
+
+if analytics_mirror_enabled():
+    with st.expander("Completed analyses by industry"):
+        summary = industry_summary()
+        if summary is None:
+            st.caption("The portfolio figures are not available yet.")
+        else:
+            st.dataframe(summary, hide_index=True)
+
+# --- Search ---
+def reset_limit():
+    st.session_state.pop("history_limit", None)  # A new search starts from the first page
+
+search_col, industry_col, score_col = st.columns([3, 2, 1])
+query = search_col.text_input(
+    "Search", key="history_query", placeholder="Company, founder, competitor, industry, risk...", on_change=reset_limit
+)
+industries = industry_col.multiselect("Industry", analysis_industries(), key="history_industries", on_change=reset_limit)
+min_score = score_col.number_input("Min. avg score", 0.0, 5.0, 0.0, 0.5, key="history_min_score", on_change=reset_limit)
 st.divider()
 
-# "earliest at the bottom" means newest at the top, which the query already handles.
-for analysis in analyses:
+MATCHED_FIELD_LABELS = {
+    "company": "name", "founders": "founders", "competitors": "competitors",
+    "industries": "industry", "risks": "risks", "summaries": "summaries"
+}
+
+def history_tile(analysis: dict):
     company_name = analysis.get("company_analysed", "Unknown Company")
     company_id = analysis.get("company_id")
+    in_progress = analysis.get("analysis_status") == "Pending"
     
     # Parse date for cleaner display, handle potential errors
     try:
@@ -45,20 +78,27 @@ for analysis in analyses:
         col1, col2 = st.columns([3, 1])
         with col1:
             st.subheader(company_name)
-            st.caption(f"Last Analyzed: {display_date}")
+            if in_progress:
+                st.caption(f"Analysis in progress (started {display_date})")
+            else:
+                st.caption(f"Last Analyzed: {display_date}")
+            if analysis.get("matched_fields"):
+                matched = ", ".join(MATCHED_FIELD_LABELS[f] for f in analysis["matched_fields"])
+                st.caption(f"Matched in {matched}")
         with col2:
-            if st.button("Load Report", key=company_id, width='stretch', type="secondary"):
+            if st.button("Load Report", key=company_id, width='stretch', type="secondary", disabled=in_progress):
                 
-                analysis_report = analysis.get("analysis_report")
+                analysis_report = get_repository().get_current_report(company_id)
                 if not analysis_report:
                     st.error(f"Failed to load: No analysis data found for {company_name}.")
                     st.stop()
 
                 # --- This is the core logic ---
                 # 1. Load the data into session state
-                st.session_state['api_response'] = analysis_report
+                set_session_report(analysis_report)
                 st.session_state['analysis_complete'] = True
                 st.session_state['current_company_id'] = company_id
+                st.session_state.pop('report_traceparent', None)  # Renders of a loaded report start their own trace
 
                 qa_transcript = analysis_report.get("founder_qa_transcript", [])
                 st.session_state['chat_history'] = qa_transcript
@@ -68,9 +108,44 @@ for analysis in analyses:
                     del st.session_state['qa_questions_list']
                 if 'qa_current_index' in st.session_state:
                     del st.session_state['qa_current_index']
+                clear_session_report(PRE_QA_BACKUP)
+                st.session_state.pop('analysis_cached_at', None)
                 
                 st.success(f"Loaded report for {company_name}.")
                 time.sleep(1) # Give user a moment to see the success
                 
                 # 3. Navigate to the report page
-                st.switch_page("pages/3_First_Pass_Report.py")
\ No newline at end of file
+                st.switch_page("pages/3_First_Pass_Report.py")
+
+def show_more():
+    st.session_state["history_limit"] = st.session_state.get("history_limit", HISTORY_PAGE_SIZE) + HISTORY_PAGE_SIZE
+
+def history_tiles(analyses: list[dict]):
+    limit = st.session_state.get("history_limit", HISTORY_PAGE_SIZE)
+    for analysis in analyses[:limit]:
+        history_tile(analysis)
+    if len(analyses) > limit:
+        st.caption(f"Showing {limit} of {len(analyses)} analyses.")
+        st.button("Show more", on_click=show_more)
+
+@st.fragment(run_every=HISTORY_REFRESH_SECONDS)
+def redraw_when_changed(shown_version: tuple):
+    # Only a check: the list is redrawn (with the whole page) when the analyses change
+    track_fragment_run()  # Fragment reruns skip track_session
+    if history_version() != shown_version:
+        st.rerun()
+
+shown_version = history_version()  # Read first, so changes made while drawing trigger a redraw
+if query or industries or min_score:
+    results = search_analyses(query, industries=industries, min_score=min_score or None)
+    if results is None:
+        st.warning("Search is unavailable while the history reconnects to the database. Showing all analyses.")
+        history_tiles(list_analyses())
+    else:
+        if not results:
+            st.info("No analyses match your search.")
+        history_tiles(results)
+else:
+    # "earliest at the bottom" means newest at the top, which the live view already handles.
+    history_tiles(list_analyses())
+redraw_when_changed(shown_version)
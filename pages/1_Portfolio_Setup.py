@@ -1,7 +1,9 @@
 import streamlit as st
 import pandas as pd
 import io
-from utils.firebase_client import update_fund_config
+from utils.repository import get_repository
+from utils.session_memory import track_session
+from utils.profiling import profile_page
 
 # --- Auth Check ---
 if not st.session_state.get("authenticated", False):
@@ -9,6 +11,8 @@ if not st.session_state.get("authenticated", False):
     st.page_link("streamlit_app.py", label="Back to Login")
     st.stop()
 # --- End Auth Check ---
+track_session()
+profile_page()
 
 # Define the score labels
 SCORE_LABELS = {
@@ -46,7 +50,7 @@ if st.session_state.new_industries_to_score:
         if submitted:
             # Update the main preferences dict
             st.session_state.industry_preferences.update(new_scores)
-            update_fund_config("industry_preferences", st.session_state.industry_preferences) # <-- ADD THIS
+            get_repository().update_fund_config("industry_preferences", st.session_state.industry_preferences) # <-- ADD THIS
             # Clear the "to-score" list
             st.session_state.new_industries_to_score = []
             st.success("New industry preferences saved!")
@@ -141,7 +145,7 @@ with st.form("portfolio_form"):
                 
                 new_portfolio_list = df.iloc[:, 0].dropna().astype(str).tolist()
                 st.session_state.portfolio_cos = list(set(new_portfolio_list)) # Remove duplicates
-                update_fund_config("portfolio_cos", st.session_state.portfolio_cos) # <-- ADD THIS
+                get_repository().update_fund_config("portfolio_cos", st.session_state.portfolio_cos) # <-- ADD THIS
                 st.success(f"Portfolio updated from file. Found {len(st.session_state.portfolio_cos)} companies.")
             
             except Exception as e:
@@ -150,7 +154,7 @@ with st.form("portfolio_form"):
         elif portfolio_list_text.strip():
             new_portfolio_list = [name.strip() for name in portfolio_list_text.split("\n") if name.strip()]
             st.session_state.portfolio_cos = list(set(new_portfolio_list)) # Remove duplicates
-            update_fund_config("portfolio_cos", st.session_state.portfolio_cos) # <-- ADD THIS
+            get_repository().update_fund_config("portfolio_cos", st.session_state.portfolio_cos) # <-- ADD THIS
             st.success(f"Portfolio updated from text. Found {len(st.session_state.portfolio_cos)} companies.")
         
         else:
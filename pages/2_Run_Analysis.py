@@ -1,15 +1,32 @@
 # pages/2_Run_Analysis.py
 import streamlit as st
-from utils.api_client import run_analysis_pipeline
-from utils.firebase_client import upload_company_and_docs
+from utils.api_client import run_analysis_pipeline, build_investing_thesis, use_cached_analysis
+from utils.repository import get_repository
+from utils.uploads import (
+    direct_uploads_available, direct_file_uploader, finalize_direct_uploads, reset_direct_uploader,
+    guess_pitch_deck, upload_in_background, await_direct_uploads
+)
+from utils.preprocessing import preprocess_documents, publish_artifacts, discard_preprocessing
+from utils.analysis_cache import document_hashes, analysis_cache_key
+from utils.report_store import clear_session_report, PRE_QA_BACKUP
+from utils.session_memory import track_session
+from utils.profiling import profile_page
+from utils.circuit_breaker import backend_status_banner
+from utils.jobs import cancelled_job_notice
+from utils.tracing import get_tracer
+from utils.metrics import count_cache_lookup
 import re
 
 if not st.session_state.get("authenticated", False):
     st.error("You must be logged in to view this page.")
     st.page_link("streamlit_app.py", label="Back to Login")
     st.stop()
+track_session()
+profile_page()
 
 st.title("Step 2: Run New Analysis")
+backend_status_banner()
+cancelled_job_notice()
 st.write("Upload your documents or provide public URLs (e.g., GCS, S3, Dropbox public link).")
 
 URL_REGEX = re.compile(
@@ -20,16 +37,50 @@ URL_REGEX = re.compile(
     r'(?::\d+)?'
     r'(?:/?|[/?]\S+)$', re.IGNORECASE)
 
+# A submission made while browser uploads are still running is replayed on
+# the next rerun, with the uploader told to stop reporting progress so it
+# can't interrupt the analysis with another rerun.
+resubmitted = st.session_state.pop("run_analysis_submit_requested", False)
+
 # --- STEP 1: FILE UPLOADER (OUTSIDE THE FORM) ---
 st.subheader("Document Uploads")
-# The 'key' will automatically store the files in st.session_state
-uploaded_files = st.file_uploader(
-    "Upload Documents (Pitch Decks, Financials, etc.)",
-    type=["pdf", "docx", "pptx"],
-    accept_multiple_files=True,
-    key='run_analysis_uploaded_files' # Persist the files in session state
-)
-st.caption("Files are processed when you click 'Run Full Analysis' below.")
+direct_upload = None
+uploaded_files = []
+if direct_uploads_available():
+    # Bytes go straight from the browser to Cloud Storage, never through this server
+    st.write("Upload Documents (Pitch Decks, Financials, etc.)")
+    direct_upload = direct_file_uploader(
+        key="run_analysis_direct_upload", quiet=resubmitted,
+        pitch_deck=st.session_state.get("run_analysis_pitch_deck")  # The choice below, from the last rerun
+    )
+    st.caption("Files upload to storage as soon as you pick them.")
+    for name, reason in direct_upload["rejected"].items():
+        st.error(f"**{name}:** {reason}")
+else:
+    # The 'key' will automatically store the files in st.session_state
+    uploaded_files = st.file_uploader(
+        "Upload Documents (Pitch Decks, Financials, etc.)",
+        type=["pdf", "docx", "pptx"],
+        accept_multiple_files=True,
+        key='run_analysis_uploaded_files' # Persist the files in session state
+    )
+    st.caption("Files are processed when you click 'Run Full Analysis' below.")
+
+# The analysis starts as soon as the pitch deck is in storage; the other
+# documents are added to the running job as they finish uploading.
+if direct_upload and direct_upload["files"]:
+    upload_names = [f["name"] for f in direct_upload["files"] if f["name"] not in direct_upload["rejected"]]
+else:
+    upload_names = [f.name for f in uploaded_files or []]
+pitch_deck_name = None
+if upload_names:
+    pitch_deck_name = st.selectbox(
+        "Which file is the pitch deck?",
+        upload_names,
+        index=guess_pitch_deck(upload_names),
+        key="run_analysis_pitch_deck",
+        help="The analysis starts as soon as this file is uploaded; the rest are added while it runs."
+    )
 
 
 # --- STEP 2: THE FORM (WITHOUT THE FILE UPLOADER) ---
@@ -47,13 +98,26 @@ with st.form("analysis_form"):
     
     founder_linkedin = st.text_input("Founder LinkedIn URLs (optional, comma-separated)")
 
+    preprocess_enabled = st.checkbox(
+        "Pre-process documents before submitting",
+        value=True,
+        help="Extracts text and slide outlines here and rejects oversized or corrupt files before the analysis job starts."
+    )
+
+    force_refresh = st.checkbox(
+        "Force a fresh analysis",
+        value=False,
+        help="By default, if these exact documents and settings were analysed before, that report is reused."
+    )
+
     submitted = st.form_submit_button("Run Full Analysis", type="primary")
 
 # --- STEP 3: SUBMISSION LOGIC (READS FROM SESSION STATE) ---
-if submitted:
+if submitted or resubmitted:
     # Read the files from session state using the key.
     # Use .get() for safety, defaulting to an empty list if the key doesn't exist yet.
-    files_from_state = st.session_state.get('run_analysis_uploaded_files', [])
+    files_from_state = st.session_state.get('run_analysis_uploaded_files', []) or []
+    has_direct_files = bool(direct_upload and direct_upload["files"])
     
     if not company_name:
         st.warning("Please enter a company name.")
@@ -62,44 +126,157 @@ if submitted:
     doc_urls = [url.strip() for url in doc_urls_text.split("\n") if url.strip()]
     
     # Check both the URL list AND the files from session state
-    if not doc_urls and not files_from_state:
+    if not doc_urls and not files_from_state and not has_direct_files:
         st.warning("Please enter at least one document URL or upload files.")
         st.stop()
 
+    if has_direct_files and direct_upload["failed"]:
+        st.error(f"These files failed to upload: {', '.join(direct_upload['failed'])}. Please pick them again.")
+        st.stop()
+    if has_direct_files and pitch_deck_name not in direct_upload["completed"]:
+        st.warning(f"Please wait for the pitch deck ({pitch_deck_name}) to finish uploading and try again.")
+        st.stop()
+
     # Validate URLs
     invalid_urls = [url for url in doc_urls if not URL_REGEX.match(url)]
     if invalid_urls:
         st.error(f"The following URLs appear to be invalid: {', '.join(invalid_urls)}")
         st.stop()
+
+    if has_direct_files and not direct_upload["done"] and not resubmitted:
+        st.session_state["run_analysis_submit_requested"] = True
+        st.rerun()
+
+    # Files that are in storage (or in memory) right now vs. still uploading
+    if has_direct_files:
+        ready_files = [f for f in direct_upload["files"] if f["name"] in direct_upload["completed"]]
+        in_flight_files = [f for f in direct_upload["files"] if f["name"] not in direct_upload["completed"]]
+    else:
+        deck_file = next((f for f in files_from_state if f.name == pitch_deck_name), None)
+        ready_files = [deck_file] if deck_file else []
+        in_flight_files = [f for f in files_from_state if f is not deck_file]
     
-    # --- Step 1: Upload files and create company ---
-    company_id = None
-    with st.status(f"Uploading files for {company_name}...", expanded=True) as upload_status:
-        try:
-            # Pass the files from session state to your uploader function
-            company_id, file_urls = upload_company_and_docs(company_name, files_from_state)
-            st.session_state['current_company_id'] = company_id
+    # --- Look for an identical earlier analysis ---
+    # Browser uploads still in flight can't be hashed yet, so those runs skip the cache.
+    cache_key = None
+    if not (has_direct_files and in_flight_files):
+        hashes = document_hashes(
+            direct_company_id=direct_upload["company_id"] if has_direct_files else None,
+            direct_files=ready_files if has_direct_files else [],
+            uploaded_files=files_from_state,
+            doc_urls=doc_urls
+        )
+        if hashes:
+            cache_key = analysis_cache_key(
+                company_name, hashes, build_investing_thesis(), st.session_state.get("portfolio_cos", [])
+            )
+    cached = None
+    if cache_key and not force_refresh:
+        cached = get_repository().get_cached_analysis(cache_key)
+        count_cache_lookup("analysis", cached is not None)
+    if cached:
+        st.info("These exact documents and settings were analysed before, so that report will be reused.")
+        preprocess_enabled = False
+
+    # --- Step 0 (optional): Pre-process documents locally ---
+    # Only the files uploaded before the job starts get artifacts; the backend
+    # parses the ones still uploading (in the browser or in the background) itself.
+    preprocessed = None
+    if preprocess_enabled:
+        with st.status("Pre-processing documents...", expanded=True) as preprocess_status:
+            preprocessed = preprocess_documents(
+                direct_company_id=direct_upload["company_id"] if has_direct_files else None,
+                direct_files=ready_files if has_direct_files else [],
+                uploaded_files=[] if has_direct_files else ready_files,
+                doc_urls=doc_urls
+            )
+            rejected = [r for r in preprocessed["results"] if "error" in r]
+            if rejected:
+                discard_preprocessing(preprocessed)
+                for r in rejected:
+                    st.error(f"**{r['file_name']}:** {r['error']}")
+                preprocess_status.update(label="Some documents were rejected. Please fix them and resubmit.", state="error")
+                st.stop()
+            preprocess_status.update(label="Documents pre-processed.", state="complete")
+
+    tracer = get_tracer()
+    # Ended however the run stops: done, st.stop on a failed upload, or a rerun
+    with tracer.span("analysis", company_name=company_name) as analysis_span:
+        if cached:
+            # The earlier analysis's company already has these documents: nothing to create or upload
+            if has_direct_files:
+                reset_direct_uploader("run_analysis_direct_upload")
+            with st.status(f"Loading the earlier analysis of {company_name}...", expanded=True) as status_ui:
+                company_id = use_cached_analysis(cached)
+                st.session_state['current_company_id'] = company_id
+                analysis_span.set_attribute("company_id", company_id)
+                success = True
+        else:
+            # --- Step 1: Create company and upload the pitch deck ---
+            company_id = None
+            pending_documents = []
+            with st.status(f"Uploading files for {company_name}...", expanded=True) as upload_status, \
+                    tracer.span("upload", parent=analysis_span) as upload_span:
+                try:
+                    if has_direct_files:
+                        # Files are already in storage under the reserved company ID
+                        company_id = get_repository().create_company(company_name, direct_upload["company_id"])
+                        file_urls = finalize_direct_uploads(company_id, ready_files)
+                        uploaded_names = [f["name"] for f in ready_files]
+                        pending_documents = await_direct_uploads(company_id, in_flight_files)
+                        reset_direct_uploader("run_analysis_direct_upload")
+                    else:
+                        company_id = get_repository().create_company(company_name)
+                        file_urls = [get_repository().upload_document(company_id, f) for f in ready_files]
+                        uploaded_names = [f.name for f in ready_files]
+                        pending_documents = upload_in_background(company_id, in_flight_files)
+                    st.session_state['current_company_id'] = company_id
+                    analysis_span.set_attribute("company_id", company_id)
+                    upload_span.set_attribute("company_id", company_id)
+                    upload_span.set_attribute("documents", len(ready_files) + len(in_flight_files) + len(doc_urls))
+
+                    document_artifacts = None
+                    if preprocessed:
+                        document_artifacts, slimmed_urls = publish_artifacts(
+                            company_id, preprocessed, dict(zip(uploaded_names, file_urls))
+                        )
+                        # Send the slimmer copies where image compression paid off
+                        doc_urls = [slimmed_urls.get(url, url) for url in doc_urls]
+                        file_urls = [slimmed_urls.get(url, url) for url in file_urls]
             
-            doc_urls.extend(file_urls) # Add uploaded file URLs to the list
-            doc_urls = list(set(doc_urls)) # De-duplicate
+                    # Uploaded files (pitch deck first) ahead of the URLs, de-duplicated
+                    doc_urls = list(dict.fromkeys(file_urls + doc_urls))
             
-            if not doc_urls:
-                 st.error("No valid document URLs found after processing. Please check inputs.")
-                 upload_status.update(label="File processing failed.", state="error")
-                 st.stop()
-
-            upload_status.update(label="File upload complete!", state="complete")
-        except Exception as e:
-            upload_status.update(label=f"File upload failed: {e}", state="error")
-            st.stop()
-
-    # --- Step 2: Run Analysis Pipeline ---
-    with st.status(f"Submitting analysis for {company_name}...", expanded=True) as status_ui:
-        # Pass the new company_id to the pipeline
-        success = run_analysis_pipeline(company_id, company_name, doc_urls)
+                    if not doc_urls:
+                         st.error("No valid document URLs found after processing. Please check inputs.")
+                         upload_status.update(label="File processing failed.", state="error")
+                         st.stop()
+
+                    if pending_documents:
+                        upload_status.update(label=f"Pitch deck ready! {len(pending_documents)} more file(s) still uploading.", state="complete")
+                    else:
+                        upload_status.update(label="File upload complete!", state="complete")
+                except Exception as e:
+                    if preprocessed:
+                        discard_preprocessing(preprocessed)
+                    upload_status.update(label=f"File upload failed: {e}", state="error")
+                    upload_span.set_error(str(e))
+                    analysis_span.set_error("Upload failed")
+                    st.stop()
+
+            # --- Step 2: Run Analysis Pipeline ---
+            with st.status(f"Submitting analysis for {company_name}...", expanded=True) as status_ui:
+                # Pass the new company_id to the pipeline
+                success = run_analysis_pipeline(
+                    company_id, company_name, doc_urls, document_artifacts, pending_documents, cache_key=cache_key,
+                    trace_parent=analysis_span
+                )
+        analysis_span.set_attribute("cached", bool(cached))
     
     if success:
+        st.session_state['report_traceparent'] = analysis_span.traceparent  # The report render joins this trace
         status_ui.update(label=f"Analysis for {company_name} complete!", state="complete")
+        clear_session_report(PRE_QA_BACKUP) # Belongs to the previous company
         st.success(f"Analysis for {company_name} complete!")
         st.balloons()
         
@@ -1,6 +1,12 @@
 import streamlit as st
 import time
 from utils.api_client import run_update_pipeline # <-- NEW IMPORT
+from utils.report_store import get_session_report, set_session_report, PRE_QA_BACKUP
+from utils.session_memory import track_session
+from utils.profiling import profile_page
+from utils.circuit_breaker import backend_status_banner
+from utils.jobs import cancelled_job_notice
+from utils.deal_notes import pregenerate_deal_note
 
 # --- Auth Check ---
 if not st.session_state.get("authenticated", False):
@@ -8,11 +14,16 @@ if not st.session_state.get("authenticated", False):
     st.page_link("streamlit_app.py", label="Back to Login")
     st.stop()
 # --- End Auth Check ---
+track_session()
+profile_page()
 
 st.title("Step 4: Founder Q&A")
+backend_status_banner()
+cancelled_job_notice()
 
 # --- Data Check ---
-if not st.session_state.get("api_response") or not st.session_state.get("analysis_complete", False):
+api_response = get_session_report()
+if not api_response or not st.session_state.get("analysis_complete", False):
     st.warning("No analysis data found. Please run a new analysis first.")
     st.page_link("pages/2_Run_Analysis.py", label="Run New Analysis")
     st.stop()
@@ -26,7 +37,7 @@ try:
         st.session_state.chat_history = []
         
     if 'qa_questions_list' not in st.session_state and not st.session_state.qa_complete:
-        discrepancy_report = st.session_state.api_response['discrepancy_report']
+        discrepancy_report = api_response['discrepancy_report']
         questions = discrepancy_report.get('follow_up_questions', [])
         
         if not questions:
@@ -50,7 +61,7 @@ try:
 
 except (KeyError, TypeError) as e:
     st.error(f"Could not read follow-up questions from analysis data. Error: {e}")
-    st.json(st.session_state.api_response)
+    st.json(api_response)
     st.stop()
 
 
@@ -112,15 +123,18 @@ if st.session_state.qa_complete:
         company_id = st.session_state.current_company_id
         
         with st.status("Submitting Q&A and re-running analysis... This may take a few minutes.", expanded=True) as status_ui:
-            st.session_state['l1_api_response_backup'] = st.session_state.api_response.copy()
+            # Reports are immutable in the shared store, so no copy is needed
+            set_session_report(api_response, PRE_QA_BACKUP)
             success = run_update_pipeline(
                 company_id=company_id,
-                current_analysis=st.session_state.api_response,
+                current_analysis=api_response,
                 chat_history=st.session_state.chat_history
             )
         
         if success:
             status_ui.update(label="Final report generated successfully!", state="complete")
+            # Start on the deal note now; it's usually the next thing the analyst asks for
+            pregenerate_deal_note(company_id, get_session_report(), st.session_state.chat_history)
             st.success("Final report generated!")
             st.balloons()
             time.sleep(2)
@@ -1,6 +1,13 @@
 import streamlit as st
 import pandas as pd
 from utils.api_client import run_slide_generation # <-- Your existing import
+from utils.repository import get_repository
+from utils.deal_notes import deal_note_hash, get_background_deal_notes
+from utils.report_store import get_session_report
+from utils.session_memory import track_session
+from utils.profiling import profile_page
+from utils.circuit_breaker import backend_status_banner
+from utils.metrics import count_cache_lookup
 
 # --- Auth Check ---
 if not st.session_state.get("authenticated", False):
@@ -8,11 +15,15 @@ if not st.session_state.get("authenticated", False):
     st.page_link("streamlit_app.py", label="Back to Login")
     st.stop()
 # --- End Auth Check ---
+track_session()
+profile_page()
 
 st.title("📄 Generate Deal Note (Google Slides)")
+backend_status_banner()
 
 # --- Data Check ---
-if not st.session_state.get("api_response") or not st.session_state.get("analysis_complete", False):
+api_data = get_session_report()
+if not api_data or not st.session_state.get("analysis_complete", False):
     st.warning("No analysis data found. Please run a new analysis first.")
     st.page_link("pages/2_Run_Analysis.py", label="Run New Analysis")
     st.stop()
@@ -25,46 +36,91 @@ if not company_id:
 # --- End Data Check ---
 
 # --- Load Key Data ---
-company_name = st.session_state.api_response.get('l1_analysis_report', {}).get('company_analysed', 'N/A')
-api_data = st.session_state.api_response
+company_name = api_data.get('l1_analysis_report', {}).get('company_analysed', 'N/A')
 chat_history = st.session_state.get('chat_history', [])
 
+# --- Existing Decks ---
+content_hash = deal_note_hash(api_data, chat_history)
+background = get_background_deal_notes()
+
+background_job = background.get(company_id, content_hash)
+if background_job is not None and background_job.done():
+    background.discard(company_id, content_hash)
+    if background_job.exception() is not None:
+        st.error(f"Background deal note generation failed: {background_job.exception()}")
+    background_job = None
+
+deal_note = get_repository().get_deal_note(company_id, content_hash)
+count_cache_lookup("deal_note", deal_note is not None)
+latest_deal_note = None if deal_note else get_repository().get_latest_deal_note(company_id)
+
 # --- Main Action Container ---
 with st.container(border=True):
     st.subheader(f"Generate Report for: {company_name}")
-    st.markdown("""
-    This will trigger the complete backend AI pipeline:
-    1.  **AI Content Generation:** Agents will generate text for each slide.
-    2.  **Sheet Population:** A Google Sheet will be filled with this content.
-    3.  **Slide Creation:** Google Apps Script will build the final presentation.
 
-    This process may take **2-3 minutes**. You can monitor the progress below.
-    """)
+    if deal_note:
+        st.success("A deal note already exists for this exact report and Q&A transcript.")
+        st.markdown(f"### [Click here to open the Google Slide]({deal_note['slide_url']})")
+        st.caption(f"Generated {deal_note['created_at'][:16].replace('T', ' ')} UTC.")
+    elif background_job is not None:
+        st.info("A deal note for the current report is being generated in the background. "
+                "You can keep working and come back to this page.")
+        if latest_deal_note:
+            st.markdown(f"Meanwhile, the [previous deal note]({latest_deal_note['slide_url']}) "
+                        "(built from an earlier version of the report) is still available.")
+        col_refresh, col_promote = st.columns(2)
+        col_refresh.button("🔄 Check again")
+        if background.is_queued(company_id, content_hash):
+            # Pre-generated decks wait behind requested ones; this one is wanted now
+            if col_promote.button("⏩ Start it now"):
+                background.start(company_id, api_data, content_hash)
+                st.rerun()
+    else:
+        if latest_deal_note:
+            st.warning("The report or Q&A has changed since the last deal note was generated.")
+            st.markdown(f"[Open the previous deal note]({latest_deal_note['slide_url']}) "
+                        f"(generated {latest_deal_note['created_at'][:16].replace('T', ' ')} UTC)")
+        st.markdown("""
+        This will trigger the complete backend AI pipeline:
+        1.  **AI Content Generation:** Agents will generate text for each slide.
+        2.  **Sheet Population:** A Google Sheet will be filled with this content.
+        3.  **Slide Creation:** Google Apps Script will build the final presentation.
 
-    if st.button(f"🚀 Generate Google Slide for {company_name}", type="primary", width='content'):
-        
-        presentation_url = None
-        with st.status("Generating Deal Note... This may take 2-3 minutes.", expanded=True) as status:
-            
-            status.write("Submitting job to backend...")
-            
-            presentation_url = run_slide_generation(
-                company_id=company_id,
-                current_analysis=api_data
-            )
+        This process may take **2-3 minutes**. You can monitor the progress below,
+        or generate it in the background and keep working.
+        """)
+
+        col_now, col_background = st.columns(2)
+        generate_now = col_now.button(f"🚀 Generate Google Slide for {company_name}", type="primary", width='content')
+        if col_background.button("⏳ Generate in background", width='content'):
+            background.start(company_id, api_data, content_hash)
+            st.rerun()
+
+        if generate_now:
             
+            presentation_url = None
+            with st.status("Generating Deal Note... This may take 2-3 minutes.", expanded=True) as status:
+                
+                status.write("Submitting job to backend...")
+                
+                presentation_url = run_slide_generation(
+                    company_id=company_id,
+                    current_analysis=api_data,
+                    content_hash=content_hash
+                )
+                
+                if presentation_url:
+                    status.update(label="Deal Note generated successfully!", state="complete")
+                else:
+                    status.update(label="Failed to generate Deal Note.", state="error")
+
+            # Display result outside the status box
             if presentation_url:
-                status.update(label="Deal Note generated successfully!", state="complete")
+                st.success(f"Successfully created deal note!")
+                st.markdown(f"### [Click here to open the Google Slide]({presentation_url})")
+                st.balloons()
             else:
-                status.update(label="Failed to generate Deal Note.", state="error")
-
-        # Display result outside the status box
-        if presentation_url:
-            st.success(f"Successfully created deal note!")
-            st.markdown(f"### [Click here to open the Google Slide]({presentation_url})")
-            st.balloons()
-        else:
-            st.error("Failed to generate deal note. Check the errors above or the backend logs.")
+                st.error("Failed to generate deal note. Check the errors above or the backend logs.")
 
 st.divider()
 
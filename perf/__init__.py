@@ -0,0 +1,6 @@
+# perf/__init__.py
+"""
+Load tests and benchmarks. Nothing in here is imported by the app itself.
+
+Run from the repository root, e.g. `python -m perf.load_test --sessions 20`.
+"""
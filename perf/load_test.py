@@ -0,0 +1,344 @@
+# perf/load_test.py
+"""
+Concurrent-analyst load test.
+
+Starts the stub backend (perf/stub_backend.py), then drives N simulated
+analysts through the real pages, concurrently, in this one process, the
+way one app instance would serve them:
+
+    login -> Run Analysis (submit and wait) -> First Pass Report
+    -> Founder Q&A (answer every question, generate the final report)
+    -> Final Report -> Generate Deal Note (and wait for the deck)
+
+Each page run goes through Streamlit's AppTest, so it exercises the same
+session state, shared caches, job worker and admission control as a real
+session. The app runs against the in-memory repository and job store, so
+no credentials are needed.
+
+Reports p50/p95/max latency per page run, peak thread count, and memory
+(resident set growth and the session memory manager's tally) per session.
+With --trace-file, the app's spans go there too, for perf/trace_breakdown.py;
+with --metrics-file, the app's metrics (utils/metrics.py) are written there
+at the end, in Prometheus text format.
+
+    python -m perf.load_test --sessions 20 --ramp-seconds 10 --analyze-seconds 20 --failure-rate 0.05
+
+AppTest is built for one session at a time: every run uses the same
+session ID, installs a mock Runtime that it removes when done, and
+compiles the page afresh. The harness gives each analyst its own session
+ID and pins one shared mock Runtime and script cache (see
+`isolate_sessions`), as a real server has one of each for all sessions. Treat the numbers as relative (before/after a change),
+not as absolute capacity.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import traceback
+from collections import defaultdict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from perf.stub_backend import add_stub_arguments, start_stub_backend, stub_config_from_args
+
+PAGE_TIMEOUT_SECONDS = 30 * 60  # Pages that wait on a job run for as long as the job
+SAMPLE_INTERVAL = 0.5
+
+
+def app_secrets(backend_url: str, poll_seconds: int, trace_file: str | None = None) -> dict:
+    """What the app reads from st.secrets during the test: everything local and fast-polling."""
+    tracing = {"TRACE_EXPORTER": "file", "TRACE_FILE": trace_file} if trace_file else {}
+    return {
+        **tracing,
+        "BACKEND_BASE_URL": backend_url,
+        "REPOSITORY_BACKEND": "memory",
+        "JOB_STORE": "local",
+        "UPLOAD_BACKEND": "local",
+        "DIRECT_UPLOADS_ENABLED": "false",
+        "INITIAL_POLLING_DELAY": poll_seconds,
+        "POLLING_INTERVAL": poll_seconds,
+        "JOB_POLL_INTERVAL": poll_seconds,
+    }
+
+
+def use_secrets(secrets: dict):
+    """
+    Points Streamlit's global st.secrets at a temporary secrets.toml, so
+    every session (and every background thread) sees the same values.
+    """
+    lines = [f"{key} = {json.dumps(value)}" for key, value in secrets.items()]
+    path = os.path.join(tempfile.mkdtemp(prefix="vc_analyst_load_test_"), "secrets.toml")
+    with open(path, "w") as f:
+        f.write("\n".join(lines) + "\n")
+    from streamlit import config
+    config.set_option("secrets.files", [path])
+
+
+_analyst = threading.local()
+
+
+def isolate_sessions():
+    """
+    Gives each analyst thread's AppTest runs their own session ID, and has
+    every run see the same mock Runtime, pages setup and script cache
+    however the runs interleave, so one session starting or finishing
+    doesn't pull them out from under another. (Compiling pages on several
+    threads at once can also trip a CPython 3.11 compiler bug.)
+    """
+    from unittest.mock import MagicMock
+    from streamlit.runtime import Runtime
+    from streamlit.runtime.pages_manager import PagesManager
+    from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+    from streamlit.testing.v1 import local_script_runner
+    from streamlit.testing.v1 import app_test
+    from streamlit.testing.v1.local_script_runner import LocalScriptRunner
+    from streamlit.runtime.caching.storage.dummy_cache_storage import MemoryCacheStorageManager
+    from streamlit.runtime.memory_media_file_storage import MemoryMediaFileStorage
+    from streamlit.runtime.media_file_manager import MediaFileManager
+    from streamlit.runtime.dataframe_source_manager import DataframeSourceManager
+
+    runtime = MagicMock(spec=Runtime)
+    runtime.media_file_mgr = MediaFileManager(MemoryMediaFileStorage("/mock/media"))
+    runtime.dataframe_source_mgr = DataframeSourceManager()
+    runtime.cache_storage_manager = MemoryCacheStorageManager()
+    Runtime.instance = classmethod(lambda cls: runtime)
+    Runtime.exists = classmethod(lambda cls: True)
+
+    # AppTest resets PagesManager.uses_pages_directory before every run;
+    # let it reset a subclass's copy instead of the one running pages read
+    app_test.PagesManager = type("LoadTestPagesManager", (PagesManager,), {})
+
+    script_cache = ScriptCache()
+    app_test.ScriptCache = local_script_runner.ScriptCache = lambda: script_cache
+
+    init = LocalScriptRunner.__init__
+
+    def init_with_session_id(self, *args, **kwargs):
+        init(self, *args, **kwargs)
+        self._session_id = getattr(_analyst, "session_id", self._session_id)
+
+    LocalScriptRunner.__init__ = init_with_session_id
+
+
+def resident_bytes() -> int:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024  # Peak, not current, off Linux
+
+
+class Recorder:
+    """Page latencies and errors from every session, plus thread/memory samples."""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)  # step -> [seconds]
+        self.errors = defaultdict(list)  # step -> [message]
+        self.completed_sessions = 0
+        self.peak_threads = threading.active_count()
+        self.peak_rss = self.baseline_rss = resident_bytes()
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    def timed_run(self, step: str, at, timeout: float = PAGE_TIMEOUT_SECONDS):
+        started = time.perf_counter()
+        at.run(timeout=timeout)
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self.latencies[step].append(elapsed)
+            # Only exceptions: reports render risks with st.error
+            if at.exception:
+                self.errors[step].append(str(at.exception[0].value)[:200])
+        return at
+
+    def fail(self, step: str, message: str):
+        with self._lock:
+            self.errors[step].append(message)
+
+    def sample_forever(self):
+        while not self._stop.wait(SAMPLE_INTERVAL):
+            self.peak_threads = max(self.peak_threads, threading.active_count())
+            self.peak_rss = max(self.peak_rss, resident_bytes())
+
+    def stop(self):
+        self._stop.set()
+
+
+def _widget(widgets, label: str):
+    return next(w for w in widgets if w.label == label)
+
+
+def _button(at, label_prefix: str):
+    return next((b for b in at.button if b.label.startswith(label_prefix)), None)
+
+
+def run_session(index: int, backend_url: str, recorder: Recorder, max_wait: float):
+    """One analyst's whole workflow."""
+    from streamlit.testing.v1 import AppTest
+
+    _analyst.session_id = f"load-test-analyst-{index}"
+    at = AppTest.from_file(os.path.join(ROOT, "streamlit_app.py"), default_timeout=PAGE_TIMEOUT_SECONDS)
+    recorder.timed_run("login page", at)
+    _button(at, "Login").click()
+    recorder.timed_run("login", at)
+
+    at.switch_page("pages/2_Run_Analysis.py")
+    recorder.timed_run("run analysis page", at)
+    _widget(at.text_input, "Company Name").input(f"Load Test Co {index}")
+    _widget(at.text_area, "Enter all document URLs (one per line):").input(f"{backend_url}/docs/deck-{index}.pdf")
+    _widget(at.checkbox, "Pre-process documents before submitting").uncheck()
+    _widget(at.checkbox, "Force a fresh analysis").check()
+    _button(at, "Run Full Analysis").click()
+    recorder.timed_run("run analysis (submit and wait)", at)
+    if not at.session_state["analysis_complete"]:
+        recorder.fail("session", "Analysis did not complete")
+        return
+
+    at.switch_page("pages/3_First_Pass_Report.py")
+    recorder.timed_run("first pass report", at)
+
+    at.switch_page("pages/4_Founder_Q&A.py")
+    recorder.timed_run("founder q&a page", at)
+    while not at.session_state["qa_complete"]:
+        if not at.chat_input:
+            recorder.fail("session", "Founder Q&A page has no chat input")
+            return
+        at.chat_input[0].set_value("A detailed answer from the founder.")
+        recorder.timed_run("founder q&a answer", at)
+    _button(at, "Generate Final Report").click()
+    recorder.timed_run("generate final report (submit and wait)", at)
+
+    at.switch_page("pages/5_Final_Report.py")
+    recorder.timed_run("final report", at)
+
+    at.switch_page("pages/6_Generate_Deal_Note.py")
+    recorder.timed_run("deal note page", at)
+    deadline = time.time() + max_wait
+    while time.time() < deadline:
+        generate = _button(at, "🚀 Generate Google Slide")
+        if generate is not None:
+            generate.click()
+            recorder.timed_run("generate deal note (submit and wait)", at)
+            break
+        check_again = _button(at, "🔄 Check again")
+        if check_again is None:
+            break  # The deck already exists (pre-generated after the Q&A)
+        time.sleep(2)
+        check_again.click()
+        recorder.timed_run("deal note page", at)
+
+    with recorder._lock:
+        recorder.completed_sessions += 1
+
+
+def _run_session_safely(index: int, backend_url: str, recorder: Recorder, max_wait: float):
+    try:
+        run_session(index, backend_url, recorder, max_wait)
+    except Exception as e:
+        recorder.fail("session", f"{type(e).__name__}: {e}")
+        traceback.print_exc()
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def summarize(recorder: Recorder, sessions: int, wall_seconds: float, backend) -> dict:
+    from utils.session_memory import get_session_memory_manager
+    memory = get_session_memory_manager().stats()
+    return {
+        "sessions": sessions,
+        "completed_sessions": recorder.completed_sessions,
+        "wall_seconds": round(wall_seconds, 1),
+        "pages": {
+            step: {
+                "runs": len(values),
+                "p50_ms": round(statistics.median(values) * 1000, 1),
+                "p95_ms": round(percentile(values, 0.95) * 1000, 1),
+                "max_ms": round(max(values) * 1000, 1),
+                "errors": len(recorder.errors.get(step, []))
+            }
+            for step, values in recorder.latencies.items()
+        },
+        "errors": {step: messages[:5] for step, messages in recorder.errors.items()},
+        "peak_threads": recorder.peak_threads,
+        "rss_growth_mb_per_session": round((recorder.peak_rss - recorder.baseline_rss) / sessions / 2**20, 2),
+        "tracked_session_kb_per_session": round(memory["in_memory_bytes"] / max(1, memory["sessions"]) / 1024, 1),
+        "backend_requests": backend.requests,
+        "backend_traced_requests": backend.traced_requests,
+        "backend_jobs": len(backend.jobs)
+    }
+
+
+def print_summary(summary: dict):
+    print(f"\n{summary['completed_sessions']}/{summary['sessions']} sessions completed in {summary['wall_seconds']}s")
+    print(f"{'page run':<42}{'runs':>6}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}{'errors':>8}")
+    for step, row in summary["pages"].items():
+        print(f"{step:<42}{row['runs']:>6}{row['p50_ms']:>10}{row['p95_ms']:>10}{row['max_ms']:>10}{row['errors']:>8}")
+    print(f"\nPeak threads: {summary['peak_threads']}")
+    print(f"Resident memory growth per session: {summary['rss_growth_mb_per_session']} MB")
+    print(f"Session state tracked per session: {summary['tracked_session_kb_per_session']} KB")
+    print(f"Backend requests: {summary['backend_requests']} for {summary['backend_jobs']} jobs "
+          f"({summary['backend_traced_requests']} with trace context)")
+    for step, messages in summary["errors"].items():
+        print(f"\nErrors in {step}:")
+        for message in messages:
+            print(f"  - {message}")
+
+
+def main(argv: list[str] | None = None) -> dict:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=10, help="Simulated analysts")
+    parser.add_argument("--ramp-seconds", type=float, default=5.0, help="Spread session starts over this long")
+    parser.add_argument("--poll-seconds", type=int, default=2, help="How often the app polls job status")
+    parser.add_argument("--max-deal-note-wait", type=float, default=300.0)
+    parser.add_argument("--output", help="Also write the summary as JSON to this path")
+    parser.add_argument("--trace-file", help="Have the app write its trace spans here")
+    parser.add_argument("--metrics-file", help="Write the app's metrics here at the end")
+    add_stub_arguments(parser)
+    args = parser.parse_args(argv)
+
+    server, backend = start_stub_backend(stub_config_from_args(args))
+    backend_url = f"http://127.0.0.1:{server.server_port}"
+    use_secrets(app_secrets(backend_url, args.poll_seconds, args.trace_file))
+    isolate_sessions()
+
+    recorder = Recorder()
+    threading.Thread(target=recorder.sample_forever, name="load-test-sampler", daemon=True).start()
+    started = time.time()
+    threads = []
+    for index in range(args.sessions):
+        thread = threading.Thread(
+            target=_run_session_safely, args=(index, backend_url, recorder, args.max_deal_note_wait),
+            name=f"analyst-{index}"
+        )
+        thread.start()
+        threads.append(thread)
+        time.sleep(args.ramp_seconds / max(1, args.sessions))
+    for thread in threads:
+        thread.join()
+    recorder.stop()
+
+    summary = summarize(recorder, args.sessions, time.time() - started, backend)
+    print_summary(summary)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(summary, f, indent=2)
+    if args.metrics_file:
+        from utils.metrics import get_metrics
+        with open(args.metrics_file, "w") as f:
+            f.write(get_metrics().render())
+    server.shutdown()
+    return summary
+
+
+if __name__ == "__main__":
+    main()
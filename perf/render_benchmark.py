@@ -0,0 +1,199 @@
+# perf/render_benchmark.py
+"""
+Render benchmark for the report pages.
+
+Renders pages/3_First_Pass_Report.py and pages/5_Final_Report.py headlessly
+(through Streamlit's AppTest) with synthetic reports of growing size, and
+records for each page and size:
+
+    script_ms    fastest of several reruns of the page (the least noisy figure)
+    elements     elements the run sends to the browser
+    delta_bytes  serialized size of those deltas
+
+Save a baseline on the main branch, then compare a change against it; the
+run exits non-zero when any measurement regresses beyond its threshold:
+
+    python -m perf.render_benchmark --save-baseline perf/render_baseline.json
+    python -m perf.render_benchmark --baseline perf/render_baseline.json
+
+Time thresholds are loose (timings are noisy); element and payload
+thresholds are tight, since they're deterministic for a given report.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from perf.load_test import app_secrets, use_secrets
+from perf.synthetic_reports import ReportSize, make_report, make_final_report
+
+PAGES = {
+    "first_pass_report": "pages/3_First_Pass_Report.py",
+    "final_report": "pages/5_Final_Report.py"
+}
+APP_TEST_SESSION_ID = "test session id"  # The session ID every AppTest run uses
+RUN_TIMEOUT_SECONDS = 120
+
+_last_run = {"messages": []}
+
+
+def capture_forward_msgs():
+    """Keeps the messages of the latest AppTest run, for counting elements and bytes."""
+    from streamlit.testing.v1.local_script_runner import LocalScriptRunner
+
+    forward_msgs = LocalScriptRunner.forward_msgs
+
+    def capturing_forward_msgs(self):
+        messages = forward_msgs(self)
+        _last_run["messages"] = list(messages)
+        return messages
+
+    LocalScriptRunner.forward_msgs = capturing_forward_msgs
+
+
+def delta_stats(messages) -> tuple[int, int]:
+    """(elements, bytes) of the deltas in one run's messages."""
+    elements = 0
+    delta_bytes = 0
+    for message in messages:
+        if message.WhichOneof("type") != "delta":
+            continue
+        delta_bytes += message.ByteSize()
+        if message.delta.WhichOneof("type") == "new_element":
+            elements += 1
+    return elements, delta_bytes
+
+
+def reports_for(scale: float) -> tuple[dict, dict]:
+    """A first-pass report of `scale` times the default size, and its post-Q&A version."""
+    report = make_report(f"Benchmark Co x{scale:g}", ReportSize().scaled(scale), seed=int(scale * 1000))
+    questions = report["discrepancy_report"]["follow_up_questions"]
+    transcript = []
+    for question in questions:
+        transcript.append({"role": "assistant", "content": question})
+        transcript.append({"role": "user", "content": "A detailed answer from the founder."})
+    return report, make_final_report(report, transcript, seed=int(scale * 1000))
+
+
+def benchmark_page(page: str, scale: float, repeats: int) -> dict:
+    """Logs in, puts the reports in the session, then times `repeats` reruns of `page`."""
+    from streamlit.testing.v1 import AppTest
+    from utils.report_store import get_report_store, API_RESPONSE, PRE_QA_BACKUP
+
+    report, final_report = reports_for(scale)
+    at = AppTest.from_file(os.path.join(ROOT, "streamlit_app.py"), default_timeout=RUN_TIMEOUT_SECONDS)
+    at.run()  # Fills in the session defaults
+
+    store = get_report_store()
+    shown, backup = (report, None) if page == PAGES["first_pass_report"] else (final_report, report)
+    at.session_state["authenticated"] = True
+    at.session_state["analysis_complete"] = True
+    at.session_state["current_company_id"] = "benchmark-company"
+    at.session_state[f"{API_RESPONSE}_key"] = store.assign(APP_TEST_SESSION_ID, API_RESPONSE, shown)
+    if backup is not None:
+        at.session_state[f"{PRE_QA_BACKUP}_key"] = store.assign(APP_TEST_SESSION_ID, PRE_QA_BACKUP, backup)
+
+    at.switch_page(page)
+    at.run()  # Warm-up: imports and first-run caches shouldn't count
+    if at.exception:
+        raise RuntimeError(f"{page} raised: {at.exception[0].value}")
+
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        at.run()
+        timings.append(time.perf_counter() - started)
+    elements, delta_bytes = delta_stats(_last_run["messages"])
+    store.release_session(APP_TEST_SESSION_ID)
+    return {
+        "script_ms": round(min(timings) * 1000, 1),
+        "elements": elements,
+        "delta_bytes": delta_bytes
+    }
+
+
+def run_benchmarks(scales: list[float], repeats: int) -> dict:
+    """{"first_pass_report@x4": {...}, ...}"""
+    results = {}
+    for name, page in PAGES.items():
+        for scale in scales:
+            results[f"{name}@x{scale:g}"] = benchmark_page(page, scale, repeats)
+    return results
+
+
+def regressions(results: dict, baseline: dict, time_threshold: float, size_threshold: float) -> list[str]:
+    """Every measurement that grew more than its threshold (a fraction) over the baseline."""
+    found = []
+    for case, measured in results.items():
+        before = baseline.get(case)
+        if before is None:
+            continue
+        for metric, value in measured.items():
+            threshold = time_threshold if metric == "script_ms" else size_threshold
+            if before[metric] and value > before[metric] * (1 + threshold):
+                found.append(
+                    f"{case} {metric}: {before[metric]} -> {value} "
+                    f"(+{(value / before[metric] - 1) * 100:.0f}%, limit +{threshold * 100:.0f}%)"
+                )
+    return found
+
+
+def print_results(results: dict, baseline: dict | None):
+    print(f"{'page@size':<28}{'script ms':>12}{'elements':>10}{'delta bytes':>14}")
+    for case, measured in results.items():
+        row = f"{case:<28}{measured['script_ms']:>12}{measured['elements']:>10}{measured['delta_bytes']:>14}"
+        before = (baseline or {}).get(case)
+        if before:
+            changes = [
+                f"{metric} {(measured[metric] / before[metric] - 1) * 100:+.0f}%"
+                for metric in measured if before[metric]
+            ]
+            row += "   vs baseline: " + ", ".join(changes)
+        print(row)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scales", type=float, nargs="+", default=[1, 4, 16],
+                        help="Report sizes, as multiples of the default synthetic report")
+    parser.add_argument("--repeats", type=int, default=7, help="Timed reruns per page and size")
+    parser.add_argument("--baseline", help="Compare against this saved run and fail on regressions")
+    parser.add_argument("--save-baseline", help="Write this run's results here")
+    parser.add_argument("--time-threshold", type=float, default=0.3, help="Allowed script time growth")
+    parser.add_argument("--size-threshold", type=float, default=0.05, help="Allowed element/payload growth")
+    args = parser.parse_args(argv)
+
+    # The report pages never call the backend; point it somewhere closed
+    use_secrets(app_secrets("http://127.0.0.1:9", poll_seconds=1))
+    capture_forward_msgs()
+
+    results = run_benchmarks(args.scales, args.repeats)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    print_results(results, baseline)
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nSaved baseline to {args.save_baseline}")
+
+    if baseline is not None:
+        found = regressions(results, baseline, args.time_threshold, args.size_threshold)
+        if found:
+            print("\nRegressions:")
+            for line in found:
+                print(f"  - {line}")
+            return 1
+        print("\nNo regressions.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
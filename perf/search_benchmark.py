@@ -0,0 +1,94 @@
+# perf/search_benchmark.py
+"""
+Benchmark for the Analysis History search index (utils/search_index.py).
+
+Indexes synthetic reports (see perf/synthetic_reports.py) and times a mix
+of queries against them: company names, competitors, common report words,
+partly typed words, and industry and score filters. Synthetic reports
+draw their text from a small vocabulary, so most words are in every
+report; that is the slow case for the index.
+
+    python -m perf.search_benchmark --analyses 1000 5000
+
+Exits non-zero if any query's p95 exceeds --max-p95-ms.
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from perf.synthetic_reports import INDUSTRIES, make_report
+from utils.search_index import SearchIndex
+
+QUERIES = [
+    ("company name", {"query": "Company 42"}),
+    ("competitor", {"query": "competitor 3"}),
+    ("common words", {"query": "market growth retention"}),
+    ("partly typed", {"query": "pric"}),
+    ("words and filters", {"query": "regulation risk", "industries": list(INDUSTRIES[:2]), "min_score": 3}),
+    ("filters only", {"query": "", "industries": [INDUSTRIES[0]]})
+]
+
+
+def company_document(i: int) -> dict:
+    name = f"Company {i}"
+    updated_at = datetime(2026, 1, 1, tzinfo=timezone.utc) + timedelta(hours=i)
+    return {
+        "company_analysed": name,
+        "analysis_status": "Complete",
+        "updated_at": updated_at.isoformat(),
+        "analysis_report": make_report(name, seed=i)
+    }
+
+
+def run(analyses: int, repeats: int) -> dict:
+    index = SearchIndex()
+    started = time.perf_counter()
+    for i in range(analyses):
+        index.upsert(f"company-{i}", company_document(i))
+    indexing_seconds = time.perf_counter() - started
+
+    results = {"analyses": analyses, "indexing_seconds": round(indexing_seconds, 2), **index.stats(), "queries": {}}
+    for label, kwargs in QUERIES:
+        timings = []
+        for _ in range(repeats):
+            started = time.perf_counter()
+            index.search(**kwargs)
+            timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+        results["queries"][label] = {
+            "median_ms": round(statistics.median(timings), 2),
+            "p95_ms": round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 2)
+        }
+    return results
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--analyses", type=int, nargs="+", default=[1000, 5000], help="Index sizes to test")
+    parser.add_argument("--repeats", type=int, default=20, help="Timed runs of each query")
+    parser.add_argument("--max-p95-ms", type=float, default=100, help="Fail if any query's p95 is slower")
+    args = parser.parse_args(argv)
+
+    slow = []
+    for analyses in args.analyses:
+        results = run(analyses, args.repeats)
+        print(f"{analyses} analyses: indexed in {results['indexing_seconds']}s, {results['terms']} terms")
+        for label, timing in results["queries"].items():
+            print(f"  {label:<20} median {timing['median_ms']:>7} ms   p95 {timing['p95_ms']:>7} ms")
+            if timing["p95_ms"] > args.max_p95_ms:
+                slow.append(f"{label} at {analyses} analyses")
+    if slow:
+        print(f"Slower than {args.max_p95_ms} ms: {', '.join(slow)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
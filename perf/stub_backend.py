@@ -0,0 +1,200 @@
+# perf/stub_backend.py
+"""
+A local stand-in for the analysis backend.
+
+Serves the endpoints the app calls: `/analyze/all`, `/analyze/update`,
+`/analyze/slides`, `/analyze/status/{job_id}`, `/analyze/cancel/{job_id}`,
+`/analyze/documents/{job_id}` and `/health`, plus `/docs/{name}` so there
+are document URLs to analyse. Jobs finish after a configurable duration
+(with jitter), and fail at a configurable rate. Completed analyses return
+a synthetic report (see perf/synthetic_reports.py).
+
+    python -m perf.stub_backend --port 8765 --analyze-seconds 20 --failure-rate 0.05
+"""
+import argparse
+import itertools
+import json
+import random
+import threading
+import time
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from perf.synthetic_reports import ReportSize, make_report, make_final_report
+
+
+@dataclass
+class StubConfig:
+    durations: dict = field(default_factory=lambda: {"analyze": 20.0, "update": 8.0, "slides": 10.0})
+    jitter: float = 0.25  # +/- fraction of each duration
+    failure_rate: float = 0.0
+    report_size: ReportSize = field(default_factory=ReportSize)
+
+
+class StubBackend:
+    """The jobs the stub knows about, and what each one returns."""
+
+    def __init__(self, config: StubConfig):
+        self.config = config
+        self.jobs = {}
+        self.requests = 0
+        self.traced_requests = 0  # Requests that carried a traceparent header
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def submit(self, job_type: str, payload: dict) -> str:
+        duration = self.config.durations[job_type]
+        duration *= random.uniform(1 - self.config.jitter, 1 + self.config.jitter)
+        with self._lock:
+            job_id = f"stub-{job_type}-{next(self._ids)}"
+            self.jobs[job_id] = {
+                "job_type": job_type,
+                "payload": payload,
+                "started_at": time.time(),
+                "duration": duration,
+                "fails": random.random() < self.config.failure_rate,
+                "cancelled": False
+            }
+        return job_id
+
+    def status(self, job_id: str) -> dict | None:
+        with self._lock:
+            job = self.jobs.get(job_id)
+        if job is None:
+            return None
+        if job["cancelled"]:
+            return {"status": "Failed", "error": "Job was cancelled."}
+        elapsed = time.time() - job["started_at"]
+        if elapsed < job["duration"]:
+            return {
+                "status": "Pending",
+                "progress": round(elapsed / job["duration"], 3),
+                "eta_seconds": round(job["duration"] - elapsed, 1)
+            }
+        if job["fails"]:
+            return {"status": "Failed", "error": "Simulated backend failure."}
+        return {"status": "Complete", "result": self._result(job_id, job)}
+
+    def cancel(self, job_id: str) -> bool:
+        """False if the job is unknown or already finished (the real endpoint answers 404/409)."""
+        with self._lock:
+            job = self.jobs.get(job_id)
+            if job is None or job["cancelled"] or time.time() - job["started_at"] >= job["duration"]:
+                return False
+            job["cancelled"] = True
+            return True
+
+    def _result(self, job_id: str, job: dict) -> dict:
+        payload = job["payload"]
+        if job["job_type"] == "slides":
+            return {"slide_url": f"https://slides.example.com/{job_id}"}
+        if job["job_type"] == "update":
+            return make_final_report(payload["current_analysis"], payload.get("founder_qa_transcript", []))
+        return make_report(payload.get("company_name", "Stub Co"), self.config.report_size, seed=hash(job_id))
+
+
+def make_handler(backend: StubBackend):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass  # Keep load test output readable
+
+        def _send(self, status: int, body: dict | None = None, headers: dict | None = None):
+            data = json.dumps(body).encode() if body is not None else b""
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            if self.command != "HEAD":
+                self.wfile.write(data)
+
+        def _payload(self) -> dict:
+            length = int(self.headers.get("Content-Length") or 0)
+            return json.loads(self.rfile.read(length) or b"{}")
+
+        def do_HEAD(self):
+            if self.path.startswith("/docs/"):
+                # Validators so the analysis cache can fingerprint the URL
+                self._send(200, None, {"ETag": f'"{self.path}"', "Content-Length": "0"})
+            else:
+                self._send(404)
+
+        def _count(self):
+            backend.requests += 1
+            if self.headers.get("traceparent"):
+                backend.traced_requests += 1
+
+        def do_GET(self):
+            self._count()
+            if self.path == "/health":
+                self._send(200, {"status": "ok"})
+            elif self.path.startswith("/analyze/status/"):
+                status = backend.status(self.path.rsplit("/", 1)[1])
+                if status:
+                    self._send(200, status)
+                else:
+                    self._send(404, {"detail": "Unknown job"})
+            elif self.path.startswith("/docs/"):
+                self._send(200, {"document": self.path})
+            else:
+                self._send(404, {"detail": "Not found"})
+
+        def do_POST(self):
+            self._count()
+            job_types = {"/analyze/all": "analyze", "/analyze/update": "update", "/analyze/slides": "slides"}
+            if self.path in job_types:
+                job_id = backend.submit(job_types[self.path], self._payload())
+                self._send(202, {"job_id": job_id})
+            elif self.path.startswith("/analyze/cancel/"):
+                if backend.cancel(self.path.rsplit("/", 1)[1]):
+                    self._send(200, {"cancelled": True})
+                else:
+                    self._send(409, {"detail": "Not running"})
+            elif self.path.startswith("/analyze/documents/"):
+                self._payload()
+                self._send(200, {"accepted": True})
+            else:
+                self._send(404, {"detail": "Not found"})
+
+    return Handler
+
+
+def start_stub_backend(config: StubConfig, port: int = 0) -> tuple[ThreadingHTTPServer, StubBackend]:
+    """Serves the stub from a background thread. Port 0 picks a free one (see server.server_port)."""
+    backend = StubBackend(config)
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(backend))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="stub-backend", daemon=True).start()
+    return server, backend
+
+
+def add_stub_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--analyze-seconds", type=float, default=20.0)
+    parser.add_argument("--update-seconds", type=float, default=8.0)
+    parser.add_argument("--slides-seconds", type=float, default=10.0)
+    parser.add_argument("--jitter", type=float, default=0.25, help="+/- fraction of each job duration")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Fraction of jobs that fail")
+    parser.add_argument("--report-scale", type=float, default=1.0, help="Multiplies every list in the reports")
+
+
+def stub_config_from_args(args: argparse.Namespace) -> StubConfig:
+    return StubConfig(
+        durations={"analyze": args.analyze_seconds, "update": args.update_seconds, "slides": args.slides_seconds},
+        jitter=args.jitter,
+        failure_rate=args.failure_rate,
+        report_size=ReportSize().scaled(args.report_scale)
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8765)
+    add_stub_arguments(parser)
+    args = parser.parse_args()
+    server, _ = start_stub_backend(stub_config_from_args(args), args.port)
+    print(f"Stub backend listening on http://127.0.0.1:{server.server_port}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
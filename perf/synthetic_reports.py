@@ -0,0 +1,180 @@
+# perf/synthetic_reports.py
+"""
+Analysis reports of any size, shaped like the backend's, for load tests and
+benchmarks. Every list the report pages render (founders, risks,
+competitors, synergies, discrepancy findings...) has a configurable length.
+"""
+import random
+from dataclasses import dataclass
+
+FACTORS = ("founder", "industry", "product", "externalities", "competition", "financial", "synergy")
+INDUSTRIES = ("B2B SaaS", "Fintech", "D2C Brands", "Healthtech", "Edtech", "Logistics", "Agritech", "Climate")
+RISK_LEVELS = ("High Risk", "Medium Risk", "Low Risk")
+SEVERITIES = ("High", "Medium", "Low")
+PESTLE = ("Political", "Economic", "Social", "Technological", "Legal", "Environmental")
+
+
+@dataclass
+class ReportSize:
+    founders: int = 2
+    risks_per_factor: int = 2
+    pestle_risks: int = 4
+    competitors: int = 5
+    substitutes: int = 3
+    synergies: int = 2
+    findings: int = 4
+    verified_claims: int = 4
+    questions: int = 3
+    missing_data_callouts: int = 3
+    words_per_text: int = 40  # Length of each summary/rationale
+
+    def scaled(self, factor: float) -> "ReportSize":
+        """Every list (and text) `factor` times as long."""
+        return ReportSize(**{name: max(1, round(value * factor)) for name, value in vars(self).items()})
+
+
+def _text(rng: random.Random, words: int) -> str:
+    vocabulary = ("market", "growth", "revenue", "founder", "team", "customer", "retention", "pricing",
+                  "channel", "margin", "scale", "regulation", "competitor", "moat", "adoption", "risk")
+    return " ".join(rng.choice(vocabulary) for _ in range(words)).capitalize() + "."
+
+
+def make_report(company_name: str, size: ReportSize | None = None, seed: int | None = None) -> dict:
+    """A complete first-pass report (l1_analysis_report, scoring_report, discrepancy_report)."""
+    size = size or ReportSize()
+    rng = random.Random(seed)
+    text = lambda: _text(rng, size.words_per_text)
+    short = lambda: _text(rng, max(3, size.words_per_text // 8))
+    claimed, activity = rng.sample(INDUSTRIES, 2)
+
+    scoring_report = {
+        f"{factor}_assessment": {
+            "score": rng.randint(1, 5),
+            "rating": rng.choice(("Weak", "Average", "Good", "Strong")),
+            "rationale": text(),
+            "identified_risks": [
+                {"severity": rng.choice(SEVERITIES), "factor": short()} for _ in range(size.risks_per_factor)
+            ]
+        }
+        for factor in FACTORS
+    }
+
+    l1_analysis_report = {
+        "company_analysed": company_name,
+        "founder_analysis": {
+            "founder_count": size.founders,
+            "founder_profiles": [
+                {
+                    "name": f"Founder {i + 1}",
+                    "tech_competency": rng.randint(1, 5),
+                    "execution_ability": rng.randint(1, 5),
+                    "management_experience": rng.randint(1, 5),
+                    "sales_ability": rng.randint(1, 5),
+                    "profile_summary": text(),
+                    "top_5_skillsets": [short() for _ in range(5)],
+                    "special_skills": [short() for _ in range(2)]
+                }
+                for i in range(size.founders)
+            ],
+            "key_strengths": [short() for _ in range(3)],
+            "identified_gaps": [short() for _ in range(2)],
+            "summary": text()
+        },
+        "industry_analysis": {
+            "claimed_industry": claimed,
+            "activity_based_industry": activity,
+            "is_coherent_with_claims": rng.choice((True, False)),
+            "summary": text(),
+            "porter_five_forces_summary": {
+                force: text() for force in (
+                    "threat_of_new_entrants", "bargaining_power_of_buyers", "bargaining_power_of_suppliers",
+                    "threat_of_substitutes", "competitive_rivalry"
+                )
+            }
+        },
+        "product_analysis": {
+            "core_product_offering": text(),
+            "problem_solved": text(),
+            "value_proposition_qualitative": text(),
+            "value_proposition_quantitative": text(),
+            "direct_substitutes": [short() for _ in range(size.substitutes)],
+            "summary": text()
+        },
+        "externalities_analysis": {
+            "existential_threat_identified": rng.random() < 0.2,
+            "summary": text(),
+            "identified_risks": [
+                {"category": rng.choice(PESTLE), "impact": rng.choice(SEVERITIES),
+                 "risk_description": short(), "rationale": text()}
+                for _ in range(size.pestle_risks)
+            ]
+        },
+        "competition_analysis": {
+            "competitive_advantage": text(),
+            "direct_competitors": [f"Competitor {i + 1}" for i in range(size.competitors)],
+            "best_alternative_solution": text(),
+            "switching_costs_analysis": text(),
+            "summary": text()
+        },
+        "financial_analysis": {
+            "three_year_viability_check": {
+                "required_som_share": round(rng.uniform(0.01, 0.4), 4),
+                "annual_fixed_costs": rng.randint(10**6, 10**9),
+                "one_time_development_costs": rng.randint(10**6, 10**8),
+                "required_annual_revenue_at_year_3": rng.randint(10**7, 10**10)
+            },
+            "is_rational_assessment": text(),
+            "deck_claims": {"tam": rng.randint(10**10, 10**13), "sam": None, "som": rng.randint(10**8, 10**11)},
+            "analyst_sizing": {
+                "tam": rng.randint(10**10, 10**13), "sam": rng.randint(10**9, 10**12), "som": rng.randint(10**8, 10**11)
+            },
+            "sizing_discrepancy_rationale": text(),
+            "unit_economics": {
+                "price_per_unit": rng.randint(100, 10**5),
+                "variable_cost_per_unit": rng.randint(10, 10**4),
+                "contribution_margin_per_unit": rng.randint(10, 10**4),
+                "customer_acquisition_cost_cac": rng.randint(100, 10**5)
+            },
+            "missing_data_callouts": [short() for _ in range(size.missing_data_callouts)],
+            "summary": text()
+        },
+        "synergy_analysis": {
+            "summary": text(),
+            "solves_identified_skill_gap": rng.choice((True, False)),
+            "solves_identified_external_threat": rng.choice((True, False)),
+            "potential_synergies": [
+                {"portfolio_company": f"Portfolio Co {i + 1}", "synergy_type": short(), "description": text()}
+                for i in range(size.synergies)
+            ]
+        }
+    }
+
+    discrepancy_report = {
+        "assessed_findings": [
+            {"claim": short(), "risk_assessment": rng.choice(RISK_LEVELS),
+             "finding_summary": text(), "material_impact_analysis": text()}
+            for _ in range(size.findings)
+        ],
+        "successfully_verified_claims": [
+            {"claim": short(), "source_of_claim": "Pitch deck", "finding": short()}
+            for _ in range(size.verified_claims)
+        ],
+        "follow_up_questions": [f"{short()[:-1]}?" for _ in range(size.questions)]
+    }
+
+    return {
+        "l1_analysis_report": l1_analysis_report,
+        "scoring_report": scoring_report,
+        "discrepancy_report": discrepancy_report
+    }
+
+
+def make_final_report(report: dict, transcript: list[dict], seed: int | None = None) -> dict:
+    """The post-Q&A version of `report`: scores nudged, transcript attached."""
+    rng = random.Random(seed)
+    final = {**report, "founder_qa_transcript": transcript}
+    final["scoring_report"] = {
+        key: {**assessment, "score": min(5, max(1, assessment["score"] + rng.choice((-1, 0, 0, 1))))}
+        for key, assessment in report["scoring_report"].items()
+    }
+    return final
@@ -0,0 +1,103 @@
+# perf/trace_breakdown.py
+"""
+Latency breakdowns from a trace file.
+
+Reads the JSON lines the app writes with TRACE_EXPORTER = "file" (see
+utils/tracing.py) and prints, for every stage (span name), how many spans
+there were and their p50/p95/max duration; then the stages of the most
+recent traces, one line per trace.
+
+    python -m perf.trace_breakdown traces.jsonl --traces 10
+"""
+import argparse
+import json
+import statistics
+from collections import defaultdict
+
+# The order stages happen in, for the per-trace lines
+STAGES = (
+    "upload", "admission", "submit", "backend.queue", "backend.run", "save", "wait",
+    "render.first_pass_report", "render.final_report"
+)
+
+
+def read_spans(path: str) -> list[dict]:
+    spans = []
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                spans.append(json.loads(line))
+    return spans
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def stage_summary(spans: list[dict]) -> dict:
+    """{span name: {"count", "errors", "p50_ms", "p95_ms", "max_ms"}}"""
+    durations = defaultdict(list)
+    errors = defaultdict(int)
+    for span in spans:
+        durations[span["name"]].append(span["duration_ms"])
+        if span["status"]["code"] == "ERROR":
+            errors[span["name"]] += 1
+    return {
+        name: {
+            "count": len(values),
+            "errors": errors[name],
+            "p50_ms": statistics.median(values),
+            "p95_ms": percentile(values, 0.95),
+            "max_ms": max(values)
+        }
+        for name, values in sorted(durations.items())
+    }
+
+
+def trace_breakdowns(spans: list[dict], limit: int) -> list[dict]:
+    """The `limit` most recent traces: root name, company, job and ms per stage."""
+    traces = defaultdict(list)
+    for span in spans:
+        traces[span["trace_id"]].append(span)
+    latest = sorted(traces.values(), key=lambda t: min(s["start_time_unix_nano"] for s in t))[-limit:]
+
+    rows = []
+    for trace in latest:
+        root = next((s for s in trace if not s["parent_span_id"]), trace[0])
+        stages = defaultdict(float)
+        for span in trace:
+            if span["name"] in STAGES:
+                stages[span["name"]] += span["duration_ms"]
+        attributes = {k: v for s in trace for k, v in s["attributes"].items()}
+        rows.append({
+            "trace": root["name"],
+            "company_id": attributes.get("company_id"),
+            "job_id": attributes.get("job_id"),
+            "total_ms": root["duration_ms"],
+            "stages": dict(stages)
+        })
+    return rows
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", nargs="?", default="traces.jsonl")
+    parser.add_argument("--traces", type=int, default=10, help="How many recent traces to break down")
+    args = parser.parse_args(argv)
+
+    spans = read_spans(args.path)
+    print(f"{'stage':<28}{'count':>7}{'errors':>8}{'p50 ms':>11}{'p95 ms':>11}{'max ms':>11}")
+    for name, row in stage_summary(spans).items():
+        print(f"{name:<28}{row['count']:>7}{row['errors']:>8}{row['p50_ms']:>11.0f}{row['p95_ms']:>11.0f}{row['max_ms']:>11.0f}")
+
+    print("\nRecent traces:")
+    for row in trace_breakdowns(spans, args.traces):
+        stages = ", ".join(
+            f"{name} {row['stages'][name]:.0f}" for name in STAGES if name in row["stages"]
+        )
+        print(f"  {row['trace']} {row['company_id']} ({row['job_id']}): {row['total_ms']:.0f} ms = {stages}")
+
+
+if __name__ == "__main__":
+    main()
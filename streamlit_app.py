@@ -1,6 +1,4 @@
 import streamlit as st
-import logging
-logging.basicConfig(level=logging.ERROR, filename="app.log")
 
 # Set page config as the first Streamlit command
 st.set_page_config(
@@ -38,7 +36,12 @@ def check_password():
 
 # --- Initialize Session State ---
 # In streamlit_app.py
-from utils.firebase_client import load_fund_config # <-- Add this import
+from utils.repository import get_repository
+from utils.report_store import get_session_report
+from utils.session_memory import track_session
+from utils.profiling import profile_page
+from utils.analytics_mirror import start_analytics_mirror
+from utils.job_worker import get_job_worker
 
 # --- Initialize Session State ---
 def init_session_state():
@@ -47,7 +50,7 @@ def init_session_state():
 
     # --- NEW: Load config from Firestore ONCE per session ---
     if "config_loaded" not in st.session_state:
-        config_data = load_fund_config() # This is the one-time DB call
+        config_data = get_repository().load_fund_config() # This is the one-time DB call
 
         # Get data from config, or use default if key doesn't exist
         st.session_state.vc_thesis = config_data.get(
@@ -69,15 +72,15 @@ def init_session_state():
     # These are runtime variables, not persistent config
     if "new_industries_to_score" not in st.session_state:
         st.session_state.new_industries_to_score = []
-    if "api_response" not in st.session_state:
-        st.session_state["api_response"] = None
     if "chat_history" not in st.session_state:
         st.session_state["chat_history"] = []
     if "analysis_complete" not in st.session_state:
         st.session_state["analysis_complete"] = False
 
 # --- Main App ---
+track_session() # Restore anything spilled to disk before defaults are filled in
 init_session_state()
+get_job_worker()  # Started with the app, so this instance also takes over jobs orphaned by others
 
 if not check_password():
     # If not authenticated, stop the script here.
@@ -87,6 +90,8 @@ if not check_password():
 # --- Authenticated App ---
 # If we are here, the user is authenticated.
 st.sidebar.success("You are logged in.")
+profile_page()
+start_analytics_mirror()
 # st.sidebar.page_link("streamlit_app.py", label="Home / Login")
 # st.sidebar.page_link("/", label="Home / Login")
 st.sidebar.page_link("streamlit_app.py", label="Home / Login")
@@ -109,8 +114,9 @@ st.divider()
 st.page_link("pages/1_Portfolio_Setup.py", label="Setup your Portfolio", icon="➡️")
 st.page_link("pages/0_Analysis_History.py", label="Or load a previous Analysis", icon="➡️")
 
-if st.session_state.api_response:
-    company = st.session_state.api_response.get('l1_analysis_report', {}).get('company_analysed', 'N/A')
+current_report = get_session_report()
+if current_report:
+    company = current_report.get('l1_analysis_report', {}).get('company_analysed', 'N/A')
     st.subheader(f"Current Analysis in Memory: :orange[{company}]")
     st.page_link("pages/3_First_Pass_Report.py", label="Go to report")
 else:
@@ -0,0 +1,10 @@
+# tests/conftest.py
+import os
+import tempfile
+from streamlit import config
+
+# Modules read their settings from st.secrets at import time; run them on the defaults
+_secrets = os.path.join(tempfile.mkdtemp(prefix="vc_analyst_tests_"), "secrets.toml")
+with open(_secrets, "w") as f:
+    f.write('LOG_FILE = ""\nLOG_CONSOLE = "false"\nBACKEND_BASE_URL = "http://backend.invalid"\n')
+config.set_option("secrets.files", [_secrets])
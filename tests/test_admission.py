@@ -0,0 +1,40 @@
+# tests/test_admission.py
+from utils.admission import AdmissionController, JOB_ANALYZE, JOB_SLIDES, LANE_BULK
+
+CAPS = {JOB_ANALYZE: 2, JOB_SLIDES: 2}
+
+
+def controller_with(elsewhere: list) -> AdmissionController:
+    return AdmissionController(CAPS, max_jobs=3, default_seconds={JOB_ANALYZE: 60, JOB_SLIDES: 60},
+                               elsewhere=lambda: list(elsewhere), sync_seconds=0)
+
+
+def test_jobs_on_other_instances_count_towards_the_caps():
+    elsewhere = [(JOB_ANALYZE, "analyst-b"), (JOB_ANALYZE, "analyst-c")]
+    controller = controller_with(elsewhere)
+    ticket = controller.request(JOB_ANALYZE, "analyst-a", LANE_BULK)
+    assert not ticket.wait(0)
+
+    elsewhere.pop()
+    controller.sync()
+    assert ticket.wait(0)
+
+
+def test_jobs_on_other_instances_count_towards_the_total():
+    controller = controller_with([(JOB_ANALYZE, "analyst-b"), (JOB_ANALYZE, "analyst-c")])
+    first = controller.request(JOB_SLIDES, "analyst-a", LANE_BULK)
+    second = controller.request(JOB_SLIDES, "analyst-a", LANE_BULK)
+    assert first.wait(0)
+    assert not second.wait(0)
+
+
+def test_analysts_busy_elsewhere_queue_behind_idle_ones():
+    controller = controller_with([(JOB_ANALYZE, "analyst-b")])
+    holder = controller.request(JOB_ANALYZE, "analyst-a", LANE_BULK)
+    busy = controller.request(JOB_ANALYZE, "analyst-b", LANE_BULK)
+    idle = controller.request(JOB_ANALYZE, "analyst-c", LANE_BULK)
+    assert holder.wait(0)
+
+    holder.release()
+    assert idle.wait(0)
+    assert not busy.wait(0)
@@ -0,0 +1,22 @@
+# tests/test_analysis_cache.py
+import io
+from utils.analysis_cache import document_hashes
+from utils.uploads import LocalResumableBackend, object_name, stream_to_storage
+
+DECK = b"%PDF-1.7 pitch deck " * 100000
+
+
+class Upload(io.BytesIO):
+    """Stands in for an st.file_uploader file."""
+    name = "deck.pdf"
+    type = "application/pdf"
+
+
+def test_a_file_hashes_the_same_through_either_uploader(tmp_path, monkeypatch):
+    backend = LocalResumableBackend(str(tmp_path))
+    monkeypatch.setattr("utils.analysis_cache.get_upload_backend", lambda: backend)
+    stream_to_storage(backend, object_name("c1", "deck.pdf"), io.BytesIO(DECK), "application/pdf", len(DECK))
+
+    direct = document_hashes("c1", [{"name": "deck.pdf"}], [], [])
+    legacy = document_hashes(None, [], [Upload(DECK)], [])
+    assert direct == legacy
@@ -0,0 +1,73 @@
+# tests/test_analytics_mirror.py
+import pytest
+from utils import analytics_mirror, live_history
+from utils.analytics_mirror import flatten_report
+from utils.live_history import LiveAnalysisHistory
+from utils.repository import InMemoryRepository
+
+REPORT = {
+    "l1_analysis_report": {
+        "company_analysed": "Acme",
+        "industry_analysis": {"claimed_industry": "Fintech", "activity_based_industry": "Payments",
+                              "is_coherent_with_claims": True},
+        "founder_analysis": {"founder_count": 2},
+        "financial_analysis": {"analyst_sizing": {"tam": 1e9, "sam": "unknown", "som": 5e6}},
+        "externalities_analysis": {
+            "existential_threat_identified": False,
+            "identified_risks": [{"category": "Regulatory", "impact": "High", "risk_description": "Licensing"}]
+        }
+    },
+    "scoring_report": {
+        "financial_assessment": {"score": 4, "rating": "Strong", "identified_risks": [
+            {"severity": "High Risk", "factor": "Burn"}, {"severity": "Low", "factor": "Margins"}
+        ]},
+        "team_assessment": {"score": 3, "rating": "Average", "identified_risks": []},
+        "summary": "Not a factor"
+    },
+    "discrepancy_report": {
+        "assessed_findings": [{"risk_assessment": "High"}, {"risk_assessment": "Low"}],
+        "successfully_verified_claims": ["ARR"],
+        "follow_up_questions": ["Churn?", "Runway?"]
+    }
+}
+
+
+def test_flatten_report():
+    rows = flatten_report("c1", {"analysis_report": REPORT, "report_version": 3,
+                                 "updated_at": "2026-01-02T03:04:05"})
+    (analysis,) = rows["analyses"]
+    assert analysis[:3] == ("c1", "Acme", 3)
+    assert analysis[4].year == 2026
+    assert analysis[5:12] == ("Fintech", "Payments", True, 2, 1e9, None, 5e6)
+    assert analysis[12:] == (3.5, 3, 2, False, 2, 1, 1, 2)
+    assert rows["factor_scores"] == [("c1", "financial", 4.0, "Strong", 2, 1), ("c1", "team", 3.0, "Average", 0, 0)]
+    assert rows["industries"] == [("c1", "Fintech", "claimed"), ("c1", "Payments", "activity")]
+    assert ("c1", "externalities", "Regulatory", "High", "Licensing") in rows["risks"]
+
+
+def test_flatten_report_of_a_company_without_a_report():
+    rows = flatten_report("c1", {"company_analysed": "Acme"})
+    assert rows["analyses"][0][:2] == ("c1", "Acme")
+    assert rows["factor_scores"] == rows["industries"] == rows["risks"] == []
+
+
+def test_mirror_is_fed_by_the_history_listener(monkeypatch, tmp_path):
+    pytest.importorskip("duckdb")
+    repository, history = InMemoryRepository(), LiveAnalysisHistory()
+    monkeypatch.setattr(live_history, "get_repository", lambda: repository)
+    monkeypatch.setattr(analytics_mirror, "get_live_history", lambda: history)
+    done = repository.create_company("Acme")
+    repository.save_report(done, REPORT)
+    history.start()
+
+    # Joins after the first snapshot, so the listener restarts to send it everything
+    mirror = analytics_mirror.AnalyticsMirror(str(tmp_path / "mirror.duckdb"))
+    mirror.start()
+    repository.create_company("Beta")  # Pending: in the history, not the mirror
+    assert mirror.wait_until_ready(0)
+    assert mirror.query("SELECT company_id, report_version FROM analyses").values.tolist() == [[done, 1]]
+
+    repository.save_report(done, REPORT)
+    assert mirror.query("SELECT report_version FROM analyses").values.tolist() == [[2]]
+    assert len(history.rows()) == 2
+    assert history.restarts == 1
@@ -0,0 +1,48 @@
+# tests/test_deadlines.py
+import pytest
+from utils import deadlines
+from utils.deadlines import JobDeadline, ABORT, WAIT, STALL_SECONDS
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(deadlines.time, "time", lambda: now[0])
+    return now
+
+
+def test_falling_eta_without_progress_is_not_a_stall(clock):
+    deadline = JobDeadline(budget_seconds=3 * STALL_SECONDS)
+    eta = 2 * STALL_SECONDS
+    for _ in range(4):
+        deadline.observe({"status": "Pending", "eta_seconds": eta})
+        assert deadline.decide(can_hand_off=True) == WAIT
+        clock[0] += STALL_SECONDS * 0.6
+        eta -= 10
+
+
+def test_unchanging_eta_is_a_stall(clock):
+    deadline = JobDeadline(budget_seconds=3 * STALL_SECONDS)
+    deadline.observe({"status": "Pending", "eta_seconds": 60})
+    clock[0] += STALL_SECONDS + 1
+    deadline.observe({"status": "Pending", "eta_seconds": 60})
+    assert deadline.decide(can_hand_off=True) == ABORT
+
+
+def test_unchanging_progress_is_a_stall(clock):
+    deadline = JobDeadline(budget_seconds=3 * STALL_SECONDS)
+    deadline.observe({"status": "Pending", "progress": 40})
+    clock[0] += STALL_SECONDS / 2
+    deadline.observe({"status": "Pending", "progress": 50})
+    clock[0] += STALL_SECONDS / 2 + 1
+    assert deadline.decide(can_hand_off=True) == WAIT
+    clock[0] += STALL_SECONDS
+    deadline.observe({"status": "Pending", "progress": 50})
+    assert deadline.decide(can_hand_off=True) == ABORT
+
+
+def test_no_progress_reports_never_stall(clock):
+    deadline = JobDeadline(budget_seconds=3 * STALL_SECONDS)
+    clock[0] += 2 * STALL_SECONDS
+    deadline.observe({"status": "Pending"})
+    assert deadline.decide(can_hand_off=True) == WAIT
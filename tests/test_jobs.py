@@ -0,0 +1,63 @@
+# tests/test_jobs.py
+import time
+import pytest
+from utils import job_worker, jobs
+from utils.job_worker import JobPollWorker
+from utils.jobs import LocalJobStore, StubCancelBackend, cancel_job, finish_job, track_job
+from utils.repository import InMemoryRepository
+
+REPORT = {"l1_analysis_report": {"industry_analysis": {"claimed_industry": "Fintech"}}, "scoring_report": {}}
+
+
+class Backend:
+    """Answers the worker's status polls with whatever the test sets."""
+
+    def __init__(self):
+        self.status = {"status": "Pending"}
+
+    def request(self, *args, **kwargs):
+        return self
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self.status
+
+
+@pytest.fixture
+def setup(monkeypatch):
+    store, repository, backend = LocalJobStore(), InMemoryRepository(), Backend()
+    monkeypatch.setattr(jobs, "get_job_store", lambda: store)
+    monkeypatch.setattr(jobs, "get_cancel_backend", StubCancelBackend)
+    monkeypatch.setattr(jobs, "get_repository", lambda: repository)
+    monkeypatch.setattr(job_worker, "get_repository", lambda: repository)
+    monkeypatch.setattr(job_worker, "guarded_request", backend.request)
+
+    company_id = repository.create_company("Acme")
+    track_job("job-1", "analyze", company_id, first_poll_in=0, deadline=time.time() + 600)
+    worker = JobPollWorker(store, "worker-1", poll_interval=0)
+    worker.run_once()  # Leases the job; the backend says it's still running
+    return store, repository, backend, worker, company_id
+
+
+def test_cancel_then_a_completed_poll_keeps_the_job_cancelled(setup):
+    store, repository, backend, worker, company_id = setup
+    cancel_job("job-1", "Cancelled by the analyst")
+    backend.status = {"status": "Complete", "result": REPORT}
+    worker.run_once()  # Still holds the lease: renewals only run every lease_seconds / 3
+
+    assert store.get("job-1")["status"] == "Cancelled"
+    assert repository.get_current_report(company_id) is None
+    assert repository.list_analyses() == []
+
+
+def test_backend_cancellation_is_final(setup):
+    store, repository, backend, worker, company_id = setup
+    backend.status = {"status": "Cancelled"}
+    worker.run_once()
+
+    assert store.get("job-1")["status"] == "Cancelled"
+    assert repository._get("companies", company_id)["analysis_status"] == "Cancelled"
+    assert not finish_job("job-1", "Complete")
+    assert store.get("job-1")["status"] == "Cancelled"
@@ -0,0 +1,69 @@
+# tests/test_repository.py
+import threading
+import pytest
+from utils.repository import SqliteRepository, _LocalRepository
+from utils.rollups import all_shard_doc_ids, portfolio_summary
+
+WRITERS = 4
+WRITES_EACH = 25
+
+
+def run_concurrently(path, write):
+    # One repository per writer, so each has its own connection and lock, like separate processes
+    repositories = [SqliteRepository(path) for _ in range(WRITERS)]
+
+    def writer(index, repository):
+        for i in range(WRITES_EACH):
+            write(repository, index, i)
+
+    threads = [threading.Thread(target=writer, args=(n, r)) for n, r in enumerate(repositories)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return repositories[0]
+
+
+def test_concurrent_fund_config_updates_are_all_kept(tmp_path):
+    repository = run_concurrently(
+        str(tmp_path / "repository.sqlite3"),
+        lambda repository, index, i: repository.update_fund_config(f"field_{index}_{i}", i)
+    )
+    assert len(repository.load_fund_config()) == WRITERS * WRITES_EACH
+
+
+def test_concurrent_report_saves_are_all_counted(tmp_path):
+    def save(repository, index, i):
+        company_id = f"company-{index}-{i}"
+        repository.create_company(company_id, company_id)
+        repository.save_report(company_id, {
+            "l1_analysis_report": {"industry_analysis": {"claimed_industry": "Fintech"}},
+            "scoring_report": {"team_assessment": {"score": 3}}
+        })
+
+    repository = run_concurrently(str(tmp_path / "repository.sqlite3"), save)
+    summary = portfolio_summary(repository.get_portfolio_rollups())
+    assert summary["industries"]["Fintech"]["analyses"] == WRITERS * WRITES_EACH
+    assert len(repository.list_analyses()) == WRITERS * WRITES_EACH
+
+
+def test_failed_save_leaves_nothing_behind(tmp_path, monkeypatch):
+    repository = SqliteRepository(str(tmp_path / "repository.sqlite3"))
+    company_id = repository.create_company("Acme")
+
+    def fail(*args):
+        raise RuntimeError("disk full")
+    monkeypatch.setattr(repository, "_write_company", fail)
+    with pytest.raises(RuntimeError):
+        repository.save_report(company_id, {"scoring_report": {"team_assessment": {"score": 3}}})
+
+    assert repository.get_report_version(company_id, 1) is None
+    assert all(repository._get("portfolio_rollups", doc_id) is None for doc_id in all_shard_doc_ids())
+
+
+def test_an_offline_repository_must_implement_every_storage_primitive():
+    class NoFiles(_LocalRepository):
+        _get = _put = _list = lambda self, *args: None
+
+    with pytest.raises(TypeError, match="_put_file"):
+        NoFiles()
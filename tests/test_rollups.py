@@ -0,0 +1,114 @@
+# tests/test_rollups.py
+from utils.rollups import (
+    apply_deltas, combine_shards, portfolio_summary, report_contribution, rollup_deltas, shard_doc_id
+)
+
+SAVED_AT = "2026-10-18T12:00:00"
+
+
+def make_report(industry: str, **scores) -> dict:
+    return {
+        "l1_analysis_report": {"industry_analysis": {"claimed_industry": industry}},
+        "scoring_report": {f"{factor}_assessment": {"score": score} for factor, score in scores.items()}
+    }
+
+
+class Portfolio:
+    """Saves reports the way the repositories do, with companies' contributions kept alongside."""
+
+    def __init__(self):
+        self.rollups = {}
+        self.contributions = {}
+
+    def save(self, company_id: str, report: dict, first_report: bool = True, saved_at: str = SAVED_AT,
+             shard: int = 0):
+        contribution = report_contribution(report)
+        deltas = rollup_deltas(self.contributions.get(company_id), contribution, first_report, saved_at)
+        for name, doc_deltas in deltas.items():
+            doc_id = shard_doc_id(name, shard)
+            self.rollups[doc_id] = apply_deltas(self.rollups.get(doc_id, {}), doc_deltas)
+        self.contributions[company_id] = contribution
+
+    def summary(self) -> dict:
+        return portfolio_summary(combine_shards(self.rollups))
+
+
+def test_first_report_is_counted():
+    portfolio = Portfolio()
+    portfolio.save("a", make_report("Fintech", team=4, market=2))
+    summary = portfolio.summary()
+
+    fintech = summary["industries"]["Fintech"]
+    assert fintech["analyses"] == 1
+    assert fintech["mean_score"] == {"count": 1, "mean": 3.0, "stddev": 0.0}
+    assert fintech["factors"]["team"]["mean"] == 4.0
+    assert summary["factors"]["market"] == {"count": 1, "mean": 2.0, "stddev": 0.0}
+    assert summary["months"] == {"2026-10": {"reports_saved": 1, "companies_completed": 1}}
+
+
+def test_resave_replaces_the_previous_contribution():
+    portfolio = Portfolio()
+    portfolio.save("a", make_report("Fintech", team=2))
+    portfolio.save("b", make_report("Fintech", team=4))
+    portfolio.save("a", make_report("Healthtech", team=5), first_report=False)
+    summary = portfolio.summary()
+
+    assert summary["industries"]["Fintech"]["analyses"] == 1
+    assert summary["industries"]["Fintech"]["factors"]["team"]["mean"] == 4.0
+    assert summary["industries"]["Healthtech"]["analyses"] == 1
+    assert summary["factors"]["team"]["count"] == 2
+    assert summary["factors"]["team"]["mean"] == 4.5
+    assert summary["months"]["2026-10"] == {"reports_saved": 3, "companies_completed": 2}
+
+
+def test_resave_of_an_uncounted_report_removes_nothing():
+    # "b" was saved before rollups existed, so it has no recorded contribution
+    portfolio = Portfolio()
+    portfolio.save("a", make_report("Fintech", team=8))
+    portfolio.save("b", make_report("Fintech", team=3), first_report=False)
+    summary = portfolio.summary()
+
+    assert summary["industries"]["Fintech"]["analyses"] == 2
+    assert summary["industries"]["Fintech"]["factors"]["team"] == {"count": 2, "mean": 5.5, "stddev": 2.5}
+    assert summary["months"]["2026-10"] == {"reports_saved": 2, "companies_completed": 1}
+
+
+def test_industry_emptied_by_a_resave_is_left_out():
+    portfolio = Portfolio()
+    portfolio.save("a", make_report("Fintech", team=3))
+    portfolio.save("a", make_report("Edtech", team=3), first_report=False)
+
+    assert list(portfolio.summary()["industries"]) == ["Edtech"]
+
+
+def test_shards_add_up():
+    portfolio = Portfolio()
+    portfolio.save("a", make_report("Fintech", team=1), shard=0)
+    portfolio.save("b", make_report("Fintech", team=3), shard=3)
+    portfolio.save("a", make_report("Fintech", team=5), first_report=False, saved_at="2026-11-02T09:00:00", shard=1)
+    summary = portfolio.summary()
+
+    assert summary["industries"]["Fintech"]["analyses"] == 2
+    assert summary["factors"]["team"] == {"count": 2, "mean": 4.0, "stddev": 1.0}
+    assert summary["months"] == {
+        "2026-10": {"reports_saved": 2, "companies_completed": 2},
+        "2026-11": {"reports_saved": 1, "companies_completed": 0}
+    }
+
+
+def test_deltas_have_no_empty_maps():
+    # Merge writes of empty maps would wipe the stats stored under them
+    deltas = rollup_deltas(None, report_contribution(make_report("Fintech")), True, SAVED_AT)
+
+    def maps(doc):
+        for value in doc.values():
+            if isinstance(value, dict):
+                yield value
+                yield from maps(value)
+
+    assert all(m for doc in deltas.values() for m in maps(doc))
+
+
+def test_report_contribution_ignores_malformed_scores():
+    report = make_report("", team=4, market="n/a", product=True)
+    assert report_contribution(report) == {"industry": "Unknown", "mean_score": 4.0, "factors": {"team": 4.0}}
@@ -0,0 +1,53 @@
+# tests/test_session_memory.py
+import threading
+import pytest
+from streamlit.runtime.state.session_state import SessionState
+from utils import session_memory
+from utils.session_memory import SessionAnchor, SessionMemoryManager
+
+
+@pytest.fixture
+def session(monkeypatch, tmp_path):
+    state = SessionState()
+    anchor = state["_session_anchor"] = SessionAnchor()
+    state["chat_history"] = ["question"] * 100
+    monkeypatch.setattr(session_memory, "_session_state", lambda session_id: state)
+    manager = SessionMemoryManager(budget_bytes=10 ** 9, idle_seconds=60, spill_dir=str(tmp_path))
+    return manager, state, anchor
+
+
+def in_another_run(target):
+    errors = []
+
+    def run():
+        try:
+            target()
+        except Exception as e:
+            errors.append(e)
+    thread = threading.Thread(target=run)
+    thread.start()
+    thread.join()
+    if errors:
+        raise errors[0]
+
+
+def test_timer_fragment_runs_dont_keep_a_tab_active(session, monkeypatch):
+    manager, state, anchor = session
+    now = [1000.0]
+    monkeypatch.setattr(session_memory.time, "time", lambda: now[0])
+    in_another_run(lambda: manager.touch("tab", anchor, 1000))
+    for _ in range(20):
+        now[0] += 5
+        in_another_run(lambda: manager.heartbeat("tab", active=False))
+
+    manager.sweep("someone-else")
+    assert "chat_history" not in state
+
+
+def test_a_session_with_a_script_running_is_not_spilled(session):
+    manager, state, anchor = session
+    manager.idle_seconds = 0
+    manager.touch("tab", anchor, 1000)  # This thread is the session's running script
+
+    manager.sweep("someone-else")
+    assert "chat_history" in state
@@ -0,0 +1,36 @@
+# tests/test_uploads.py
+import pytest
+from utils import uploads
+from utils.uploads import MAX_DOCUMENT_MB, DirectUploadWatcher, object_name, upload_rejection
+
+
+def test_object_name_stays_in_the_company_folder():
+    assert object_name("c1", "../../other/deck.pdf") == "companies/c1/deck.pdf"
+    assert object_name("c1", "..\\deck.pdf") == "companies/c1/deck.pdf"
+    assert object_name("c1", "..") == "companies/c1/document"
+    assert object_name("c1", "deck.pdf", folder="slim") == "companies/c1/slim/deck.pdf"
+
+
+def test_object_name_drops_control_characters():
+    assert object_name("c1", "pitch\x00\ndeck\x1b.pdf") == "companies/c1/pitchdeck.pdf"
+
+
+def test_upload_rejection():
+    assert upload_rejection({"name": "Deck.PDF", "size": 1024}) is None
+    assert upload_rejection({"name": "payload.exe", "size": 1024})
+    assert upload_rejection({"name": "deck", "size": 1024})
+    assert upload_rejection({"name": "deck.pdf", "size": MAX_DOCUMENT_MB * 1024 * 1024 + 1})
+
+
+def test_direct_upload_watcher_resolves_uploads_without_an_upload_worker(monkeypatch):
+    landed = {"memo.pdf": "https://storage.example.com/memo.pdf"}
+    monkeypatch.setattr(uploads, "_finalize_direct_upload", lambda company_id, file: landed.get(file["name"]))
+    monkeypatch.setattr(uploads, "get_upload_executor", lambda: pytest.fail("Waiting took an upload worker"))
+    watcher = DirectUploadWatcher(wait_seconds=0)
+
+    memo = watcher.watch("c1", {"name": "memo.pdf"})
+    missing = watcher.watch("c1", {"name": "model.pdf"})
+    assert memo.result(timeout=5) == "https://storage.example.com/memo.pdf"
+    with pytest.raises(TimeoutError):
+        missing.result(timeout=5)
+    assert watcher.stats() == {"watched_uploads": 0}
@@ -0,0 +1,218 @@
+# utils/admission.py
+"""
+Admission control for backend jobs.
+
+Every `/analyze/all`, `/analyze/update` and `/analyze/slides` job has to
+get a ticket from the process-wide AdmissionController first, and holds it
+until the job finishes. The controller caps how many jobs of each type
+(and how many in total) run at once, across every instance: besides its
+own tickets, it counts the pending jobs other instances submitted, from
+the shared job store (see utils/jobs.py), re-read at most every
+ADMISSION_SYNC_SECONDS while tickets wait. Instances that admit within
+the same interval can briefly overshoot a cap between them; a job that
+was admitted but not yet submitted is only seen by its own instance.
+Waiting tickets are admitted by:
+
+1. lane: interactive work (Q&A updates, requested decks) before bulk
+   analyses, and both before speculative work;
+2. fairness: the analyst with the fewest jobs already running goes first,
+   so one person submitting a batch can't hold up everyone else;
+3. arrival order.
+
+A ticket blocked by its job type's cap doesn't hold up other job types.
+Queue positions and start-time estimates come from a running average of
+how long each job type takes.
+"""
+import heapq
+import itertools
+import threading
+import time
+from collections import Counter
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+from utils.app_logging import get_logger
+from utils.jobs import get_job_store, INSTANCE_ID
+from utils.metrics import get_metrics
+
+logger = get_logger(__name__)
+
+JOB_ANALYZE = "analyze"
+JOB_UPDATE = "update"
+JOB_SLIDES = "slides"
+
+LANE_INTERACTIVE = 0
+LANE_BULK = 1
+LANE_SPECULATIVE = 2
+
+JOB_TYPE_CAPS = {
+    JOB_ANALYZE: int(st.secrets.get("ADMISSION_MAX_ANALYZE_JOBS", 4)),
+    JOB_UPDATE: int(st.secrets.get("ADMISSION_MAX_UPDATE_JOBS", 6)),
+    JOB_SLIDES: int(st.secrets.get("ADMISSION_MAX_SLIDES_JOBS", 3)),
+}
+ADMISSION_MAX_JOBS = int(st.secrets.get("ADMISSION_MAX_JOBS", 10))
+ADMISSION_SYNC_SECONDS = float(st.secrets.get("ADMISSION_SYNC_SECONDS", 5))  # Between job store reads
+
+# Starting estimates, refined as jobs finish
+DEFAULT_JOB_SECONDS = {JOB_ANALYZE: 420, JOB_UPDATE: 120, JOB_SLIDES: 150}
+DURATION_SMOOTHING = 0.2
+
+
+class Ticket:
+    """A place in the admission queue, and then a running-job slot."""
+
+    def __init__(self, controller, job_type: str, analyst: str, lane: int, seq: int):
+        self.controller = controller
+        self.job_type = job_type
+        self.analyst = analyst
+        self.lane = lane
+        self.seq = seq
+        self.admitted_at = None
+        self._admitted = threading.Event()
+
+    def wait(self, timeout: float | None = None) -> bool:
+        """Blocks until admitted or `timeout` passes. Returns whether admitted."""
+        return self._admitted.wait(timeout)
+
+    def release(self):
+        """Frees the slot, or leaves the queue if not admitted yet. Safe to call twice."""
+        self.controller.release(self)
+
+
+class AdmissionController:
+    def __init__(self, caps: dict[str, int], max_jobs: int, default_seconds: dict[str, float],
+                 elsewhere=None, sync_seconds: float = ADMISSION_SYNC_SECONDS):
+        self.caps = dict(caps)
+        self.max_jobs = max_jobs
+        self.sync_seconds = sync_seconds
+        # () -> [(job_type, analyst)] for the jobs other instances are running
+        self._elsewhere = elsewhere
+        self._elsewhere_by_type = Counter()
+        self._elsewhere_by_analyst = Counter()
+        self._synced_at = 0.0
+        self._durations = dict(default_seconds)
+        self._waiting: list[Ticket] = []
+        self._running: set[Ticket] = set()
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+
+    def sync(self):
+        """
+        Re-reads what other instances are running, if the last read is older
+        than `sync_seconds`, and admits whatever now fits. Call while waiting.
+        """
+        if self._elsewhere is None:
+            return
+        with self._lock:
+            now = time.time()
+            if now - self._synced_at < self.sync_seconds:
+                return
+            self._synced_at = now  # One reader per interval, however many tickets are waiting
+        try:
+            jobs = self._elsewhere()
+        except Exception as e:
+            logger.warning(f"Could not read other instances' jobs; using the last counts: {e}")
+            jobs = None
+        with self._lock:
+            if jobs is not None:
+                self._elsewhere_by_type = Counter(job_type for job_type, _ in jobs)
+                self._elsewhere_by_analyst = Counter(analyst for _, analyst in jobs)
+            self._grant()
+
+    def request(self, job_type: str, analyst: str, lane: int) -> Ticket:
+        self.sync()
+        with self._lock:
+            ticket = Ticket(self, job_type, analyst, lane, next(self._seq))
+            self._waiting.append(ticket)
+            self._grant()
+            return ticket
+
+    def release(self, ticket: Ticket):
+        with self._lock:
+            if ticket in self._running:
+                self._running.discard(ticket)
+                elapsed = time.time() - ticket.admitted_at
+                average = self._durations.get(ticket.job_type, elapsed)
+                self._durations[ticket.job_type] = (1 - DURATION_SMOOTHING) * average + DURATION_SMOOTHING * elapsed
+            elif ticket in self._waiting:
+                self._waiting.remove(ticket)
+            self._grant()
+
+    def position(self, ticket: Ticket) -> int | None:
+        """How many waiting jobs of the same type are ahead of `ticket` (None once admitted)."""
+        with self._lock:
+            if ticket not in self._waiting:
+                return None
+            queue = [t for t in self._ordered_waiting() if t.job_type == ticket.job_type]
+            return queue.index(ticket)
+
+    def eta_seconds(self, ticket: Ticket) -> float:
+        """Rough wait until `ticket` is admitted, from the average duration of its job type."""
+        with self._lock:
+            if ticket not in self._waiting:
+                return 0.0
+            average = self._durations[ticket.job_type]
+            now = time.time()
+            # When each slot for this job type frees up; other instances' jobs are, on average, half done
+            slots = [
+                max(average - (now - t.admitted_at), 0.0)
+                for t in self._running if t.job_type == ticket.job_type
+            ]
+            slots += [average / 2] * self._elsewhere_by_type[ticket.job_type]
+            slots += [0.0] * max(self.caps[ticket.job_type] - len(slots), 0)
+            if not slots:
+                return average
+            heapq.heapify(slots)
+            queue = [t for t in self._ordered_waiting() if t.job_type == ticket.job_type]
+            start = 0.0
+            for _ in range(queue.index(ticket) + 1):
+                start = heapq.heappop(slots)
+                heapq.heappush(slots, start + average)
+            return start
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "running": dict(Counter(t.job_type for t in self._running)),
+                "waiting": dict(Counter(t.job_type for t in self._waiting)),
+                "running_elsewhere": dict(self._elsewhere_by_type),
+                "average_seconds": {k: round(v, 1) for k, v in self._durations.items()}
+            }
+
+    # --- Internals (call with the lock held) ---
+    def _ordered_waiting(self) -> list[Ticket]:
+        running_by_analyst = Counter(t.analyst for t in self._running) + self._elsewhere_by_analyst
+        return sorted(self._waiting, key=lambda t: (t.lane, running_by_analyst[t.analyst], t.seq))
+
+    def _grant(self):
+        admitted = True
+        running_elsewhere = sum(self._elsewhere_by_type.values())
+        while admitted and self._waiting and len(self._running) + running_elsewhere < self.max_jobs:
+            admitted = False
+            running_by_type = Counter(t.job_type for t in self._running) + self._elsewhere_by_type
+            for ticket in self._ordered_waiting():
+                if running_by_type[ticket.job_type] < self.caps.get(ticket.job_type, self.max_jobs):
+                    self._waiting.remove(ticket)
+                    self._running.add(ticket)
+                    ticket.admitted_at = time.time()
+                    ticket._admitted.set()
+                    admitted = True
+                    # Fairness counts have changed; re-sort before the next grant
+                    break
+
+
+@st.cache_resource
+def get_admission_controller() -> AdmissionController:
+    """The single AdmissionController shared by every session in this process."""
+    store = get_job_store()
+    controller = AdmissionController(
+        JOB_TYPE_CAPS, ADMISSION_MAX_JOBS, DEFAULT_JOB_SECONDS,
+        elsewhere=lambda: store.pending_elsewhere(INSTANCE_ID)
+    )
+    get_metrics().register_stats("admission", controller.stats)
+    return controller
+
+
+def current_analyst() -> str:
+    """Who fair queuing groups a job under: the browser session, or "background"."""
+    ctx = get_script_run_ctx(suppress_warning=True)
+    return ctx.session_id if ctx is not None else "background"
@@ -0,0 +1,75 @@
+# utils/analysis_cache.py
+"""
+Cache keys for skipping identical analyses.
+
+A key is the SHA-256 of the analysis inputs in canonical form: the
+company name, the *contents* of every document (not their URLs, which
+change on every upload), the investment thesis with its industry weights,
+and the portfolio. Order doesn't matter anywhere. Uploaded documents are
+identified by their MD5 in the form Cloud Storage reports it, so a file
+hashes the same through the browser uploader and st.file_uploader.
+Entries are stored in the repository (see utils/repository.py) by
+get_cached_analysis / store_cached_analysis.
+"""
+import hashlib
+import json
+import requests
+import streamlit as st
+from utils.app_logging import get_logger
+from utils.uploads import get_upload_backend, object_name, content_md5
+
+logger = get_logger(__name__)
+
+
+def file_md5(fileobj) -> str:
+    """Hashes an in-memory upload without reading it all at once, the same way storage does."""
+    fileobj.seek(0)
+    fingerprint = content_md5(fileobj)
+    fileobj.seek(0)
+    return fingerprint
+
+
+def url_fingerprint(url: str) -> str | None:
+    """
+    Best-effort identity for a document we only have a URL for, from the
+    server's validators. Returns None if the server offers none, since the
+    URL alone says nothing about whether the content changed.
+    """
+    try:
+        response = requests.head(url, allow_redirects=True, timeout=10)
+        response.raise_for_status()
+    except requests.exceptions.RequestException as e:
+        logger.info(f"Could not fingerprint {url}: {e}")
+        return None
+    validators = [response.headers.get(h) for h in ("ETag", "Last-Modified", "Content-Length")]
+    if not any(validators[:2]):
+        return None
+    return "url:" + hashlib.sha256("|".join([url] + [v or "" for v in validators]).encode()).hexdigest()
+
+
+def document_hashes(direct_company_id: str | None, direct_files: list[dict],
+                    uploaded_files: list, doc_urls: list[str]) -> list[str] | None:
+    """Content hashes for every input document, or None if any can't be hashed."""
+    backend = get_upload_backend()
+    hashes = []
+    for file in direct_files:
+        hashes.append(backend.content_hash(object_name(direct_company_id, file["name"])))
+    for file in uploaded_files:
+        hashes.append(file_md5(file))
+    for url in doc_urls:
+        hashes.append(url_fingerprint(url))
+    return None if None in hashes else hashes
+
+
+def analysis_cache_key(company_name: str, hashes: list[str], investing_thesis: dict, portfolio: list[str]) -> str:
+    canonical = {
+        "company_name": company_name.strip().lower(),
+        "documents": sorted(hashes),
+        "overall_thesis": investing_thesis.get("overall_thesis", "").strip(),
+        "industry_weights": sorted(
+            (w["industry"], w["weight"]) for w in investing_thesis.get("industry_weights", [])
+        ),
+        "portfolio": sorted(portfolio)
+    }
+    payload = json.dumps(canonical, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
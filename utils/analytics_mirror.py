@@ -0,0 +1,325 @@
+# utils/analytics_mirror.py
+"""
+A local, columnar copy of every completed analysis, for portfolio queries.
+
+Questions like "average financial score of Fintech deals this quarter"
+would otherwise stream every full report out of Firestore. Instead, each
+instance keeps a DuckDB file (ANALYTICS_MIRROR_PATH) with the reports
+flattened into a few narrow tables:
+
+    analyses       one row per company: name, version, dates, industries,
+                   founder count, market sizing, mean factor score, and
+                   risk and discrepancy counts
+    factor_scores  one row per company and scoring factor (score, rating,
+                   risk counts)
+    industries     the claimed and activity-based industry of each company
+    risks          every identified risk, from the scoring report and the
+                   externalities analysis
+
+The mirror subscribes to the Analysis History's snapshot listener
+(utils/live_history.py) rather than opening one of its own, so it sees
+saves made by any instance, and is restarted with that listener if
+Firestore closes it. The first snapshot fills it; after that each save
+to a completed company updates only that company's rows. Companies
+already mirrored at their current report version are skipped, so
+restarts don't rewrite the file.
+
+Query it with `portfolio_query(sql)`; the history page shows
+`industry_summary()` from it. DuckDB locks its file
+while the app has it open, so with ANALYTICS_PARQUET_DIR set the tables
+are also written there as Parquet after every change, for notebooks and
+dashboards.
+
+DuckDB is optional (`pip install duckdb`); it is imported only when the
+mirror is switched on, by setting ANALYTICS_MIRROR_PATH.
+"""
+import os
+import threading
+from datetime import datetime
+import pandas as pd
+import streamlit as st
+from utils.app_logging import get_logger
+from utils.live_history import get_live_history
+from utils.metrics import get_metrics
+
+logger = get_logger(__name__)
+
+ANALYTICS_MIRROR_PATH = st.secrets.get("ANALYTICS_MIRROR_PATH", "")  # Empty leaves the mirror off
+ANALYTICS_PARQUET_DIR = st.secrets.get("ANALYTICS_PARQUET_DIR", "")
+FIRST_SYNC_TIMEOUT = 30  # Seconds a query waits for the first snapshot
+
+FACTOR_SUFFIX = "_assessment"
+HIGH_SEVERITIES = ("High", "High Risk")
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS analyses (
+        company_id VARCHAR PRIMARY KEY,
+        company_name VARCHAR,
+        report_version INTEGER,
+        created_at TIMESTAMP,
+        updated_at TIMESTAMP,
+        claimed_industry VARCHAR,
+        activity_industry VARCHAR,
+        industry_is_coherent BOOLEAN,
+        founder_count INTEGER,
+        tam DOUBLE,
+        sam DOUBLE,
+        som DOUBLE,
+        mean_factor_score DOUBLE,
+        risk_count INTEGER,
+        high_risk_count INTEGER,
+        existential_threat BOOLEAN,
+        discrepancy_findings INTEGER,
+        high_risk_findings INTEGER,
+        verified_claims INTEGER,
+        follow_up_questions INTEGER
+    );
+    CREATE TABLE IF NOT EXISTS factor_scores (
+        company_id VARCHAR,
+        factor VARCHAR,
+        score DOUBLE,
+        rating VARCHAR,
+        risk_count INTEGER,
+        high_risk_count INTEGER
+    );
+    CREATE TABLE IF NOT EXISTS industries (company_id VARCHAR, industry VARCHAR, kind VARCHAR);
+    CREATE TABLE IF NOT EXISTS risks (
+        company_id VARCHAR,
+        source VARCHAR,
+        category VARCHAR,
+        severity VARCHAR,
+        description VARCHAR
+    );
+"""
+TABLES = ("analyses", "factor_scores", "industries", "risks")
+
+
+def _timestamp(value) -> datetime | None:
+    if isinstance(value, datetime):
+        return value
+    try:
+        return datetime.fromisoformat(value) if value else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _number(value) -> float | None:
+    return float(value) if isinstance(value, (int, float)) and not isinstance(value, bool) else None
+
+
+def flatten_report(company_id: str, data: dict) -> dict[str, list[tuple]]:
+    """A company document's rows for each table."""
+    report = data.get("analysis_report") or {}
+    l1 = report.get("l1_analysis_report") or {}
+    scoring = report.get("scoring_report") or {}
+    discrepancies = report.get("discrepancy_report") or {}
+    industry = l1.get("industry_analysis") or {}
+    financial = l1.get("financial_analysis") or {}
+    sizing = financial.get("analyst_sizing") or {}
+    externalities = l1.get("externalities_analysis") or {}
+
+    factor_rows, risk_rows = [], []
+    for key, assessment in scoring.items():
+        if not isinstance(assessment, dict):
+            continue
+        factor = key.removesuffix(FACTOR_SUFFIX)
+        risks = assessment.get("identified_risks") or []
+        factor_rows.append((
+            company_id, factor, _number(assessment.get("score")), assessment.get("rating"),
+            len(risks), sum(1 for r in risks if r.get("severity") in HIGH_SEVERITIES)
+        ))
+        risk_rows.extend(
+            (company_id, "scoring", factor, r.get("severity"), r.get("factor")) for r in risks
+        )
+    risk_rows.extend(
+        (company_id, "externalities", r.get("category"), r.get("impact"), r.get("risk_description"))
+        for r in externalities.get("identified_risks") or []
+    )
+
+    industry_rows = [
+        (company_id, name, kind)
+        for kind, name in (("claimed", industry.get("claimed_industry")),
+                           ("activity", industry.get("activity_based_industry")))
+        if name
+    ]
+    scores = [row[2] for row in factor_rows if row[2] is not None]
+    findings = discrepancies.get("assessed_findings") or []
+    analysis_row = (
+        company_id,
+        data.get("company_analysed") or l1.get("company_analysed"),
+        data.get("report_version"),
+        _timestamp(data.get("created_at")),
+        _timestamp(data.get("updated_at")),
+        industry.get("claimed_industry"),
+        industry.get("activity_based_industry"),
+        industry.get("is_coherent_with_claims"),
+        (l1.get("founder_analysis") or {}).get("founder_count"),
+        _number(sizing.get("tam")),
+        _number(sizing.get("sam")),
+        _number(sizing.get("som")),
+        sum(scores) / len(scores) if scores else None,
+        len(risk_rows),
+        sum(1 for row in risk_rows if row[3] in HIGH_SEVERITIES),
+        externalities.get("existential_threat_identified"),
+        len(findings),
+        sum(1 for f in findings if f.get("risk_assessment") in HIGH_SEVERITIES),
+        len(discrepancies.get("successfully_verified_claims") or []),
+        len(discrepancies.get("follow_up_questions") or [])
+    )
+    return {"analyses": [analysis_row], "factor_scores": factor_rows, "industries": industry_rows, "risks": risk_rows}
+
+
+class AnalyticsMirror:
+    """Completed analyses, flattened into a local DuckDB file and kept in sync."""
+
+    def __init__(self, path: str, parquet_dir: str = ""):
+        import duckdb  # Optional; only needed once the mirror is switched on
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.parquet_dir = parquet_dir
+        self.synced = 0
+        self.skipped = 0
+        self._conn = duckdb.connect(path)
+        self._conn.execute(SCHEMA)
+        self._versions = dict(self._conn.execute("SELECT company_id, report_version FROM analyses").fetchall())
+        self._ready = threading.Event()
+        self._lock = threading.Lock()
+
+    def start(self):
+        get_live_history().subscribe(self.apply_changes)
+
+    def stop(self):
+        get_live_history().unsubscribe(self.apply_changes)
+
+    def apply_changes(self, changes: list[tuple[str, str, dict]]):
+        """Applies (change type, company_id, data) tuples from the listener."""
+        with self._lock:
+            updates = {}
+            for change_type, company_id, data in changes:
+                if change_type == "REMOVED" or data.get("analysis_status") != "Complete":
+                    # Not (or no longer) complete, e.g. a re-run is pending; its last report stays queryable
+                    continue
+                if data.get("report_version") is not None and self._versions.get(company_id) == data["report_version"]:
+                    self.skipped += 1
+                    continue
+                try:
+                    updates[company_id] = (data.get("report_version"), flatten_report(company_id, data))
+                except Exception as e:
+                    logger.error(f"Could not flatten the report for {company_id}: {e}")
+            if updates:
+                try:
+                    self._write(updates)
+                except Exception as e:
+                    logger.error(f"Could not update the analytics mirror with {len(updates)} reports: {e}")
+                else:
+                    if self.parquet_dir:
+                        self._export_parquet()
+        self._ready.set()
+
+    def wait_until_ready(self, timeout: float) -> bool:
+        return self._ready.wait(timeout)
+
+    def query(self, sql: str, params: list | None = None) -> pd.DataFrame:
+        """Runs a read-only SQL query against the mirror's tables."""
+        with self._lock:
+            return self._conn.execute(sql, params or []).df()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"companies": len(self._versions), "synced": self.synced, "skipped": self.skipped,
+                    "ready": self._ready.is_set()}
+
+    # --- Internals (call with the lock held) ---
+    def _write(self, updates: dict[str, tuple[int | None, dict]]):
+        """Replaces the rows of every company in `updates`, in one transaction."""
+        company_ids = [[company_id] for company_id in updates]
+        self._conn.execute("BEGIN TRANSACTION")
+        try:
+            for table in TABLES:
+                self._conn.executemany(f"DELETE FROM {table} WHERE company_id = ?", company_ids)
+                rows = [row for _, company_rows in updates.values() for row in company_rows[table]]
+                if rows:
+                    placeholders = ", ".join("?" * len(rows[0]))
+                    self._conn.executemany(f"INSERT INTO {table} VALUES ({placeholders})", rows)
+            self._conn.execute("COMMIT")
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+        for company_id, (version, _) in updates.items():
+            self._versions[company_id] = version
+        self.synced += len(updates)
+
+    def _export_parquet(self):
+        os.makedirs(self.parquet_dir, exist_ok=True)
+        for table in TABLES:
+            target = os.path.join(self.parquet_dir, f"{table}.parquet")
+            try:
+                # Written aside and swapped in, so readers never see half a file
+                self._conn.execute(f"COPY {table} TO '{target}.tmp' (FORMAT PARQUET)")
+                os.replace(f"{target}.tmp", target)
+            except Exception as e:
+                logger.error(f"Could not export {table} to {target}: {e}")
+
+
+def analytics_mirror_enabled() -> bool:
+    return bool(ANALYTICS_MIRROR_PATH)
+
+
+@st.cache_resource
+def get_analytics_mirror() -> AnalyticsMirror:
+    """The single AnalyticsMirror shared by every session in this process, started on first use."""
+    mirror = AnalyticsMirror(ANALYTICS_MIRROR_PATH, ANALYTICS_PARQUET_DIR)
+    mirror.start()
+    get_metrics().register_stats("analytics_mirror", mirror.stats)
+    logger.info(f"Mirroring completed analyses to {ANALYTICS_MIRROR_PATH}")
+    return mirror
+
+
+def start_analytics_mirror():
+    """Starts syncing early, if the mirror is on, so the first query doesn't wait for it."""
+    if not analytics_mirror_enabled():
+        return
+    try:
+        get_analytics_mirror()
+    except ImportError as e:
+        logger.error(f"ANALYTICS_MIRROR_PATH is set but {e.name} is not installed; the mirror is off")
+
+
+def portfolio_query(sql: str, params: list | None = None) -> pd.DataFrame:
+    """
+    Runs `sql` against the mirror once its first sync is done, e.g.
+
+        SELECT a.claimed_industry, avg(f.score) FROM factor_scores f
+        JOIN analyses a USING (company_id)
+        WHERE f.factor = 'financial' AND a.updated_at >= date_trunc('quarter', now())
+        GROUP BY 1
+    """
+    mirror = get_analytics_mirror()
+    get_live_history().ensure_listening()
+    if not mirror.wait_until_ready(FIRST_SYNC_TIMEOUT):
+        logger.warning("Analytics mirror has not finished its first sync; results may be incomplete")
+    return mirror.query(sql, params)
+
+
+INDUSTRY_SUMMARY_SQL = """
+    SELECT coalesce(claimed_industry, 'Unknown') AS industry, count(*) AS analyses,
+           round(avg(mean_factor_score), 2) AS avg_score, sum(high_risk_count) AS high_risks,
+           max(updated_at) AS last_analyzed
+    FROM analyses GROUP BY 1 ORDER BY analyses DESC, industry
+"""
+
+
+def industry_summary() -> pd.DataFrame | None:
+    """Completed analyses per claimed industry, or None until the mirror has synced (or if it's off)."""
+    if not analytics_mirror_enabled():
+        return None
+    try:
+        mirror = get_analytics_mirror()
+    except ImportError:
+        return None
+    get_live_history().ensure_listening()
+    if not mirror.wait_until_ready(0):
+        return None
+    return mirror.query(INDUSTRY_SUMMARY_SQL)
@@ -1,48 +1,248 @@
 # utils/api_client.py
 import streamlit as st
+from utils.app_logging import get_logger
 import requests
+import threading
 import time
-from utils.firebase_client import save_analysis_to_firestore 
+from concurrent.futures import Future, as_completed
+from utils.repository import get_repository
+from utils.report_store import set_session_report, clear_session_report
+from utils.session_memory import keep_session_alive
+from utils.circuit_breaker import get_backend_breaker, guarded_request, CircuitOpenError
+from utils.jobs import (
+    get_job_store, track_job, cancel_job, cancel_current_session_jobs, cancel_button, hand_off_job
+)
+from utils.job_worker import get_job_worker, WORKER_TICK_SECONDS
+from utils.tracing import get_tracer, trace_headers, Span
+from utils.metrics import get_metrics
+from utils.deadlines import JobDeadline, EXTEND, ABORT, HAND_OFF, EXTENSION_SECONDS
+from utils.admission import (
+    get_admission_controller, current_analyst, Ticket,
+    JOB_ANALYZE, JOB_UPDATE, JOB_SLIDES, LANE_INTERACTIVE, LANE_BULK
+)
 
 BASE_URL = st.secrets["BACKEND_BASE_URL"]
 BACKEND_SUBMIT_URL = f"{BASE_URL}/analyze/all"
-BACKEND_STATUS_URL = f"{BASE_URL}/analyze/status/"
 BACKEND_UPDATE_URL = f"{BASE_URL}/analyze/update"
 BACKEND_SLIDES_URL = f"{BASE_URL}/analyze/slides"
+BACKEND_DOCUMENTS_URL = f"{BASE_URL}/analyze/documents/"
 
+logger = get_logger(__name__)
 
-# Polling parameters
-INITIAL_POLLING_DELAY = 60*4  # Seconds to wait before first status check
-POLLING_INTERVAL = 30  # Seconds to wait between status checks
-POLLING_TIMEOUT = 600  # 10 minutes total timeout for the whole process
 
-def run_analysis_pipeline(company_id: str, company_name: str, doc_urls: list[str]):
+# Polling parameters (the job worker does the polling; see utils/job_worker.py)
+INITIAL_POLLING_DELAY = int(st.secrets.get("INITIAL_POLLING_DELAY", 60*4))  # Seconds to wait before first status check
+POLLING_INTERVAL = int(st.secrets.get("POLLING_INTERVAL", 30))  # Seconds to wait before the first check on update and slide jobs
+POLLING_TIMEOUT = 600  # 10 minutes the analyst waits (each job's budget; see utils/deadlines.py)
+ADMISSION_CHECK_INTERVAL = 2  # Seconds between queue position updates
+JOB_STATE_CHECK_INTERVAL = 3  # Seconds between progress updates (and Cancel checks) while waiting
+JOB_RECORD_RETRY_SECONDS = 10  # Seconds between reads of a job's record once its next poll is overdue
+
+def _backend_request(method: str, url: str, **kwargs) -> requests.Response:
+    """All backend calls go through the shared circuit breaker."""
+    return guarded_request(get_backend_breaker(), method, url, **kwargs)
+
+def _submit_job(url: str, payload: dict, job_type: str, parent: Span) -> requests.Response:
+    """POSTs a job, in a "submit" span whose context the backend receives."""
+    with get_tracer().span("submit", parent=parent, job_type=job_type,
+                           company_id=payload.get("company_id")) as span:
+        response = _backend_request("post", url, json=payload, timeout=30, headers=trace_headers(span))
+        response.raise_for_status()
+        span.set_attribute("http.status_code", response.status_code)
+    get_metrics().jobs_submitted.inc(job_type=job_type)
+    return response
+
+def wait_for_admission(job_type: str, lane: int, on_queued=None) -> Ticket:
     """
-    Calls the FastAPI backend asynchronously for an *initial* analysis.
+    Blocks until the admission controller lets a job of this type start.
+    `on_queued(position, eta_seconds)` is called while waiting. The caller
+    must release the returned ticket once the job is finished.
     """
+    # Don't queue up for a backend that is known to be down
+    get_backend_breaker().check()
+    controller = get_admission_controller()
+    ticket = controller.request(job_type, current_analyst(), lane)
+    try:
+        while not ticket.wait(ADMISSION_CHECK_INTERVAL):
+            keep_session_alive()
+            controller.sync()  # Slots may have freed up on other instances
+            position = controller.position(ticket)
+            if on_queued and position is not None:
+                on_queued(position, controller.eta_seconds(ticket))
+    except BaseException:
+        # Includes Streamlit stopping the script for a rerun
+        ticket.release()
+        raise
+    return ticket
+
+def _wait_for_admission_with_status(job_type: str, lane: int) -> Ticket:
+    """wait_for_admission, showing the queue position in the current status box."""
+    placeholder = st.empty()
+
+    def show_queue(position: int, eta_seconds: float):
+        ahead = f"{position} other {job_type} job(s) ahead" if position else "next in line"
+        placeholder.info(f"Waiting for backend capacity ({ahead}). Estimated start in ~{max(1, round(eta_seconds / 60))} min.")
+
+    ticket = wait_for_admission(job_type, lane, on_queued=show_queue)
+    placeholder.empty()
+    return ticket
+
+def _stream_pending_documents(job_id: str, pending_documents: list[Future]):
+    """
+    Runs in a background thread: adds each document to the running job as
+    soon as its upload finishes, then tells the backend no more are coming.
+    """
+    documents_url = f"{BACKEND_DOCUMENTS_URL}{job_id}"
+    failed = 0
+    for future in as_completed(pending_documents):
+        try:
+            response = _backend_request("post", documents_url, json={"documents_url": [future.result()], "final": False}, timeout=30)
+            response.raise_for_status()
+        except Exception as e:
+            failed += 1
+            logger.error(f"Could not add a document to job {job_id}: {e}")
+
+    try:
+        response = _backend_request("post", documents_url, json={"documents_url": [], "final": True, "failed_documents": failed}, timeout=30)
+        response.raise_for_status()
+    except Exception as e:
+        logger.error(f"Could not close the document stream for job {job_id}: {e}")
+
+def build_investing_thesis() -> dict:
+    """The fund's thesis and industry weights, as sent to the backend."""
     preferences_dict = st.session_state.get("industry_preferences", {})
     weights_list = [
         {"industry": industry, "weight": weight} 
         for industry, weight in preferences_dict.items()
     ]
-    investing_thesis = {"overall_thesis": st.session_state.vc_thesis,
-                        "industry_weights": weights_list}
+    return {"overall_thesis": st.session_state.vc_thesis,
+            "industry_weights": weights_list}
+
+def use_cached_analysis(cached: dict) -> str:
+    """
+    Loads an earlier report for identical inputs instead of running the
+    pipeline. The report stays with the company it was made for, which
+    already has the documents; it is saved there again only if a later run
+    replaced it. Returns that company's ID.
+    """
+    company_id = cached["company_id"]
+    set_session_report(cached["report"])
+    st.session_state['analysis_complete'] = True
+    st.session_state['analysis_cached_at'] = cached["created_at"]
+    repository = get_repository()
+    if repository.get_current_report(company_id) != cached["report"]:
+        repository.save_report(company_id, cached["report"])
+    return company_id
+
+def _release_when_finished(ticket: Ticket, job_id: str):
+    """Runs in a background thread: holds the admission slot until an unattended job ends."""
+    store = get_job_store()
+    try:
+        while (store.get(job_id) or {}).get("status", "Pending") == "Pending":
+            time.sleep(POLLING_INTERVAL)
+    finally:
+        ticket.release()
+
+def _wait_for_job(job_id: str, deadline: JobDeadline, can_hand_off: bool, show=None,
+                  parent: Span | None = None) -> dict:
+    """
+    Waits for the job worker to finish a job, reading only the job's record,
+    in a "wait" span under `parent`.
+    `show(message)` is called with progress updates. Returns the final record,
+    whose status is "Complete", "Failed" or "Cancelled"; "TimedOut" if it was
+    cancelled for missing its deadline; or "Unattended" if the analyst's
+    budget ran out first (the worker still saves the result).
+    Each update also lets Streamlit stop the run promptly for a Cancel click.
+    """
+    get_job_worker().wake()  # Claim the job now rather than after the idle back-off
+    with get_tracer().span("wait", parent=parent, job_id=job_id) as span:
+        job = _wait_for_job_record(job_id, deadline, can_hand_off, show or (lambda message: None))
+        span.set_attribute("job_status", job["status"])
+    return job
+
+def _next_record_read(job: dict | None, now: float) -> float:
+    """
+    When a job's record is next worth reading: just after the worker's next
+    poll of the job, which is what changes it.
+    """
+    next_poll_at = (job or {}).get("next_poll_at")
+    if next_poll_at and next_poll_at + WORKER_TICK_SECONDS > now:
+        return next_poll_at + WORKER_TICK_SECONDS
+    return now + JOB_RECORD_RETRY_SECONDS
+
+def _wait_for_job_record(job_id: str, deadline: JobDeadline, can_hand_off: bool, show) -> dict:
+    store = get_job_store()
+    job, next_read = None, 0.0
+    while True:
+        keep_session_alive()
+        if time.time() >= next_read:
+            job = store.get(job_id)
+            if job and job.get("status") != "Pending":
+                return job
+            next_read = _next_record_read(job, time.time())
+
+        deadline.observe(job or {})
+        decision = deadline.decide(can_hand_off)
+        if decision == ABORT:
+            cancel_job(job_id, "Could not finish before its deadline")
+            return {"status": "TimedOut"}
+        if decision == HAND_OFF:
+            hand_off_job(job_id)
+            return {"status": "Unattended"}
+
+        elapsed = int(time.time() - deadline.started_at)
+        message = f"In progress... ({elapsed // 60}m {elapsed % 60:02d}s elapsed"
+        if deadline.progress is not None:
+            message += f", {deadline.progress:.0%} done"
+        if decision == EXTEND:
+            message += f"; nearly done, waiting up to {EXTENSION_SECONDS}s longer"
+        show(message + ")")
+        time.sleep(max(0.1, min(JOB_STATE_CHECK_INTERVAL, next_read - time.time())))
+
+def run_analysis_pipeline(company_id: str, company_name: str, doc_urls: list[str],
+                          document_artifacts: list[dict] | None = None,
+                          pending_documents: list[Future] | None = None,
+                          cache_key: str | None = None, trace_parent: Span | None = None):
+    """
+    Calls the FastAPI backend asynchronously for an *initial* analysis.
+    `document_artifacts` are the optional pre-extracted text/outlines for
+    the documents (see utils/preprocessing.py). `pending_documents` are
+    uploads still in progress; each resolves to a URL that is streamed to
+    the job once it lands, so the analysis can start on the pitch deck.
+    On success the result is cached under `cache_key`, if one is given.
+    The pipeline's spans go under `trace_parent` (a new trace without one).
+    """
     payload = {
         "documents_url": doc_urls,
         "company_name": company_name,
         "company_id": company_id,
-        "investing_thesis": investing_thesis,
+        "investing_thesis": build_investing_thesis(),
         "vc_portfolio_information": st.session_state.get("portfolio_cos", [])
     }
+    if document_artifacts:
+        payload["document_artifacts"] = document_artifacts
+    if pending_documents:
+        payload["documents_streaming"] = True
+        payload["pending_documents_count"] = len(pending_documents)
     
-    start_time = time.time()
     st.session_state['analysis_complete'] = False
-    st.session_state['api_response'] = None
+    st.session_state.pop('analysis_cached_at', None)
+    st.session_state.pop('report_traceparent', None)
+    clear_session_report()
 
+    tracer = get_tracer()
+    pipeline_span = tracer.start_span("analysis.pipeline", parent=trace_parent, company_id=company_id)
+    ticket = None
     try:
+        # A new submission from this session replaces any analysis it still has running
+        cancel_current_session_jobs("Superseded by a new analysis", JOB_ANALYZE)
+        with tracer.span("admission", parent=pipeline_span, job_type=JOB_ANALYZE):
+            ticket = _wait_for_admission_with_status(JOB_ANALYZE, LANE_BULK)
+        deadline = JobDeadline(POLLING_TIMEOUT)
+        payload.update(deadline.payload_fields())
+
         # --- Step 1: Submit the Job ---
-        submit_response = requests.post(BACKEND_SUBMIT_URL, json=payload, timeout=30)
-        submit_response.raise_for_status()
+        submit_response = _submit_job(BACKEND_SUBMIT_URL, payload, JOB_ANALYZE, pipeline_span)
         
         if submit_response.status_code != 202:
              st.error(f"Error: Backend did not accept job. Status: {submit_response.status_code}, {submit_response.text}")
@@ -53,48 +253,60 @@ def run_analysis_pipeline(company_id: str, company_name: str, doc_urls: list[str
             st.error("Error: Backend did not return a job_id.")
             return False
 
+        # The job worker polls it from here and saves the result onto the company
+        pipeline_span.set_attribute("job_id", job_id)
+        meta = {"traceparent": pipeline_span.traceparent}
+        if cache_key:
+            meta["cache_key"] = cache_key
+        track_job(job_id, JOB_ANALYZE, company_id, first_poll_in=INITIAL_POLLING_DELAY,
+                  deadline=deadline.deadline, meta=meta)
         st.info(f"Job submitted successfully (Job ID: {job_id}). Waiting for results...")
+        cancel_button(job_id, "Analysis")
+
+        if pending_documents:
+            threading.Thread(
+                target=_stream_pending_documents,
+                args=(job_id, pending_documents),
+                name=f"doc-stream-{job_id}",
+                daemon=True
+            ).start()
+            st.info(f"{len(pending_documents)} more document(s) will be added to the analysis as they finish uploading.")
         
-        time.sleep(INITIAL_POLLING_DELAY)
-        
-        # --- Step 2: Poll for Results ---
-        while True:
-            if time.time() - start_time > POLLING_TIMEOUT:
-                st.error("Error: The analysis request timed out while waiting for results.")
-                return False
-
-            status_url = f"{BACKEND_STATUS_URL}{job_id}"
-            status_response = requests.get(status_url, timeout=30)
-            status_response.raise_for_status()
+        # --- Step 2: Wait for Results ---
+        progress = st.empty()
+        job = _wait_for_job(job_id, deadline, can_hand_off=True,
+                            show=lambda message: progress.caption(f"Analysis {message}"), parent=pipeline_span)
+        progress.empty()
+        pipeline_span.set_attribute("job_status", job["status"])
+
+        if job["status"] == "Complete":
+            result_data = get_repository().get_current_report(company_id)
+            if result_data is None:
+                 st.error("Error: Job completed but no result data was found.")
+                 return False
+            
+            set_session_report(result_data)
+            st.session_state['analysis_complete'] = True
+            return True
+            
+        elif job["status"] == "Failed":
+            error_message = job.get("error", "Unknown analysis failure.")
+            st.error(f"Analysis Failed: {error_message}")
+            
+        elif job["status"] == "Unattended":
+            threading.Thread(target=_release_when_finished, args=(ticket, job_id), daemon=True).start()
+            ticket = None
+            st.warning("The analysis is taking longer than expected. It will keep running, and the report "
+                       "will appear in Analysis History as soon as it is ready.")
             
-            status_data = status_response.json()
-            job_status = status_data.get("status")
-
-            if job_status == "Complete":
-                result_data = status_data.get("result")
-                if result_data is None:
-                     st.error("Error: Job completed but no result data was found.")
-                     return False
-                
-                st.session_state['api_response'] = result_data
-                st.session_state['analysis_complete'] = True
-                
-                save_analysis_to_firestore(company_id, result_data)
-                return True
-                
-            elif job_status == "Failed":
-                error_message = status_data.get("error", "Unknown analysis failure.")
-                st.error(f"Analysis Failed: {error_message}")
-                return False
-                
-            elif job_status == "Pending":
-                st.status(f"Analysis in progress... (Status: {job_status}). Checking again in {POLLING_INTERVAL}s.", state="running")
-                time.sleep(POLLING_INTERVAL)
-                
-            else:
-                st.error(f"Error: Unknown job status received: {job_status}")
-                return False
+        elif job["status"] == "TimedOut":
+            st.error("Error: The analysis request timed out while waiting for results.")
+            
+        else:
+            st.info("The analysis was cancelled.")
 
+    except CircuitOpenError as err:
+        st.error(str(err))
     except requests.exceptions.HTTPError as errh:
         st.error(f"API Error: {errh.response.status_code} - {errh.response.text}")
     except requests.exceptions.ConnectionError as errc:
@@ -103,6 +315,10 @@ def run_analysis_pipeline(company_id: str, company_name: str, doc_urls: list[str
         st.error("Error: A request timed out. Please try again.")
     except requests.exceptions.RequestException as err:
         st.error(f"An unexpected error occurred: {err}")
+    finally:
+        if ticket:
+            ticket.release()
+        pipeline_span.end()
     
     return False
 
@@ -117,12 +333,17 @@ def run_update_pipeline(company_id: str, current_analysis: dict, chat_history: l
         "founder_qa_transcript": chat_history
     }
     
-    start_time = time.time()
-    
+    tracer = get_tracer()
+    pipeline_span = tracer.start_span("update.pipeline", company_id=company_id)
+    ticket = None
     try:
+        with tracer.span("admission", parent=pipeline_span, job_type=JOB_UPDATE):
+            ticket = _wait_for_admission_with_status(JOB_UPDATE, LANE_INTERACTIVE)
+        deadline = JobDeadline(POLLING_TIMEOUT)
+        payload.update(deadline.payload_fields())
+
         # --- Step 1: Submit the Update Job ---
-        submit_response = requests.post(BACKEND_UPDATE_URL, json=payload, timeout=30)
-        submit_response.raise_for_status()
+        submit_response = _submit_job(BACKEND_UPDATE_URL, payload, JOB_UPDATE, pipeline_span)
         
         if submit_response.status_code != 202:
              st.error(f"Error: Backend did not accept update job. Status: {submit_response.status_code}, {submit_response.text}")
@@ -133,52 +354,52 @@ def run_update_pipeline(company_id: str, current_analysis: dict, chat_history: l
             st.error("Error: Backend did not return a job_id for the update.")
             return False
 
-        st.info(f"Update job submitted successfully (Job ID: {job_id}). Waiting for re-analysis...")
-        
         # NOTE: This is a JSON-to-JSON AI call, so it should be *faster*.
         # We can use a shorter initial delay.
-        time.sleep(POLLING_INTERVAL) 
+        pipeline_span.set_attribute("job_id", job_id)
+        track_job(job_id, JOB_UPDATE, company_id, first_poll_in=POLLING_INTERVAL, deadline=deadline.deadline,
+                  meta={"traceparent": pipeline_span.traceparent})
+        st.info(f"Update job submitted successfully (Job ID: {job_id}). Waiting for re-analysis...")
+        cancel_button(job_id, "Update")
         
-        # --- Step 2: Poll for Results ---
-        while True:
-            if time.time() - start_time > POLLING_TIMEOUT:
-                st.error("Error: The analysis *update* request timed out.")
-                return False
-
-            status_url = f"{BACKEND_STATUS_URL}{job_id}"
-            status_response = requests.get(status_url, timeout=30)
-            status_response.raise_for_status()
+        # --- Step 2: Wait for Results ---
+        progress = st.empty()
+        job = _wait_for_job(job_id, deadline, can_hand_off=True,
+                            show=lambda message: progress.caption(f"Re-analysis {message}"), parent=pipeline_span)
+        progress.empty()
+        pipeline_span.set_attribute("job_status", job["status"])
+
+        if job["status"] == "Complete":
+            # The worker saved the *final* report to Firestore
+            result_data = get_repository().get_current_report(company_id)
+            if result_data is None:
+                 st.error("Error: Job completed but no result data was found.")
+                 return False
+            
+            # --- SUCCESS: Overwrite the session state with the *new* report ---
+            set_session_report(result_data)
+            st.session_state['analysis_complete'] = True # Stays true
+            st.session_state['report_traceparent'] = pipeline_span.traceparent  # The report render joins this trace
+            return True
             
-            status_data = status_response.json()
-            job_status = status_data.get("status")
-
-            if job_status == "Complete":
-                result_data = status_data.get("result")
-                if result_data is None:
-                     st.error("Error: Job completed but no result data was found.")
-                     return False
-                
-                # --- SUCCESS: Overwrite the session state with the *new* report ---
-                st.session_state['api_response'] = result_data
-                st.session_state['analysis_complete'] = True # Stays true
-                
-                # Save the *final* report to Firestore
-                save_analysis_to_firestore(company_id, result_data)
-                return True
-                
-            elif job_status == "Failed":
-                error_message = status_data.get("error", "Unknown analysis failure.")
-                st.error(f"Analysis Update Failed: {error_message}")
-                return False
-                
-            elif job_status == "Pending":
-                st.status(f"Re-analysis in progress... (Status: {job_status}). Checking again in {POLLING_INTERVAL}s.", state="running")
-                time.sleep(POLLING_INTERVAL)
-                
-            else:
-                st.error(f"Error: Unknown job status received: {job_status}")
-                return False
+        elif job["status"] == "Failed":
+            error_message = job.get("error", "Unknown analysis failure.")
+            st.error(f"Analysis Update Failed: {error_message}")
+            
+        elif job["status"] == "Unattended":
+            threading.Thread(target=_release_when_finished, args=(ticket, job_id), daemon=True).start()
+            ticket = None
+            st.warning("The re-analysis is taking longer than expected. It will keep running, and the final "
+                       "report will be saved to Analysis History as soon as it is ready.")
+            
+        elif job["status"] == "TimedOut":
+            st.error("Error: The analysis *update* request timed out.")
+            
+        else:
+            st.info("The update was cancelled.")
 
+    except CircuitOpenError as err:
+        st.error(str(err))
     except requests.exceptions.HTTPError as errh:
         st.error(f"API Error: {errh.response.status_code} - {errh.response.text}")
     except requests.exceptions.ConnectionError as errc:
@@ -187,15 +408,39 @@ def run_update_pipeline(company_id: str, current_analysis: dict, chat_history: l
         st.error("Error: A request timed out. Please try again.")
     except requests.exceptions.RequestException as err:
         st.error(f"An unexpected error occurred: {err}")
+    finally:
+        if ticket:
+            ticket.release()
+        pipeline_span.end()
     
     return False
 
-def run_slide_generation(company_id: str, current_analysis: dict) -> str | None:
+class JobFailedError(Exception):
+    """A backend job was rejected, failed or timed out. The message is user-facing."""
+
+def generate_slides(company_id: str, current_analysis: dict, on_progress=None,
+                    lane: int = LANE_INTERACTIVE, content_hash: str | None = None) -> str:
     """
-    Calls the FastAPI backend to *generate the final slide presentation*.
-    Returns the URL string on success, or None on failure.
+    Submits a slide generation job and waits for it without touching the
+    UI, so it can also run in a background thread. With a `content_hash`,
+    the deck is cached against it (see utils/deal_notes.py).
+    `on_progress(job_status, message)` is called while queued for
+    admission, on submission and while waiting.
+    Returns the presentation URL. Raises JobFailedError or a requests exception.
     """
-    
+    on_progress = on_progress or (lambda job_status, message: None)
+
+    def show_queue(position: int, eta_seconds: float):
+        on_progress("Queued", f"Waiting for backend capacity ({position} slide job(s) ahead). "
+                              f"Estimated start in ~{max(1, round(eta_seconds / 60))} min.")
+
+    ticket = wait_for_admission(JOB_SLIDES, lane, on_queued=show_queue)
+    try:
+        return _run_slide_job(company_id, current_analysis, on_progress, content_hash)
+    finally:
+        ticket.release()
+
+def _run_slide_job(company_id: str, current_analysis: dict, on_progress, content_hash: str | None) -> str:
     # payload = {
     #     "company_id": company_id,
     #     "current_analysis": current_analysis
@@ -205,68 +450,69 @@ def run_slide_generation(company_id: str, current_analysis: dict) -> str | None:
         **current_analysis  # This unpacks all keys (l1_report, scoring_report) here
     }
     
-    start_time = time.time()
+    deadline = JobDeadline(POLLING_TIMEOUT)
+    payload.update(deadline.payload_fields())
     
-    try:
+    with get_tracer().span("slides.pipeline", company_id=company_id) as pipeline_span:
         # --- Step 1: Submit the Slide Gen Job ---
-        submit_response = requests.post(BACKEND_SLIDES_URL, json=payload, timeout=30)
-        submit_response.raise_for_status()
+        submit_response = _submit_job(BACKEND_SLIDES_URL, payload, JOB_SLIDES, pipeline_span)
         
         if submit_response.status_code != 202:
-             st.error(f"Error: Backend did not accept slide job. Status: {submit_response.status_code}, {submit_response.text}")
-             return None
+            raise JobFailedError(f"Error: Backend did not accept slide job. Status: {submit_response.status_code}, {submit_response.text}")
              
         job_id = submit_response.json().get("job_id")
         if not job_id:
-            st.error("Error: Backend did not return a job_id for the slide generation.")
-            return None
+            raise JobFailedError("Error: Backend did not return a job_id for the slide generation.")
 
-        st.info(f"Slide generation job submitted (Job ID: {job_id}). This may take 2-3 minutes...")
-        
         # This pipeline runs AI, writes to a sheet, and builds a slide deck.
-        # We give it a slightly longer initial delay.
-        time.sleep(POLLING_INTERVAL) 
+        pipeline_span.set_attribute("job_id", job_id)
+        meta = {"traceparent": pipeline_span.traceparent}
+        if content_hash:
+            meta["content_hash"] = content_hash
+        track_job(job_id, JOB_SLIDES, company_id, first_poll_in=POLLING_INTERVAL, deadline=deadline.deadline,
+                  meta=meta)
+        on_progress("Submitted", f"Slide generation job submitted (Job ID: {job_id}). This may take 2-3 minutes...")
         
-        # --- Step 2: Poll for Results ---
-        while True:
-            if time.time() - start_time > POLLING_TIMEOUT:
-                st.error("Error: The slide generation request timed out.")
-                return None
-
-            status_url = f"{BACKEND_STATUS_URL}{job_id}"
-            status_response = requests.get(status_url, timeout=30)
-            status_response.raise_for_status()
-            
-            status_data = status_response.json()
-            job_status = status_data.get("status")
-
-            if job_status == "Complete":
-                result_data = status_data.get("result")
-                if result_data is None:
-                     st.error("Error: Job completed but no result data was found.")
-                     return None
-                
-                # --- SUCCESS: Return the final URL ---
-                final_url = result_data.get("slide_url")
-                if not final_url:
-                    st.error("Error: Job completed but no 'slide_url' was returned in result.")
-                    return None
-                    
-                return final_url
-                
-            elif job_status == "Failed":
-                error_message = status_data.get("error", "Unknown analysis failure.")
-                st.error(f"Slide Generation Failed: {error_message}")
-                return None
-                
-            elif job_status == "Pending":
-                st.status(f"Generating slides... (Status: {job_status}). Checking again in {POLLING_INTERVAL}s.", state="running")
-                time.sleep(POLLING_INTERVAL)
-                
-            else:
-                st.error(f"Error: Unknown job status received: {job_status}")
-                return None
+        # --- Step 2: Wait for Results ---
+        job = _wait_for_job(job_id, deadline, can_hand_off=False,
+                            show=lambda message: on_progress("Pending", f"Generating slides... {message}"),
+                            parent=pipeline_span)
+        pipeline_span.set_attribute("job_status", job["status"])
+
+    if job["status"] == "Complete":
+        return job["slide_url"]
+    if job["status"] == "Failed":
+        raise JobFailedError(f"Slide Generation Failed: {job.get('error', 'Unknown analysis failure.')}")
+    if job["status"] == "TimedOut":
+        raise JobFailedError("Error: The slide generation request timed out.")
+    raise JobFailedError("Slide generation was cancelled.")
+
+def run_slide_generation(company_id: str, current_analysis: dict, content_hash: str | None = None) -> str | None:
+    """
+    Calls the FastAPI backend to *generate the final slide presentation*.
+    Returns the URL string on success, or None on failure. With a
+    `content_hash`, the deck is cached against it for next time.
+    """
+    queue_placeholder = st.empty()
+    progress_placeholder = st.empty()
+
+    def show_progress(job_status: str, message: str):
+        if job_status == "Queued":
+            queue_placeholder.info(message)
+            return
+        queue_placeholder.empty()
+        if job_status == "Submitted":
+            st.info(message)
+        else:
+            progress_placeholder.caption(message)
+
+    try:
+        return generate_slides(company_id, current_analysis, on_progress=show_progress, content_hash=content_hash)
 
+    except JobFailedError as err:
+        st.error(str(err))
+    except CircuitOpenError as err:
+        st.error(str(err))
     except requests.exceptions.HTTPError as errh:
         st.error(f"API Error: {errh.response.status_code} - {errh.response.text}")
     except requests.exceptions.ConnectionError as errc:
@@ -276,4 +522,4 @@ def run_slide_generation(company_id: str, current_analysis: dict) -> str | None:
     except requests.exceptions.RequestException as err:
         st.error(f"An unexpected error occurred: {err}")
     
-    return None
\ No newline at end of file
+    return None
@@ -0,0 +1,233 @@
+# utils/app_logging.py
+"""
+The app's logging pipeline.
+
+Every module gets its logger from `get_logger(__name__)`. Log calls never
+touch a file or the console themselves: records go onto a bounded queue,
+and one background thread writes them out, so a slow disk can't stall a
+script run. If the queue is ever full, records are dropped (and counted)
+rather than blocking.
+
+The file (LOG_FILE) gets one JSON object per line, with the session, and
+the company and job being worked on, whenever they're known:
+
+- `session_id` comes from the script run that logged it;
+- `company_id` and `job_id` from `log_context()` / `bind_log_context()`,
+  or from `extra=` on the call itself.
+
+The file rotates at LOG_MAX_MB, keeping LOG_BACKUP_COUNT old files. The
+console gets the usual one-line text format.
+
+Loops can log freely: each call site (file and line) may log at most
+LOG_RATE_LIMIT_PER_MINUTE records a minute, and the next record that gets
+through says how many were suppressed. Debug and info records can also be
+sampled: pass `extra={"sample_rate": 0.1}` to keep one in ten, or set a
+rate per logger in LOG_SAMPLE_RATES (e.g. {"utils.tracing" = 0.1}).
+"""
+import atexit
+import contextvars
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+LOG_LEVEL = st.secrets.get("LOG_LEVEL", "INFO")
+LOG_FILE = st.secrets.get("LOG_FILE", "app.log")  # Empty for console only
+LOG_MAX_MB = float(st.secrets.get("LOG_MAX_MB", 10))
+LOG_BACKUP_COUNT = int(st.secrets.get("LOG_BACKUP_COUNT", 5))
+LOG_CONSOLE = str(st.secrets.get("LOG_CONSOLE", "true")).lower() == "true"
+LOG_QUEUE_SIZE = int(st.secrets.get("LOG_QUEUE_SIZE", 10000))
+LOG_RATE_LIMIT_PER_MINUTE = int(st.secrets.get("LOG_RATE_LIMIT_PER_MINUTE", 60))  # Per call site; 0 for no limit
+LOG_SAMPLE_RATES = dict(st.secrets.get("LOG_SAMPLE_RATES", {}))  # Logger name -> fraction of debug/info kept
+
+CONTEXT_FIELDS = ("session_id", "company_id", "job_id")
+CONSOLE_FORMAT = "%(asctime)s %(levelname) -7s %(name)s: %(message)s"
+
+_context = contextvars.ContextVar("log_context", default={})
+_traceback_formatter = logging.Formatter()
+
+
+@contextmanager
+def log_context(**ids):
+    """Adds IDs (company_id, job_id, ...) to every record logged in the block."""
+    token = _context.set({**_context.get(), **{k: v for k, v in ids.items() if v is not None}})
+    try:
+        yield
+    finally:
+        _context.reset(token)
+
+
+def bind_log_context(**ids):
+    """
+    Like log_context, for the rest of the current script run (each run has
+    its own thread) or the enclosing `log_context` block.
+    """
+    _context.set({**_context.get(), **{k: v for k, v in ids.items() if v is not None}})
+
+
+class ContextFilter(logging.Filter):
+    """Stamps records with the IDs of whatever logged them, on the logging thread."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        ids = dict(_context.get())
+        ctx = get_script_run_ctx(suppress_warning=True)
+        if ctx is not None:
+            ids.setdefault("session_id", ctx.session_id)
+        for field in CONTEXT_FIELDS:
+            if getattr(record, field, None) is None:
+                setattr(record, field, ids.get(field))
+        return True
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Lets each call site log `per_minute` records a minute, and samples
+    debug/info records by `sample_rate` (from the call's extra, or the
+    logger's LOG_SAMPLE_RATES entry).
+    """
+
+    def __init__(self, per_minute: int, sample_rates: dict):
+        super().__init__()
+        self.per_minute = per_minute
+        self.sample_rates = sample_rates
+        self._sites = {}  # (path, line) -> [window start, records in window, suppressed]
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno < logging.WARNING:
+            rate = getattr(record, "sample_rate", None)
+            if rate is None:
+                rate = self.sample_rates.get(record.name)
+            if rate is not None and random.random() >= float(rate):
+                return False
+        if not self.per_minute:
+            return True
+
+        now = time.monotonic()
+        with self._lock:
+            site = self._sites.setdefault((record.pathname, record.lineno), [now, 0, 0])
+            if now - site[0] >= 60:
+                site[0], site[1] = now, 0
+            if site[1] >= self.per_minute:
+                site[2] += 1
+                return False
+            site[1] += 1
+            record.suppressed, site[2] = site[2], 0
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "thread": record.threadName
+        }
+        for field in CONTEXT_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        if getattr(record, "suppressed", 0):
+            entry["suppressed"] = record.suppressed
+        if getattr(record, "sample_rate", None) is not None:
+            entry["sample_rate"] = record.sample_rate
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """Hands records to the writer thread; drops them instead of blocking when it falls behind."""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Format now (arguments may change before the writer gets to it), but
+        # keep the traceback apart from the message
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = _traceback_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class LogPipeline:
+    """The queue every logger writes to, and the thread that empties it."""
+
+    def __init__(self):
+        self.queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+        self.handler = DroppingQueueHandler(self.queue)
+        self.handler.addFilter(ContextFilter())
+        self.handler.addFilter(RateLimitFilter(LOG_RATE_LIMIT_PER_MINUTE, LOG_SAMPLE_RATES))
+
+        outputs = []
+        if LOG_FILE:
+            directory = os.path.dirname(LOG_FILE)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            file_handler = logging.handlers.RotatingFileHandler(
+                LOG_FILE, maxBytes=int(LOG_MAX_MB * 1024 * 1024), backupCount=LOG_BACKUP_COUNT, encoding="utf-8"
+            )
+            file_handler.setFormatter(JsonFormatter())
+            outputs.append(file_handler)
+        if LOG_CONSOLE:
+            console = logging.StreamHandler()
+            console.setFormatter(logging.Formatter(CONSOLE_FORMAT))
+            outputs.append(console)
+        self.listener = logging.handlers.QueueListener(self.queue, *outputs, respect_handler_level=True)
+        self.listener.start()
+        atexit.register(self.listener.stop)  # Writes out what's still queued
+
+        # Other libraries' errors go to the same place, as they did to app.log
+        root = logging.getLogger()
+        root.addHandler(self.handler)
+        if root.level > logging.ERROR or root.level == logging.NOTSET:
+            root.setLevel(logging.ERROR)
+
+    def stats(self) -> dict:
+        return {"queued_records": self.queue.qsize(), "dropped_records": self.handler.dropped}
+
+
+_pipeline = None
+_pipeline_lock = threading.Lock()
+
+
+def get_log_pipeline() -> LogPipeline:
+    """The single LogPipeline shared by every module in this process."""
+    global _pipeline
+    with _pipeline_lock:
+        if _pipeline is None:
+            _pipeline = LogPipeline()
+        return _pipeline
+
+
+def get_logger(name: str) -> logging.Logger:
+    """A logger that writes through the pipeline. Use in place of st.logger.get_logger."""
+    logger = logging.getLogger(name)
+    handler = get_log_pipeline().handler
+    if handler not in logger.handlers:
+        logger.addHandler(handler)
+        logger.setLevel(LOG_LEVEL.upper())
+        logger.propagate = False  # The root logger has the same handler
+    return logger
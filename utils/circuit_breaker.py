@@ -0,0 +1,213 @@
+# utils/circuit_breaker.py
+"""
+Circuit breaker for the analysis backend.
+
+Every backend request goes through the process-wide breaker, which tracks
+the error rate over a rolling window. Once too many requests fail (network
+errors, timeouts or 5xx responses), the breaker opens, and calls fail in
+milliseconds with CircuitOpenError instead of each session waiting out its
+own timeouts.
+
+While open, a background thread probes the backend's health endpoint.
+After a successful probe, or once OPEN_SECONDS have passed, the breaker
+goes half-open and lets a single trial request through. If the trial
+succeeds the breaker closes; if it fails the breaker opens again.
+"""
+import threading
+import time
+from collections import deque
+import requests
+import streamlit as st
+from utils.app_logging import get_logger
+from utils.metrics import get_metrics
+
+logger = get_logger(__name__)
+
+CLOSED = "closed"
+HALF_OPEN = "half_open"
+OPEN = "open"
+STATE_CODES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}  # For the state gauge
+
+WINDOW_SECONDS = int(st.secrets.get("BREAKER_WINDOW_SECONDS", 60))
+MIN_REQUESTS = int(st.secrets.get("BREAKER_MIN_REQUESTS", 5))
+ERROR_RATE_THRESHOLD = float(st.secrets.get("BREAKER_ERROR_RATE", 0.5))
+OPEN_SECONDS = int(st.secrets.get("BREAKER_OPEN_SECONDS", 30))
+PROBE_INTERVAL = 5
+PROBE_TIMEOUT = 3
+
+
+class CircuitOpenError(requests.exceptions.RequestException):
+    """Raised instead of calling a backend that is known to be down."""
+
+
+class CircuitBreaker:
+    def __init__(self, name: str, health_url: str | None, window_seconds: int = WINDOW_SECONDS,
+                 min_requests: int = MIN_REQUESTS, error_rate_threshold: float = ERROR_RATE_THRESHOLD,
+                 open_seconds: int = OPEN_SECONDS):
+        self.name = name
+        self.health_url = health_url
+        self.window_seconds = window_seconds
+        self.min_requests = min_requests
+        self.error_rate_threshold = error_rate_threshold
+        self.open_seconds = open_seconds
+        self.state = CLOSED
+        self.opened_at = None
+        self.times_opened = 0
+        self._outcomes = deque()  # (timestamp, succeeded)
+        self._trial_in_flight = False
+        self._prober = None
+        self._lock = threading.Lock()
+
+    def before_request(self):
+        """Raises CircuitOpenError if the request shouldn't be sent."""
+        with self._lock:
+            if self.state == OPEN and time.time() - self.opened_at >= self.open_seconds:
+                self._set_state(HALF_OPEN)
+            if self.state == OPEN:
+                raise CircuitOpenError(self._open_message())
+            if self.state == HALF_OPEN:
+                if self._trial_in_flight:
+                    raise CircuitOpenError(self._open_message())
+                self._trial_in_flight = True
+
+    def record_success(self):
+        with self._lock:
+            self._record(True)
+            if self.state == HALF_OPEN:
+                self._trial_in_flight = False
+                self._outcomes.clear()
+                self._set_state(CLOSED)
+
+    def record_failure(self):
+        with self._lock:
+            self._record(False)
+            if self.state == HALF_OPEN:
+                self._trial_in_flight = False
+                self._open()
+            elif self.state == CLOSED:
+                failures = sum(1 for _, ok in self._outcomes if not ok)
+                if len(self._outcomes) >= self.min_requests and failures / len(self._outcomes) >= self.error_rate_threshold:
+                    self._open()
+
+    def check(self):
+        """Raises CircuitOpenError while open, without taking the half-open trial slot."""
+        with self._lock:
+            if self.state == OPEN and time.time() - self.opened_at < self.open_seconds:
+                raise CircuitOpenError(self._open_message())
+
+    def release_trial(self):
+        """For a request that ended without telling us anything about the backend."""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def is_open(self) -> bool:
+        with self._lock:
+            return self.state != CLOSED
+
+    def seconds_until_retry(self) -> int:
+        with self._lock:
+            if self.state != OPEN:
+                return 0
+            return max(0, int(self.opened_at + self.open_seconds - time.time()))
+
+    def stats(self) -> dict:
+        with self._lock:
+            self._trim()
+            failures = sum(1 for _, ok in self._outcomes if not ok)
+            return {
+                "state": self.state,
+                "state_code": STATE_CODES[self.state],
+                "requests_in_window": len(self._outcomes),
+                "error_rate": failures / len(self._outcomes) if self._outcomes else 0.0,
+                "times_opened": self.times_opened
+            }
+
+    # --- Internals (call with the lock held) ---
+    def _record(self, succeeded: bool):
+        self._outcomes.append((time.time(), succeeded))
+        self._trim()
+
+    def _trim(self):
+        cutoff = time.time() - self.window_seconds
+        while self._outcomes and self._outcomes[0][0] < cutoff:
+            self._outcomes.popleft()
+
+    def _set_state(self, state: str):
+        if state != self.state:
+            logger.warning(f"Circuit breaker '{self.name}': {self.state} -> {state}")
+            self.state = state
+
+    def _open(self):
+        self.opened_at = time.time()
+        self.times_opened += 1
+        self._set_state(OPEN)
+        if self.health_url and (self._prober is None or not self._prober.is_alive()):
+            self._prober = threading.Thread(target=self._probe, name=f"breaker-probe-{self.name}", daemon=True)
+            self._prober.start()
+
+    def _open_message(self) -> str:
+        return (f"The analysis backend is currently unavailable, so new requests are paused. "
+                f"Retrying automatically in about {max(1, int(self.opened_at + self.open_seconds - time.time()))}s.")
+
+    def _probe(self):
+        """Runs while open: checks the health endpoint and goes half-open as soon as it answers."""
+        while True:
+            time.sleep(PROBE_INTERVAL)
+            with self._lock:
+                if self.state != OPEN:
+                    return
+            try:
+                healthy = requests.get(self.health_url, timeout=PROBE_TIMEOUT).status_code < 500
+            except requests.exceptions.RequestException:
+                healthy = False
+            if healthy:
+                with self._lock:
+                    if self.state == OPEN:
+                        self._set_state(HALF_OPEN)
+                return
+
+
+@st.cache_resource
+def get_backend_breaker() -> CircuitBreaker:
+    """The single breaker for the analysis backend, shared by every session in this process."""
+    base_url = st.secrets["BACKEND_BASE_URL"]
+    health_path = st.secrets.get("BACKEND_HEALTH_PATH", "/health")
+    breaker = CircuitBreaker("backend", f"{base_url}{health_path}")
+    get_metrics().register_stats("backend_breaker", breaker.stats)
+    return breaker
+
+
+def guarded_request(breaker: CircuitBreaker, method: str, url: str, **kwargs) -> requests.Response:
+    """
+    requests.request() through a breaker. Network errors, timeouts and 5xx
+    responses count as failures; anything else (including 4xx) as success.
+    """
+    breaker.before_request()
+    try:
+        response = requests.request(method, url, **kwargs)
+    except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+        breaker.record_failure()
+        raise
+    except BaseException:
+        # Not the backend's fault; don't leave a half-open trial hanging
+        breaker.release_trial()
+        raise
+    if response.status_code >= 500:
+        breaker.record_failure()
+    else:
+        breaker.record_success()
+    return response
+
+
+def backend_status_banner():
+    """Shows a banner while the backend breaker is open or testing recovery."""
+    breaker = get_backend_breaker()
+    if not breaker.is_open():
+        return
+    retry = breaker.seconds_until_retry()
+    when = f"in about {retry}s" if retry else "now"
+    st.error(
+        f"The analysis backend is not responding. New analyses, Q&A updates and deal notes "
+        f"are paused, and will be retried automatically {when}.",
+        icon="🚧"
+    )
@@ -0,0 +1,99 @@
+# utils/deadlines.py
+"""
+Deadlines for backend jobs.
+
+Every job is submitted with a `budget_seconds` hint (how long the analyst
+is prepared to wait) and an absolute `deadline`. The deadline is the budget
+plus a window in which the job worker (utils/job_worker.py) still collects
+a late result and saves it to Firestore. Past the deadline nobody will read the result, so
+the backend can stop.
+
+While polling, the client reads the backend's progress reports (`progress`
+and `eta_seconds` in the status response, if present) to decide what to do
+once the analyst's budget runs out:
+
+- extend: the job is nearly done, so keep the analyst waiting a little longer;
+- abort: the job has stalled (neither its progress nor its ETA has moved
+  for STALL_SECONDS), or can't finish before the deadline, so cancel it;
+- hand off: otherwise, stop waiting in the UI and let the job worker save
+  the result when it lands.
+"""
+import time
+from datetime import datetime, timezone
+import streamlit as st
+
+EXTENSION_SECONDS = int(st.secrets.get("DEADLINE_EXTENSION_SECONDS", 120))
+MAX_EXTENSIONS = int(st.secrets.get("DEADLINE_MAX_EXTENSIONS", 2))
+LATE_RESULT_WINDOW_SECONDS = int(st.secrets.get("LATE_RESULT_WINDOW_SECONDS", 30 * 60))
+STALL_SECONDS = int(st.secrets.get("DEADLINE_STALL_SECONDS", 5 * 60))
+
+WAIT = "wait"
+EXTEND = "extend"
+ABORT = "abort"
+HAND_OFF = "hand_off"
+
+
+def read_progress(status_data: dict) -> tuple[float | None, float | None]:
+    """(fraction done, seconds remaining) from a status response; None where not reported."""
+    progress = status_data.get("progress")
+    if isinstance(progress, dict):
+        done, total = progress.get("completed_steps"), progress.get("total_steps")
+        progress = done / total if done is not None and total else None
+    elif isinstance(progress, (int, float)):
+        progress = progress / 100 if progress > 1 else float(progress)
+    else:
+        progress = None
+    eta = status_data.get("eta_seconds")
+    return progress, float(eta) if isinstance(eta, (int, float)) else None
+
+
+class JobDeadline:
+    """The time budget for one job, and the extend/abort/hand-off decision."""
+
+    def __init__(self, budget_seconds: int, late_window_seconds: int = LATE_RESULT_WINDOW_SECONDS,
+                 started_at: float | None = None):
+        self.started_at = started_at or time.time()
+        self.budget_seconds = budget_seconds
+        self.wait_until = self.started_at + budget_seconds
+        self.deadline = self.wait_until + late_window_seconds
+        self.extensions = 0
+        self.progress = None
+        self.eta_seconds = None
+        self._progress_changed_at = self.started_at
+
+    def payload_fields(self) -> dict:
+        """What the backend is told about this job's time budget."""
+        return {
+            "budget_seconds": self.budget_seconds,
+            "deadline": datetime.fromtimestamp(self.deadline, timezone.utc).isoformat()
+        }
+
+    def observe(self, status_data: dict):
+        progress, eta = read_progress(status_data)
+        advanced = progress is not None and progress != self.progress
+        # A falling ETA counts too, for backends that report no fraction done
+        advanced = advanced or (eta is not None and (self.eta_seconds is None or eta < self.eta_seconds))
+        if advanced:
+            self._progress_changed_at = time.time()
+        if progress is not None:
+            self.progress = progress
+        self.eta_seconds = eta
+
+    def decide(self, can_hand_off: bool) -> str:
+        now = time.time()
+        reports_progress = self.progress is not None or self.eta_seconds is not None
+        stalled = reports_progress and now - self._progress_changed_at > STALL_SECONDS
+        if stalled:
+            return ABORT
+        if self.eta_seconds is not None and now + self.eta_seconds > self.deadline:
+            # It would finish after anyone could collect the result
+            return ABORT
+        if now < self.wait_until:
+            return WAIT
+        if self.eta_seconds is not None and self.eta_seconds <= EXTENSION_SECONDS and self.extensions < MAX_EXTENSIONS:
+            self.extensions += 1
+            self.wait_until = now + EXTENSION_SECONDS
+            return EXTEND
+        if can_hand_off and now < self.deadline:
+            return HAND_OFF
+        return ABORT
@@ -0,0 +1,205 @@
+# utils/deal_notes.py
+"""
+Deal-note decks, cached by content.
+
+Building a deck takes the backend 2-3 minutes, so each generated deck is
+stored in Firestore against a hash of the report and the Q&A transcript
+(see the repository's get_deal_note). If neither changed, the existing deck
+is returned straight away.
+
+Decks can also be generated in the background. Jobs run on a small
+process-wide thread pool and are tracked by (company_id, content_hash), so
+the same deck is never built twice at once and any session can pick up
+the result.
+
+Once Q&A produces the final report, its deck is generated speculatively,
+since the Deal Note page is almost always the next stop. Speculative jobs
+are low priority: they wait in their own queue, never take the last free
+worker, and are capped separately, so a deck someone actually asked for
+always starts promptly. Asking for a deck that is still queued
+speculatively promotes it. Since one worker is always kept free,
+speculative decks need DEAL_NOTE_WORKERS of at least 2; with fewer, they
+are switched off.
+"""
+import hashlib
+import json
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+import streamlit as st
+from utils.app_logging import get_logger, log_context
+from utils.api_client import generate_slides
+from utils.admission import LANE_INTERACTIVE, LANE_SPECULATIVE
+from utils.repository import get_repository
+from utils.metrics import get_metrics, count_cache_lookup
+
+logger = get_logger(__name__)
+
+DEAL_NOTE_WORKERS = int(st.secrets.get("DEAL_NOTE_WORKERS", 2))
+SPECULATIVE_DEAL_NOTES = str(st.secrets.get("SPECULATIVE_DEAL_NOTES", "true")).lower() == "true"
+SPECULATIVE_DEAL_NOTE_LIMIT = int(st.secrets.get("SPECULATIVE_DEAL_NOTE_LIMIT", 1))
+SPECULATIVE_QUEUE_MAX = 20
+MIN_SPECULATIVE_WORKERS = 2  # One for speculative decks, one kept free for requested ones
+
+
+def deal_note_hash(report: dict, chat_history: list) -> str:
+    """Content hash of everything a deck is built from."""
+    payload = json.dumps(
+        {"report": report, "transcript": chat_history},
+        sort_keys=True, separators=(",", ":"), default=str
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _generate_and_store(company_id: str, report: dict, content_hash: str, lane: int) -> str:
+    # Runs on a pooled thread, so the job's log context mustn't outlive it
+    with log_context(company_id=company_id):
+        # The job worker stores the deck against content_hash when it lands
+        slide_url = generate_slides(company_id, report, lane=lane, content_hash=content_hash)
+        logger.info(f"Background deal note for {company_id} is ready: {slide_url}")
+    return slide_url
+
+
+class BackgroundDealNotes:
+    """Background deck generation, deduplicated by company and content."""
+
+    def __init__(self, max_workers: int, speculative_limit: int):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="deal-note")
+        self._max_workers = max_workers
+        self._speculative_limit = speculative_limit
+        self._jobs: dict[tuple[str, str], Future] = {}
+        self._waiting = deque()  # speculative (key, report), oldest first
+        self._running = 0
+        self._running_speculative = 0
+        self._lock = threading.Lock()
+
+    @property
+    def speculative_enabled(self) -> bool:
+        return self._max_workers >= MIN_SPECULATIVE_WORKERS and self._speculative_limit > 0
+
+    def start(self, company_id: str, report: dict, content_hash: str, speculative: bool = False) -> Future:
+        """Starts building a deck, or returns the job already building it."""
+        if speculative and not self.speculative_enabled:
+            raise ValueError(f"Speculative deal notes need at least {MIN_SPECULATIVE_WORKERS} workers")
+        key = (company_id, content_hash)
+        started = []
+        try:
+            with self._lock:
+                return self._start(key, report, speculative, started)
+        finally:
+            # Outside the lock: a job that already finished runs its callback right here
+            self._watch(started)
+
+    def get(self, company_id: str, content_hash: str) -> Future | None:
+        with self._lock:
+            return self._jobs.get((company_id, content_hash))
+
+    def is_queued(self, company_id: str, content_hash: str) -> bool:
+        """Whether a speculative deck is still waiting for a worker."""
+        with self._lock:
+            return any(key == (company_id, content_hash) for key, _ in self._waiting)
+
+    def discard(self, company_id: str, content_hash: str):
+        """Forgets a finished job once its result has been shown."""
+        with self._lock:
+            job = self._jobs.get((company_id, content_hash))
+            if job is not None and job.done():
+                del self._jobs[(company_id, content_hash)]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "running": self._running,
+                "running_speculative": self._running_speculative,
+                "waiting_speculative": len(self._waiting)
+            }
+
+    # --- Internals (call with the lock held, except _watch and _finished) ---
+    def _start(self, key: tuple[str, str], report: dict, speculative: bool, started: list) -> Future:
+        job = self._jobs.get(key)
+        if job is not None:
+            if not speculative and self._dequeue(key):
+                self._run(key, report, job, False, started)
+            return job
+
+        job = Future()
+        self._jobs[key] = job
+        if speculative:
+            # A newer report supersedes any deck still queued for the company
+            for stale in [k for k, _ in self._waiting if k[0] == key[0]]:
+                self._dequeue(stale)
+                self._jobs.pop(stale).cancel()
+            if len(self._waiting) >= SPECULATIVE_QUEUE_MAX:
+                dropped, _ = self._waiting.popleft()
+                self._jobs.pop(dropped).cancel()
+            self._waiting.append((key, report))
+            self._dispatch(started)
+        else:
+            self._run(key, report, job, False, started)
+        return job
+
+    def _dequeue(self, key: tuple[str, str]) -> bool:
+        for entry in self._waiting:
+            if entry[0] == key:
+                self._waiting.remove(entry)
+                return True
+        return False
+
+    def _run(self, key: tuple[str, str], report: dict, job: Future, speculative: bool, started: list):
+        """Submits a job; the caller passes `started` to _watch once it has released the lock."""
+        self._running += 1
+        if speculative:
+            self._running_speculative += 1
+        lane = LANE_SPECULATIVE if speculative else LANE_INTERACTIVE
+        work = self._executor.submit(_generate_and_store, key[0], report, key[1], lane)
+        started.append((work, job, speculative))
+
+    def _dispatch(self, started: list):
+        # Keep one worker free for requested decks
+        while (self._waiting
+               and self._running_speculative < self._speculative_limit
+               and self._running < self._max_workers - 1):
+            key, report = self._waiting.popleft()
+            self._run(key, report, self._jobs[key], True, started)
+
+    def _watch(self, started: list):
+        for work, job, speculative in started:
+            work.add_done_callback(lambda done, job=job, speculative=speculative: self._finished(job, done, speculative))
+
+    def _finished(self, job: Future, done: Future, speculative: bool):
+        started = []
+        with self._lock:
+            self._running -= 1
+            if speculative:
+                self._running_speculative -= 1
+            self._dispatch(started)
+        self._watch(started)
+        if done.exception() is not None:
+            job.set_exception(done.exception())
+        else:
+            job.set_result(done.result())
+
+
+@st.cache_resource
+def get_background_deal_notes() -> BackgroundDealNotes:
+    """The single background deck generator shared by every session in this process."""
+    deal_notes = BackgroundDealNotes(max_workers=DEAL_NOTE_WORKERS, speculative_limit=SPECULATIVE_DEAL_NOTE_LIMIT)
+    if SPECULATIVE_DEAL_NOTES and not deal_notes.speculative_enabled:
+        logger.warning(
+            f"Speculative deal notes are off: DEAL_NOTE_WORKERS is {DEAL_NOTE_WORKERS}, "
+            f"they need at least {MIN_SPECULATIVE_WORKERS}"
+        )
+    get_metrics().register_stats("background_deal_notes", deal_notes.stats)
+    return deal_notes
+
+
+def pregenerate_deal_note(company_id: str, report: dict, chat_history: list):
+    """Queues a low-priority deck for a final report, unless one already exists."""
+    if not SPECULATIVE_DEAL_NOTES or not get_background_deal_notes().speculative_enabled:
+        return
+    content_hash = deal_note_hash(report, chat_history)
+    existing = get_repository().get_deal_note(company_id, content_hash)
+    count_cache_lookup("deal_note", existing is not None)
+    if existing:
+        return
+    get_background_deal_notes().start(company_id, report, content_hash, speculative=True)
@@ -0,0 +1,181 @@
+# utils/doc_extract.py
+"""
+Document extraction that runs inside pre-processing worker processes.
+
+This module deliberately doesn't import streamlit: it's loaded by every
+worker in the process pool (see utils/preprocessing.py) and only needs the
+document libraries. Each function takes a path on local disk and returns
+plain, JSON-safe dicts.
+"""
+import io
+import os
+import re
+import zipfile
+
+# Embedded images above this size get recompressed
+MAX_IMAGE_BYTES = 1024 * 1024
+MAX_IMAGE_DIMENSION = 2000
+JPEG_QUALITY = 80
+# Only keep a compressed copy if it saves at least this fraction
+MIN_SAVING_RATIO = 0.10
+# Cap on extracted text per document, to keep artifacts small
+MAX_TEXT_CHARS = 2_000_000
+
+
+def _truncate(text: str) -> str:
+    return text if len(text) <= MAX_TEXT_CHARS else text[:MAX_TEXT_CHARS]
+
+
+def _extract_pdf(path: str) -> dict:
+    from pypdf import PdfReader
+
+    reader = PdfReader(path)
+    pages = [page.extract_text() or "" for page in reader.pages]
+    return {
+        "page_count": len(pages),
+        "text": _truncate("\n\f".join(pages)),
+        "outline": [item.title for item in reader.outline if hasattr(item, "title")]
+    }
+
+
+def _extract_docx(path: str) -> dict:
+    import docx
+
+    document = docx.Document(path)
+    paragraphs = [p.text for p in document.paragraphs if p.text.strip()]
+    headings = [
+        p.text for p in document.paragraphs
+        if p.style is not None and p.style.name.startswith("Heading") and p.text.strip()
+    ]
+    # Word stores its last computed page count in docProps/app.xml
+    page_count = None
+    with zipfile.ZipFile(path) as archive:
+        if "docProps/app.xml" in archive.namelist():
+            match = re.search(rb"<Pages>(\d+)</Pages>", archive.read("docProps/app.xml"))
+            page_count = int(match.group(1)) if match else None
+    return {
+        "page_count": page_count,
+        "text": _truncate("\n".join(paragraphs)),
+        "outline": headings
+    }
+
+
+def _extract_pptx(path: str) -> dict:
+    from pptx import Presentation
+
+    presentation = Presentation(path)
+    slides = []
+    texts = []
+    for number, slide in enumerate(presentation.slides, start=1):
+        title_shape = slide.shapes.title
+        title = title_shape.text.strip() if title_shape is not None and title_shape.has_text_frame else ""
+        slide_text = [
+            shape.text_frame.text for shape in slide.shapes
+            if shape.has_text_frame and shape.text_frame.text.strip()
+        ]
+        slides.append({"slide": number, "title": title})
+        texts.append("\n".join(slide_text))
+    return {
+        "page_count": len(slides),
+        "slide_count": len(slides),
+        "text": _truncate("\n\f".join(texts)),
+        "outline": slides
+    }
+
+
+def _recompress_image(data: bytes) -> bytes | None:
+    from PIL import Image
+
+    with Image.open(io.BytesIO(data)) as image:
+        image_format = image.format
+        if image_format not in ("JPEG", "PNG"):
+            return None
+        image.thumbnail((MAX_IMAGE_DIMENSION, MAX_IMAGE_DIMENSION))
+        out = io.BytesIO()
+        if image_format == "JPEG":
+            image.convert("RGB").save(out, format="JPEG", quality=JPEG_QUALITY, optimize=True)
+        else:
+            image.save(out, format="PNG", optimize=True)
+    result = out.getvalue()
+    return result if len(result) < len(data) else None
+
+
+def _compress_office_images(path: str, out_path: str) -> bool:
+    """Rewrites a .docx/.pptx with its oversized media recompressed."""
+    changed = False
+    with zipfile.ZipFile(path) as source, zipfile.ZipFile(out_path, "w", zipfile.ZIP_DEFLATED) as target:
+        for item in source.infolist():
+            data = source.read(item.filename)
+            if "/media/" in item.filename and len(data) > MAX_IMAGE_BYTES:
+                smaller = _recompress_image(data)
+                if smaller is not None:
+                    data = smaller
+                    changed = True
+            target.writestr(item, data)
+    return changed
+
+
+def _compress_pdf_images(path: str, out_path: str) -> bool:
+    from pypdf import PdfWriter
+    from PIL import Image
+
+    writer = PdfWriter(clone_from=path)
+    changed = False
+    for page in writer.pages:
+        for image in page.images:
+            if len(image.data) <= MAX_IMAGE_BYTES:
+                continue
+            pil_image = Image.open(io.BytesIO(image.data))
+            pil_image.thumbnail((MAX_IMAGE_DIMENSION, MAX_IMAGE_DIMENSION))
+            image.replace(pil_image, quality=JPEG_QUALITY)
+            changed = True
+    if changed:
+        with open(out_path, "wb") as f:
+            writer.write(f)
+    return changed
+
+
+EXTRACTORS = {"pdf": _extract_pdf, "docx": _extract_docx, "pptx": _extract_pptx}
+COMPRESSORS = {"pdf": _compress_pdf_images, "docx": _compress_office_images, "pptx": _compress_office_images}
+
+
+def process_document(path: str, file_name: str, max_bytes: int) -> dict:
+    """
+    Extracts text, page/slide counts and an outline from one document and
+    writes a slimmer copy next to it if its embedded images can be shrunk.
+
+    Never raises: problems come back as an `error` (reject the file) or a
+    `skipped` reason (we couldn't check it, let the backend handle it).
+    """
+    result = {"file_name": file_name, "size_bytes": os.path.getsize(path)}
+    extension = file_name.rsplit(".", 1)[-1].lower() if "." in file_name else ""
+
+    if result["size_bytes"] > max_bytes:
+        result["error"] = f"File is {result['size_bytes'] / 1024 / 1024:.0f} MB; the limit is {max_bytes / 1024 / 1024:.0f} MB."
+        return result
+    if extension not in EXTRACTORS:
+        result["skipped"] = f"No pre-processing for .{extension} files."
+        return result
+
+    try:
+        result.update(EXTRACTORS[extension](path))
+    except ImportError as e:
+        result["skipped"] = f"Extraction library not installed: {e.name}"
+        return result
+    except Exception as e:
+        result["error"] = f"Could not read {file_name}; it may be corrupt ({type(e).__name__}: {e})."
+        return result
+
+    try:
+        slim_path = f"{path}.slim.{extension}"
+        if COMPRESSORS[extension](path, slim_path):
+            slim_size = os.path.getsize(slim_path)
+            if slim_size <= result["size_bytes"] * (1 - MIN_SAVING_RATIO):
+                result["compressed_path"] = slim_path
+                result["compressed_size_bytes"] = slim_size
+            else:
+                os.remove(slim_path)
+    except Exception:
+        # Compression is best-effort; the original file is still usable
+        pass
+    return result
@@ -1,15 +1,26 @@
 # utils/firebase_client.py
 
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 import firebase_admin
 from firebase_admin import credentials, firestore, storage
 from google.cloud.firestore import Client as FirestoreClient
 from google.oauth2 import service_account
 import streamlit as st
+from utils.app_logging import get_logger
 import os
+from utils.report_history import (
+    version_doc_id, snapshot_base, build_version_entry, rebuild_report
+)
+from utils.rollups import (
+    ROLLUPS_COLLECTION, CONTRIBUTION_FIELD, report_contribution, rollup_deltas, shard_doc_id, pick_shard,
+    all_shard_doc_ids, combine_shards
+)
+from utils.metrics import get_metrics, count_reads, count_writes
+# Every document read and write is counted by collection and page (see
+# utils/metrics.py), since that's what Firestore bills for.
 
 # --- Use logger instance ---
-logger = st.logger.get_logger(__name__) 
+logger = get_logger(__name__) 
 # --- End logger instance ---
 
 # --- Get Common Config ---
@@ -24,73 +35,137 @@ except Exception as e:
 
 # --- NEW: Hybrid Auth Logic ---
 IS_GOOGLE_CLOUD_ENV = st.secrets.get("IS_GOOGLE_CLOUD_ENV", "false").lower() == "true"
-db = None
-bucket = None
-
-if IS_GOOGLE_CLOUD_ENV:
-    logger.info("Using Application Default Credentials (ADC) for Google Cloud.")
-    try:
-        # 1. Initialize Firebase App (for Storage, etc.)
-        # No credentials needed, ADC is used automatically.
-        if not firebase_admin._apps:
-            firebase_admin.initialize_app(options={
-                "storageBucket": BUCKET_NAME
-            })
+
+@st.cache_resource
+def _connect():
+    """
+    Connects to Firestore and Cloud Storage on first use, rather than on
+    import, so modules that only import this one (or the repository layer,
+    see utils/repository.py) work without credentials.
+    """
+    db = None
+    bucket = None
+
+    if IS_GOOGLE_CLOUD_ENV:
+        logger.info("Using Application Default Credentials (ADC) for Google Cloud.")
+        try:
+            # 1. Initialize Firebase App (for Storage, etc.)
+            # No credentials needed, ADC is used automatically.
+            if not firebase_admin._apps:
+                firebase_admin.initialize_app(options={
+                    "storageBucket": BUCKET_NAME
+                })
         
-        # 2. Get FirestoreClient (for Database)
-        # No credentials needed, ADC is used automatically.
-        db = FirestoreClient(
-            project=PROJECT_ID,
-            database=DATABASE_ID
-        )
+            # 2. Get FirestoreClient (for Database)
+            # No credentials needed, ADC is used automatically.
+            db = FirestoreClient(
+                project=PROJECT_ID,
+                database=DATABASE_ID
+            )
         
-        bucket = storage.bucket(name=BUCKET_NAME)
-        logger.info("Firebase (ADC) initialized successfully.")
+            bucket = storage.bucket(name=BUCKET_NAME)
+            logger.info("Firebase (ADC) initialized successfully.")
         
-    except Exception as e:
-        logger.error(f"Failed to initialize Firebase with ADC: {e}")
-        st.error(f"Failed to initialize Google Cloud connection: {e}")
-        st.stop()
-else:
-    logger.info("Using local Service Account file for credentials.")
-    # --- This is the original logic ---
-    firebase_cred_path = st.secrets.get("FIREBASE_CREDENTIALS_PATH", "")
-    if not firebase_cred_path or not os.path.exists(firebase_cred_path):
-        logger.error("FIREBASE_CREDENTIALS_PATH not found in secrets or file is missing.")
-        st.error("Firebase credentials not found. App cannot start in local mode.")
-        st.stop()
+        except Exception as e:
+            logger.error(f"Failed to initialize Firebase with ADC: {e}")
+            st.error(f"Failed to initialize Google Cloud connection: {e}")
+            st.stop()
+    else:
+        logger.info("Using local Service Account file for credentials.")
+        # --- This is the original logic ---
+        firebase_cred_path = st.secrets.get("FIREBASE_CREDENTIALS_PATH", "")
+        if not firebase_cred_path or not os.path.exists(firebase_cred_path):
+            logger.error("FIREBASE_CREDENTIALS_PATH not found in secrets or file is missing.")
+            st.error("Firebase credentials not found. App cannot start in local mode.")
+            st.stop()
         
-    try:
-        # 3. Create the firebase-admin credential (for app init and storage)
-        cred_firebase = credentials.Certificate(firebase_cred_path)
+        try:
+            # 3. Create the firebase-admin credential (for app init and storage)
+            cred_firebase = credentials.Certificate(firebase_cred_path)
 
-        # 4. Create the google-auth credential (for FirestoreClient)
-        cred_google_auth = service_account.Credentials.from_service_account_file(firebase_cred_path)
+            # 4. Create the google-auth credential (for FirestoreClient)
+            cred_google_auth = service_account.Credentials.from_service_account_file(firebase_cred_path)
 
-        # 5. Initialize the Firebase app (using its credential)
-        if not firebase_admin._apps:
-            firebase_admin.initialize_app(cred_firebase, {
-                "storageBucket": BUCKET_NAME
-            })
+            # 5. Initialize the Firebase app (using its credential)
+            if not firebase_admin._apps:
+                firebase_admin.initialize_app(cred_firebase, {
+                    "storageBucket": BUCKET_NAME
+                })
 
-        # 6. Use FirestoreClient (with the google-auth credential)
-        db = FirestoreClient(
-            project=PROJECT_ID,
-            credentials=cred_google_auth, # <-- Use the correct credential object
-            database=DATABASE_ID
-        )
+            # 6. Use FirestoreClient (with the google-auth credential)
+            db = FirestoreClient(
+                project=PROJECT_ID,
+                credentials=cred_google_auth, # <-- Use the correct credential object
+                database=DATABASE_ID
+            )
 
-        bucket = storage.bucket(name=BUCKET_NAME)
-        logger.info("Firebase (local credentials) initialized successfully.")
-    except Exception as e:
-        logger.error(f"Failed to initialize Firebase with local credentials: {e}")
-        st.error(f"Failed to load local credentials: {e}")
-        st.stop()
+            bucket = storage.bucket(name=BUCKET_NAME)
+            logger.info("Firebase (local credentials) initialized successfully.")
+        except Exception as e:
+            logger.error(f"Failed to initialize Firebase with local credentials: {e}")
+            st.error(f"Failed to load local credentials: {e}")
+            st.stop()
+    return db, bucket
+
+def get_db() -> FirestoreClient:
+    return _connect()[0]
+
+def get_bucket():
+    return _connect()[1]
 # --- END NEW HYBRID AUTH ---
 
 
-now = datetime.now() 
-iso_now = now.isoformat()             # JSON-safe string
+def reserve_company_id() -> str:
+    """
+    Returns a fresh company document ID without writing anything, so files
+    can be uploaded under it before the company record is created.
+    """
+    return get_db().collection("companies").document().id
+
+def create_company_record(company_name: str, company_id: str | None = None) -> str:
+    """Creates the company document with a pending status and returns its ID."""
+    if not company_name:
+        raise ValueError("Company name cannot be empty.")
+
+    created_at = datetime.now().isoformat()
+    record = {
+        "company_analysed": company_name,
+        "analysis_status": "Pending",
+        "created_at": created_at,
+        "updated_at": created_at
+    }
+    count_writes("companies")
+    if company_id:
+        get_db().collection("companies").document(company_id).set(record)
+        return company_id
+
+    _, doc_ref = get_db().collection("companies").add(record)
+    return doc_ref.id
+
+def record_document(company_id: str, file_name: str, file_type: str, file_url: str):
+    """Saves an uploaded file's metadata under the company's documents."""
+    count_writes("documents")
+    get_db().collection("companies").document(company_id).collection("documents").add({
+        "file_name": file_name,
+        "file_type": file_type,
+        "storage_url": file_url,
+        "uploaded_at": datetime.now().isoformat()
+    })
+
+def upload_document(company_id: str, file) -> str:
+    """Uploads one file to Cloud Storage, records it and returns its public URL."""
+    blob = get_bucket().blob(f"companies/{company_id}/{file.name}")
+    file.seek(0)
+    blob.upload_from_file(file, content_type=file.type)
+    get_metrics().upload_bytes.inc(file.size, source="server")
+
+    # Make file public (for demo purposes)
+    blob.make_public()
+    file_url = blob.public_url
+
+    # Save file metadata in Firestore
+    record_document(company_id, file.name, file.type, file_url)
+    return file_url
 
 def upload_company_and_docs(company_name, uploaded_files):
     """Uploads company info and documents to Firestore and Cloud Storage."""
@@ -99,58 +174,353 @@ def upload_company_and_docs(company_name, uploaded_files):
         
     try:
         # Create a document with an initial pending status
-        company_ref, doc_ref = db.collection("companies").add({
-            "company_analysed": company_name,
-            "analysis_status": "Pending",
-            "created_at": iso_now,
-            "updated_at": iso_now
-        })
-
-        # Get the company id
-        company_id = doc_ref.id
+        company_id = create_company_record(company_name)
 
         # Upload docs to Google Storage
-        file_urls = []
-        if uploaded_files:
-            for file in uploaded_files:
-                blob = bucket.blob(f"companies/{company_id}/{file.name}")
-                blob.upload_from_file(file, content_type=file.type)
-
-                # Make file public (for demo purposes)
-                blob.make_public()
-                file_url = blob.public_url
-                file_urls.append(file_url)
-
-                # Save file metadata in Firestore
-                db.collection("companies").document(company_id).collection("documents").add({
-                    "file_name": file.name,
-                    "file_type": file.type,
-                    "storage_url": file_url,
-                    "uploaded_at": iso_now
-                })
+        file_urls = [upload_document(company_id, file) for file in uploaded_files or []]
         return company_id, file_urls
     except Exception as e:
         logger.error(f"Error uploading company and documents: {e}")
         raise e
 
 # --- NEW FUNCTION 1: Save Analysis ---
-def save_analysis_to_firestore(company_id: str, analysis_data: dict):
+@firestore.transactional
+def _save_report_version(transaction, company_ref, analysis_data: dict) -> tuple[int, dict]:
+    """
+    Writes the new report onto the company document, appends it to the
+    company's `report_versions` history and updates the portfolio rollups
+    (utils/rollups.py), in a single transaction.
+    Returns the new version number and the documents written per collection.
+    """
+    snapshot = company_ref.get(transaction=transaction)
+    writes = {"report_versions": 1, "companies": 1}
+    current = snapshot.to_dict() if snapshot.exists else {}
+    previous_report = current.get("analysis_report")
+    version = current.get("report_version", 0)
+    saved_at = datetime.now().isoformat()
+    versions_ref = company_ref.collection("report_versions")
+
+    # Reports saved before history existed become version 1
+    if previous_report is not None and version == 0:
+        version = 1
+        writes["report_versions"] += 1
+        transaction.set(
+            versions_ref.document(version_doc_id(version)),
+            build_version_entry(version, None, previous_report, current.get("updated_at", saved_at))
+        )
+
+    contribution = report_contribution(analysis_data)
+    deltas = rollup_deltas(current.get(CONTRIBUTION_FIELD), contribution, previous_report is None, saved_at)
+    version += 1
+    transaction.set(
+        versions_ref.document(version_doc_id(version)),
+        build_version_entry(version, previous_report, analysis_data, saved_at)
+    )
+    transaction.update(company_ref, {
+        "analysis_report": analysis_data,  # Save the whole JSON blob
+        "analysis_status": "Complete",     # Mark as complete
+        "report_version": version,
+        "updated_at": saved_at,
+        CONTRIBUTION_FIELD: contribution
+    })
+    # Increments don't read the rollups, so saves never contend on them
+    shard = pick_shard()
+    for name, doc_deltas in deltas.items():
+        ref = get_db().collection(ROLLUPS_COLLECTION).document(shard_doc_id(name, shard))
+        transaction.set(ref, _increments(doc_deltas), merge=True)
+    writes[ROLLUPS_COLLECTION] = len(deltas)
+    return version, writes
+
+def _increments(deltas: dict) -> dict:
+    """Rollup deltas as Firestore increment transforms."""
+    return {
+        key: _increments(value) if isinstance(value, dict) else firestore.Increment(value)
+        for key, value in deltas.items()
+    }
+
+def save_analysis_to_firestore(company_id: str, analysis_data: dict) -> int | None:
     """
-    Saves the completed analysis JSON blob to the company's Firestore document.
+    Saves the completed analysis JSON blob to the company's Firestore document,
+    keeping the previous report as a version in the company's history.
+    Returns the saved version number, or None if the save failed.
     """
     try:
-        company_ref = db.collection("companies").document(company_id)
-        company_ref.update({
-            "analysis_report": analysis_data,  # Save the whole JSON blob
-            "analysis_status": "Complete",     # Mark as complete
-            "updated_at": datetime.now().isoformat()
-        })
-        logger.info(f"Successfully saved analysis for company {company_id}")
+        company_ref = get_db().collection("companies").document(company_id)
+        version, writes = _save_report_version(get_db().transaction(), company_ref, analysis_data)
+        # Counted once the transaction commits, however many attempts it took
+        count_reads("companies")
+        for collection, documents in writes.items():
+            count_writes(collection, documents)
+        logger.info(f"Successfully saved analysis for company {company_id} (version {version})")
+        return version
     except Exception as e:
         # Log the error but don't stop the app. The user still has the
         # analysis in their session.
         logger.error(f"Error saving analysis to Firestore for {company_id}: {e}")
         st.error(f"Note: Could not save analysis to database. Error: {e}")
+        return None
+
+# --- Report Version History ---
+def get_report_version(company_id: str, version: int) -> dict | None:
+    """
+    Rebuilds a specific version of a company's report from its nearest
+    snapshot and the deltas after it. Returns None if it can't be rebuilt.
+    """
+    try:
+        versions_ref = get_db().collection("companies").document(company_id).collection("report_versions")
+        refs = [
+            versions_ref.document(version_doc_id(v))
+            for v in range(snapshot_base(version), version + 1)
+        ]
+        # One batched read for the whole chain
+        entries = {doc.id: doc.to_dict() for doc in get_db().get_all(refs) if doc.exists}
+        count_reads("report_versions", len(refs))
+        chain = [entries.get(ref.id) for ref in refs]
+        if None in chain:
+            logger.warning(f"Report history for {company_id} is missing entries up to version {version}")
+            return None
+        return rebuild_report(chain)
+    except Exception as e:
+        logger.error(f"Error loading report version {version} for {company_id}: {e}")
+        return None
+
+def get_previous_report(company_id: str) -> dict | None:
+    """
+    Returns the report version saved before the company's current report
+    (e.g. the pre-Q&A report), or None if there is no earlier version.
+    """
+    try:
+        doc = get_db().collection("companies").document(company_id).get()
+        count_reads("companies")
+        current_version = (doc.to_dict() or {}).get("report_version", 0) if doc.exists else 0
+    except Exception as e:
+        logger.error(f"Error reading report version for {company_id}: {e}")
+        return None
+
+    if current_version < 2:
+        return None
+    return get_report_version(company_id, current_version - 1)
+
+# --- Analysis Result Cache ---
+# Entries point at a report version instead of copying the report. Firestore's
+# TTL policy on `expires_at` deletes old entries; we also check it on read.
+ANALYSIS_CACHE_TTL_DAYS = int(st.secrets.get("ANALYSIS_CACHE_TTL_DAYS", 30))
+
+def get_cached_analysis(cache_key: str) -> dict | None:
+    """
+    Returns {"report", "company_id", "created_at"} for an earlier analysis
+    with identical inputs, or None if there isn't a live one.
+    """
+    try:
+        doc = get_db().collection("analysis_cache").document(cache_key).get()
+        count_reads("analysis_cache")
+        if not doc.exists:
+            return None
+        entry = doc.to_dict()
+        if entry["expires_at"] <= datetime.now(timezone.utc):
+            return None
+        report = get_report_version(entry["company_id"], entry["report_version"])
+        if report is None:
+            return None
+        return {"report": report, "company_id": entry["company_id"], "created_at": entry["created_at"]}
+    except Exception as e:
+        logger.error(f"Error reading analysis cache entry {cache_key}: {e}")
+        return None
+
+def store_cached_analysis(cache_key: str, company_id: str, report_version: int):
+    """Remembers which report version answers a given set of inputs."""
+    try:
+        now = datetime.now(timezone.utc)
+        count_writes("analysis_cache")
+        get_db().collection("analysis_cache").document(cache_key).set({
+            "company_id": company_id,
+            "report_version": report_version,
+            "created_at": now.isoformat(),
+            "expires_at": now + timedelta(days=ANALYSIS_CACHE_TTL_DAYS)
+        })
+    except Exception as e:
+        # The analysis itself is saved; only the shortcut for next time is lost
+        logger.error(f"Error writing analysis cache entry {cache_key}: {e}")
+
+# --- Backend Jobs ---
+# jobs/{job_id} is the shared record of each backend job: its status, the
+# lease of whichever instance's worker is polling it (see utils/job_worker.py)
+# and, once finished, where its result went. Times are epoch seconds so
+# leases can be compared in queries; needs a composite index on
+# (status, lease_expires_at).
+def create_job(job_id: str, record: dict):
+    count_writes("jobs")
+    get_db().collection("jobs").document(job_id).set(record)
+
+def get_job(job_id: str) -> dict | None:
+    try:
+        doc = get_db().collection("jobs").document(job_id).get()
+        count_reads("jobs")
+        return {**doc.to_dict(), "job_id": doc.id} if doc.exists else None
+    except Exception as e:
+        logger.error(f"Error reading job {job_id}: {e}")
+        return None
+
+def update_job(job_id: str, **fields):
+    try:
+        count_writes("jobs")
+        get_db().collection("jobs").document(job_id).set(fields, merge=True)
+    except Exception as e:
+        logger.error(f"Error updating job {job_id}: {e}")
+
+def list_pending_jobs() -> list[dict]:
+    """Every pending job's type, analyst and admitting instance, across all instances."""
+    try:
+        query = get_db().collection("jobs").where(
+            filter=firestore.FieldFilter("status", "==", "Pending")
+        ).select(["job_type", "analyst", "instance"])
+        jobs = [snapshot.to_dict() for snapshot in query.stream()]
+        count_reads("jobs", max(len(jobs), 1))  # An empty result still costs one read
+        return jobs
+    except Exception as e:
+        logger.error(f"Error listing pending jobs: {e}")
+        raise
+
+@firestore.transactional
+def _claim_job(transaction, job_ref, owner: str, now: float, lease_seconds: int) -> dict | None:
+    snapshot = job_ref.get(transaction=transaction)
+    job = snapshot.to_dict() if snapshot.exists else None
+    if not job or job.get("status") != "Pending" or job.get("lease_expires_at", 0) >= now:
+        return None  # Someone else got there first
+    transaction.update(job_ref, {"lease_owner": owner, "lease_expires_at": now + lease_seconds})
+    return {**job, "job_id": snapshot.id, "lease_owner": owner, "lease_expires_at": now + lease_seconds}
+
+def claim_jobs(owner: str, lease_seconds: int, limit: int, now: float) -> list[dict]:
+    """Leases up to `limit` pending jobs whose lease is free or has expired."""
+    query = get_db().collection("jobs").where(
+        filter=firestore.FieldFilter("status", "==", "Pending")
+    ).where(
+        filter=firestore.FieldFilter("lease_expires_at", "<", now)
+    ).limit(limit)
+    claimed = []
+    for snapshot in query.stream():
+        count_reads("jobs")
+        job = _claim_job(get_db().transaction(), snapshot.reference, owner, now, lease_seconds)
+        # Counted once the transaction commits, however many attempts it took
+        count_reads("jobs")
+        if job:
+            count_writes("jobs")
+            claimed.append(job)
+    return claimed
+
+@firestore.transactional
+def _renew_lease(transaction, job_ref, owner: str, expires_at: float) -> bool:
+    snapshot = job_ref.get(transaction=transaction)
+    job = snapshot.to_dict() if snapshot.exists else None
+    if not job or job.get("status") != "Pending" or job.get("lease_owner") != owner:
+        return False
+    transaction.update(job_ref, {"lease_expires_at": expires_at})
+    return True
+
+def renew_job_leases(owner: str, job_ids: list[str], lease_seconds: int, now: float) -> list[str]:
+    """Extends this owner's leases. Returns the jobs it still holds."""
+    jobs_ref = get_db().collection("jobs")
+    kept = [
+        job_id for job_id in job_ids
+        if _renew_lease(get_db().transaction(), jobs_ref.document(job_id), owner, now + lease_seconds)
+    ]
+    # Counted once the transactions commit, however many attempts they took
+    count_reads("jobs", len(job_ids))
+    count_writes("jobs", len(kept))
+    return kept
+
+@firestore.transactional
+def _finish_job(transaction, job_ref, fields: dict) -> bool:
+    snapshot = job_ref.get(transaction=transaction)
+    if not snapshot.exists or snapshot.to_dict().get("status") != "Pending":
+        return False  # Already finished or cancelled; that outcome stands
+    transaction.update(job_ref, fields)
+    return True
+
+def finish_job(job_id: str, **fields) -> bool:
+    """Writes a pending job's final status and fields. Returns False, writing nothing, if it already ended."""
+    try:
+        finished = _finish_job(get_db().transaction(), get_db().collection("jobs").document(job_id), fields)
+    except Exception as e:
+        logger.error(f"Error finishing job {job_id}: {e}")
+        return False
+    # Counted once the transaction commits, however many attempts it took
+    count_reads("jobs")
+    if finished:
+        count_writes("jobs")
+    return finished
+
+def mark_company_cancelled(company_id: str):
+    """Marks a company cancelled if its analysis never completed."""
+    try:
+        company_ref = get_db().collection("companies").document(company_id)
+        company = company_ref.get()
+        count_reads("companies")
+        if company.exists and company.to_dict().get("analysis_status") == "Pending":
+            count_writes("companies")
+            company_ref.update({"analysis_status": "Cancelled", "updated_at": datetime.now().isoformat()})
+    except Exception as e:
+        logger.error(f"Error marking company {company_id} cancelled: {e}")
+
+def get_current_report(company_id: str) -> dict | None:
+    """The company's latest saved report, straight from its document."""
+    try:
+        doc = get_db().collection("companies").document(company_id).get()
+        count_reads("companies")
+        return (doc.to_dict() or {}).get("analysis_report") if doc.exists else None
+    except Exception as e:
+        logger.error(f"Error reading the report for {company_id}: {e}")
+        return None
+
+# --- Deal Note Cache ---
+# Each generated deck is kept under companies/{id}/deal_notes/{content_hash},
+# and the newest one is mirrored onto the company doc so a stale deck can
+# still be offered while a new one is built.
+def get_deal_note(company_id: str, content_hash: str) -> dict | None:
+    """Returns {"slide_url", "created_at"} for a deck built from this exact content, or None."""
+    try:
+        doc = get_db().collection("companies").document(company_id).collection("deal_notes").document(content_hash).get()
+        count_reads("deal_notes")
+        return doc.to_dict() if doc.exists else None
+    except Exception as e:
+        logger.error(f"Error reading deal note {content_hash} for {company_id}: {e}")
+        return None
+
+def get_latest_deal_note(company_id: str) -> dict | None:
+    """Returns {"slide_url", "content_hash", "created_at"} for the company's newest deck, or None."""
+    try:
+        doc = get_db().collection("companies").document(company_id).get()
+        count_reads("companies")
+        return (doc.to_dict() or {}).get("deal_note") if doc.exists else None
+    except Exception as e:
+        logger.error(f"Error reading latest deal note for {company_id}: {e}")
+        return None
+
+def store_deal_note(company_id: str, content_hash: str, slide_url: str):
+    """Remembers the deck generated for a given report and Q&A transcript."""
+    try:
+        company_ref = get_db().collection("companies").document(company_id)
+        entry = {"slide_url": slide_url, "created_at": datetime.now(timezone.utc).isoformat()}
+        batch = get_db().batch()
+        batch.set(company_ref.collection("deal_notes").document(content_hash), entry)
+        batch.set(company_ref, {"deal_note": {**entry, "content_hash": content_hash}}, merge=True)
+        batch.commit()
+        count_writes("deal_notes")
+        count_writes("companies")
+    except Exception as e:
+        # The deck exists; only the shortcut for next time is lost
+        logger.error(f"Error saving deal note for {company_id}: {e}")
+
+def get_portfolio_rollups() -> dict:
+    """The portfolio rollup documents, shards combined, keyed by name (see utils/rollups.py)."""
+    try:
+        refs = [get_db().collection(ROLLUPS_COLLECTION).document(doc_id) for doc_id in all_shard_doc_ids()]
+        docs = {doc.id: doc.to_dict() for doc in get_db().get_all(refs) if doc.exists}
+        count_reads(ROLLUPS_COLLECTION, len(refs))
+        return combine_shards(docs)
+    except Exception as e:
+        logger.error(f"Error loading portfolio rollups: {e}")
+        return {}
 
 # --- NEW FUNCTION 2: Get Analyses ---
 def get_all_analyses():
@@ -159,7 +529,7 @@ def get_all_analyses():
     last updated (newest first).
     """
     try:
-        companies_ref = db.collection("companies")
+        companies_ref = get_db().collection("companies")
         
         # Create a query to get completed analyses, ordered by 'updated_at'
         query = companies_ref.where(
@@ -175,15 +545,45 @@ def get_all_analyses():
             data = doc.to_dict()
             data["company_id"] = doc.id  # Add the doc ID for keying
             analyses.append(data)
+        count_reads("companies", len(analyses))
             
         return analyses
     except Exception as e:
         logger.error(f"Error fetching all analyses: {e}")
         st.error(f"Could not load analysis history: {e}")
         return []
-    
+
+def watch_analyses(statuses: list[str], on_changes, on_error=None):
+    """
+    Starts a snapshot listener on companies with one of `statuses`, newest
+    first. `on_changes(changes)` is called from Firestore's listener thread
+    with (change type, company_id, data) for each document that was added,
+    modified or removed from the results; the first call has every match.
+    `on_error(exception)` is called if handling a snapshot fails.
+    Returns the watch, for unsubscribe(); Firestore closes it (`is_active`
+    turns false) if the stream fails. Needs a composite index on
+    companies (analysis_status, updated_at desc).
+    """
+    query = get_db().collection("companies").where(
+        filter=firestore.FieldFilter("analysis_status", "in", statuses)
+    ).order_by(
+        "updated_at", direction=firestore.Query.DESCENDING
+    )
+
+    def on_snapshot(docs, changes, read_time):
+        count_reads("companies", len(changes))
+        try:
+            on_changes([(change.type.name, change.document.id, change.document.to_dict() or {}) for change in changes])
+        except Exception as e:
+            logger.error(f"Error handling an analyses snapshot: {e}")
+            if on_error is not None:
+                on_error(e)
+
+    return query.on_snapshot(on_snapshot)
+
 # --- NEW FUNCTION 3: Fund Config ---
-FUND_CONFIG_REF = db.collection("settings").document("fund_config")
+def _fund_config_ref():
+    return get_db().collection("settings").document("fund_config")
 
 def load_fund_config():
     """
@@ -191,7 +591,8 @@ def load_fund_config():
     Returns the data dictionary if it exists, or an empty dict if not.
     """
     try:
-        doc = FUND_CONFIG_REF.get()
+        doc = _fund_config_ref().get()
+        count_reads("settings")
         if doc.exists:
             logger.info("Fund config loaded from Firestore.")
             return doc.to_dict()
@@ -210,7 +611,8 @@ def update_fund_config(field: str, data: any):
     try:
         # .update() with merge=True will create the doc if it doesn't exist
         # or just update the specific field if it does.
-        FUND_CONFIG_REF.set({field: data}, merge=True)
+        count_writes("settings")
+        _fund_config_ref().set({field: data}, merge=True)
         logger.info(f"Fund config updated for field: {field}")
     except Exception as e:
         logger.error(f"Error updating fund config for field {field}: {e}")
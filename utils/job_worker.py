@@ -0,0 +1,230 @@
+# utils/job_worker.py
+"""
+Lease-based polling of backend jobs.
+
+Sessions don't poll the backend themselves. Each instance runs one
+JobPollWorker thread that leases pending jobs from the job store (see
+utils/jobs.py), polls the backend for them, and writes the outcome where
+the UI reads it: reports are saved onto the company document, deck URLs
+onto the deal note cache, and progress and final status onto the job
+record. However many instances or sessions there are, each job is polled
+once per interval, by whichever worker holds its lease.
+
+The worker also records the backend side of each job's trace (see
+utils/tracing.py): how long it was queued (until the first poll that
+reports progress) and running, to within one poll interval, and the save.
+
+Leases are short and renewed by heartbeat while a worker keeps polling a
+job. If an instance goes away, its leases expire and another worker picks
+the jobs up. The worker starts with the app (streamlit_app.py), so that
+happens even on instances nobody has submitted a job to.
+
+An idle worker backs off its claim query, up to JOB_CLAIM_MAX_INTERVAL
+seconds between tries, so idle instances cost little; `wake()` claims
+at once, for a job this instance just submitted. With JOB_STORE = "local", the store and the worker live in
+one process, which is what tests use.
+"""
+import threading
+import time
+import requests
+import streamlit as st
+from utils.app_logging import get_logger, log_context
+from utils.circuit_breaker import get_backend_breaker, guarded_request, CircuitOpenError
+from utils.deadlines import read_progress
+from utils.repository import get_repository
+from utils.jobs import get_job_store, finish_job, cancel_job, INSTANCE_ID
+from utils.tracing import get_tracer, trace_headers
+from utils.metrics import get_metrics, observe_finished_job
+
+logger = get_logger(__name__)
+
+BACKEND_STATUS_URL = f"{st.secrets['BACKEND_BASE_URL']}/analyze/status/"
+
+JOB_POLL_INTERVAL = int(st.secrets.get("JOB_POLL_INTERVAL", 30))  # Seconds between status checks per job
+JOB_LEASE_SECONDS = int(st.secrets.get("JOB_LEASE_SECONDS", 60))
+JOB_WORKER_MAX_JOBS = int(st.secrets.get("JOB_WORKER_MAX_JOBS", 50))
+JOB_CLAIM_MAX_INTERVAL = int(st.secrets.get("JOB_CLAIM_MAX_INTERVAL", 30))  # Seconds between idle claim queries
+WORKER_TICK_SECONDS = 2
+
+
+class JobPollWorker:
+    def __init__(self, store, owner: str, lease_seconds: int = JOB_LEASE_SECONDS,
+                 max_jobs: int = JOB_WORKER_MAX_JOBS, poll_interval: int = JOB_POLL_INTERVAL):
+        self.store = store
+        self.owner = owner
+        self.lease_seconds = lease_seconds
+        self.max_jobs = max_jobs
+        self.poll_interval = poll_interval
+        self.polls = 0
+        self._leased = {}  # job_id -> job record
+        self._last_heartbeat = 0.0
+        self._claim_interval = WORKER_TICK_SECONDS
+        self._next_claim_at = 0.0
+        self._claim_now = False
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name=f"job-worker-{self.owner}", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def wake(self):
+        """Claims jobs on the next tick, without waiting out the idle back-off."""
+        self._claim_now = True
+        self._wake.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.error(f"Job worker {self.owner} tick failed: {e}")
+            self._wake.wait(WORKER_TICK_SECONDS)
+            self._wake.clear()
+
+    def run_once(self):
+        """One tick: renew leases, take on more jobs, and poll the ones that are due."""
+        now = time.time()
+        if self._leased and now - self._last_heartbeat >= self.lease_seconds / 3:
+            # Jobs that finished, were cancelled or lost to another worker drop out here
+            kept = set(self.store.renew(self.owner, list(self._leased), self.lease_seconds))
+            self._leased = {job_id: job for job_id, job in self._leased.items() if job_id in kept}
+            self._last_heartbeat = now
+
+        if len(self._leased) < self.max_jobs and (self._claim_now or now >= self._next_claim_at):
+            self._claim_now = False
+            claimed = self.store.claim(self.owner, self.lease_seconds, self.max_jobs - len(self._leased))
+            for job in claimed:
+                self._leased[job["job_id"]] = job
+            if not self._last_heartbeat:
+                self._last_heartbeat = now
+            # Back off while there's nothing to claim
+            self._claim_interval = (
+                WORKER_TICK_SECONDS if claimed else min(self._claim_interval * 2, JOB_CLAIM_MAX_INTERVAL)
+            )
+            self._next_claim_at = now + self._claim_interval
+
+        for job in [job for job in self._leased.values() if job.get("next_poll_at", 0) <= now]:
+            with log_context(company_id=job.get("company_id"), job_id=job["job_id"]):
+                self._poll(job)
+
+    def stats(self) -> dict:
+        return {"owner": self.owner, "leased_jobs": len(self._leased), "polls": self.polls,
+                "claim_interval": self._claim_interval}
+
+    def _poll(self, job: dict):
+        job_id = job["job_id"]
+        now = time.time()
+        if job.get("deadline") and now > job["deadline"]:
+            cancel_job(job_id, "Deadline passed")
+            self._leased.pop(job_id, None)
+            return
+
+        job["next_poll_at"] = now + self.poll_interval
+        try:
+            response = guarded_request(get_backend_breaker(), "get", f"{BACKEND_STATUS_URL}{job_id}", timeout=30,
+                                       headers=trace_headers((job.get("meta") or {}).get("traceparent")))
+            response.raise_for_status()
+            status_data = response.json()
+        except CircuitOpenError:
+            return
+        except requests.exceptions.RequestException as e:
+            logger.warning(f"Could not check job {job_id}: {e}")
+            return
+        self.polls += 1
+        get_metrics().status_polls.inc()
+        job["poll_count"] = job.get("poll_count", 0) + 1
+
+        job_status = status_data.get("status")
+        if job_status == "Pending":
+            progress, eta = read_progress(status_data)
+            fields = {"progress": progress, "eta_seconds": eta, "poll_count": job["poll_count"], "updated_at": now,
+                      "next_poll_at": job["next_poll_at"]}
+            if progress and not job.get("running_since"):
+                job["running_since"] = fields["running_since"] = now
+            self.store.update(job_id, **fields)
+            return
+
+        self._leased.pop(job_id, None)
+        # Cancelled here since the last lease renewal: don't save a result the analyst threw away
+        if (self.store.get(job_id) or {}).get("status") != "Pending":
+            logger.info(f"Job {job_id} ended while it was being polled; dropping the backend's {job_status}")
+            return
+        self._trace_backend_run(job, job_status, now)
+        if job_status == "Complete":
+            self._store_result(job, status_data.get("result"))
+        elif job_status == "Failed":
+            self._finish(job, "Failed", error=status_data.get("error", "Unknown analysis failure."))
+        elif job_status == "Cancelled":
+            if self._finish(job, "Cancelled", cancel_reason="Cancelled on the backend") and \
+                    job.get("job_type") == "analyze":
+                get_repository().mark_company_cancelled(job["company_id"])
+        else:
+            self._finish(job, "Failed", error=f"Unknown job status received: {job_status}")
+
+    @staticmethod
+    def _finish(job: dict, status: str, **fields) -> bool:
+        """Marks the job ended, unless it already has (a cancel got there first)."""
+        finished = finish_job(job["job_id"], status, **fields)
+        if finished:
+            observe_finished_job(job, status, time.time())
+        return finished
+
+    @staticmethod
+    def _trace_backend_run(job: dict, job_status: str, finished_at: float):
+        """The job's time queued and running on the backend, as seen from here."""
+        tracer = get_tracer()
+        parent = (job.get("meta") or {}).get("traceparent")
+        attributes = {"job_id": job["job_id"], "company_id": job.get("company_id"),
+                      "job_type": job.get("job_type"), "polls": job.get("poll_count", 0)}
+        submitted_at, running_since = job.get("submitted_at"), job.get("running_since")
+        if running_since:
+            tracer.start_span("backend.queue", parent, start_time=submitted_at, **attributes).end(running_since)
+        run = tracer.start_span("backend.run", parent, start_time=running_since or submitted_at,
+                                job_status=job_status, **attributes)
+        run.end(finished_at)
+
+    def _store_result(self, job: dict, result: dict | None):
+        """Saves a finished job's result where the UI reads it, then marks the job complete."""
+        job_id, company_id, meta = job["job_id"], job["company_id"], job.get("meta") or {}
+        if result is None:
+            self._finish(job, "Failed", error="Job completed but no result data was found.")
+            return
+
+        if job["job_type"] == "slides":
+            slide_url = result.get("slide_url")
+            if not slide_url:
+                self._finish(job, "Failed", error="Job completed but no 'slide_url' was returned in result.")
+                return
+            if meta.get("content_hash"):
+                with get_tracer().span("save", parent=meta.get("traceparent"), job_id=job_id, company_id=company_id):
+                    get_repository().store_deal_note(company_id, meta["content_hash"], slide_url)
+            self._finish(job, "Complete", slide_url=slide_url, poll_count=job.get("poll_count", 0))
+            return
+
+        repository = get_repository()
+        with get_tracer().span("save", parent=meta.get("traceparent"), job_id=job_id, company_id=company_id) as span:
+            version = repository.save_report(company_id, result)
+            span.set_attribute("report_version", version)
+        if version is None:
+            self._finish(job, "Failed", error="The result could not be saved to the database.")
+            return
+        if meta.get("cache_key"):
+            repository.store_cached_analysis(meta["cache_key"], company_id, version)
+        self._finish(job, "Complete", report_version=version, poll_count=job.get("poll_count", 0))
+
+
+@st.cache_resource
+def get_job_worker() -> JobPollWorker:
+    """This instance's job worker, started on first use (streamlit_app.py uses it at app start)."""
+    owner = INSTANCE_ID
+    worker = JobPollWorker(get_job_store(), owner)
+    worker.start()
+    get_metrics().register_stats("job_worker", worker.stats)
+    logger.info(f"Started job worker {owner}")
+    return worker
@@ -0,0 +1,332 @@
+# utils/jobs.py
+"""
+Tracking and cancelling backend jobs.
+
+Each job a session submits is registered here under that session and
+recorded in the job store: Firestore's `jobs/{job_id}`, or an in-memory
+store with JOB_STORE = "local" for single-process tests. The job worker
+(utils/job_worker.py) polls the backend and writes each job's progress and
+outcome to its record; sessions only read it. A job can be cancelled:
+
+- by the analyst, with the cancel button shown in the job's status box;
+- when the same session submits a new analysis, superseding the old one;
+- when the session ends (the browser tab is closed and Streamlit drops the
+  session), so nobody is left waiting for the result.
+
+Cancelling calls the backend's cancel endpoint, which frees its capacity
+for queued work, and marks the job cancelled in Firestore. A job ends only
+once: a cancel and the worker's outcome both move it on from "Pending" in
+one transaction, and whichever comes second changes nothing.
+JOB_CANCEL_BACKEND = "stub" swaps the endpoint for an in-memory stand-in,
+for tests and offline development.
+"""
+import os
+import socket
+import threading
+import time
+import uuid
+import weakref
+import requests
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+from utils.app_logging import get_logger, bind_log_context
+from utils.circuit_breaker import get_backend_breaker, guarded_request
+from utils.repository import get_repository
+from utils.session_memory import session_anchor
+from utils.metrics import observe_finished_job
+
+logger = get_logger(__name__)
+
+JOB_CANCEL_BACKEND = st.secrets.get("JOB_CANCEL_BACKEND", "http")  # "http" or "stub"
+JOB_STORE = st.secrets.get("JOB_STORE", "firestore")  # "firestore" or "local"
+BACKEND_CANCEL_URL = f"{st.secrets['BACKEND_BASE_URL']}/analyze/cancel/"
+# This process, as recorded on the jobs it submits
+INSTANCE_ID = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+
+
+class HttpCancelBackend:
+    """The backend's own cancel endpoint."""
+
+    def cancel(self, job_id: str) -> bool:
+        """Returns True if the backend stopped the job, False if it had already finished."""
+        response = guarded_request(get_backend_breaker(), "post", f"{BACKEND_CANCEL_URL}{job_id}", timeout=10)
+        if response.status_code in (404, 409):
+            return False
+        response.raise_for_status()
+        return True
+
+
+class StubCancelBackend:
+    """Stand-in for the cancel endpoint that only remembers what it was asked to cancel."""
+
+    def __init__(self):
+        self.cancelled = []
+        self._lock = threading.Lock()
+
+    def cancel(self, job_id: str) -> bool:
+        with self._lock:
+            if job_id in self.cancelled:
+                return False
+            self.cancelled.append(job_id)
+            return True
+
+
+@st.cache_resource
+def get_cancel_backend():
+    if JOB_CANCEL_BACKEND == "stub":
+        logger.info("Using the stub job cancel backend")
+        return StubCancelBackend()
+    return HttpCancelBackend()
+
+
+class FirestoreJobStore:
+    """Job records in Firestore, shared by every instance."""
+
+    def __init__(self):
+        # Imported here so the local store doesn't need firebase-admin
+        from utils import firebase_client
+        self._fb = firebase_client
+
+    def create(self, job_id: str, record: dict):
+        self._fb.create_job(job_id, record)
+
+    def get(self, job_id: str) -> dict | None:
+        return self._fb.get_job(job_id)
+
+    def update(self, job_id: str, **fields):
+        self._fb.update_job(job_id, **fields)
+
+    def finish(self, job_id: str, **fields) -> bool:
+        return self._fb.finish_job(job_id, **fields)
+
+    def pending_elsewhere(self, instance: str) -> list[tuple[str, str]]:
+        return [
+            (job.get("job_type"), job.get("analyst")) for job in self._fb.list_pending_jobs()
+            if job.get("instance") != instance
+        ]
+
+    def claim(self, owner: str, lease_seconds: int, limit: int) -> list[dict]:
+        return self._fb.claim_jobs(owner, lease_seconds, limit, time.time())
+
+    def renew(self, owner: str, job_ids: list[str], lease_seconds: int) -> list[str]:
+        return self._fb.renew_job_leases(owner, job_ids, lease_seconds, time.time())
+
+
+class LocalJobStore:
+    """Job records in memory, for a single process (tests and offline development)."""
+
+    def __init__(self):
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def create(self, job_id: str, record: dict):
+        with self._lock:
+            self._jobs[job_id] = {**record, "job_id": job_id}
+
+    def get(self, job_id: str) -> dict | None:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def update(self, job_id: str, **fields):
+        with self._lock:
+            self._jobs.setdefault(job_id, {"job_id": job_id}).update(fields)
+
+    def finish(self, job_id: str, **fields) -> bool:
+        """Writes a pending job's final status and fields. Returns False, writing nothing, if it already ended."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if not job or job.get("status") != "Pending":
+                return False
+            job.update(fields)
+            return True
+
+    def pending_elsewhere(self, instance: str) -> list[tuple[str, str]]:
+        """(job_type, analyst) of every pending job submitted by another instance."""
+        with self._lock:
+            return [
+                (job.get("job_type"), job.get("analyst")) for job in self._jobs.values()
+                if job.get("status") == "Pending" and job.get("instance") != instance
+            ]
+
+    def claim(self, owner: str, lease_seconds: int, limit: int) -> list[dict]:
+        now = time.time()
+        claimed = []
+        with self._lock:
+            for job in self._jobs.values():
+                if len(claimed) >= limit:
+                    break
+                if job.get("status") == "Pending" and job.get("lease_expires_at", 0) < now:
+                    job.update(lease_owner=owner, lease_expires_at=now + lease_seconds)
+                    claimed.append(dict(job))
+        return claimed
+
+    def renew(self, owner: str, job_ids: list[str], lease_seconds: int) -> list[str]:
+        now = time.time()
+        kept = []
+        with self._lock:
+            for job_id in job_ids:
+                job = self._jobs.get(job_id)
+                if job and job.get("status") == "Pending" and job.get("lease_owner") == owner:
+                    job["lease_expires_at"] = now + lease_seconds
+                    kept.append(job_id)
+        return kept
+
+
+@st.cache_resource
+def get_job_store():
+    if JOB_STORE == "local":
+        logger.info("Using the in-memory job store")
+        return LocalJobStore()
+    return FirestoreJobStore()
+
+
+class ActiveJobs:
+    """Jobs still running, by job ID, with the session that started them."""
+
+    def __init__(self):
+        self._jobs = {}  # job_id -> {"session_id", "job_type", "company_id"}
+        self._lock = threading.Lock()
+
+    def add(self, job_id: str, session_id: str, job_type: str, company_id: str):
+        with self._lock:
+            self._jobs[job_id] = {"session_id": session_id, "job_type": job_type, "company_id": company_id}
+
+    def remove(self, job_id: str) -> dict | None:
+        with self._lock:
+            return self._jobs.pop(job_id, None)
+
+    def detach(self, job_id: str):
+        """Stops tying a job to its session, so the session ending won't cancel it."""
+        with self._lock:
+            if job_id in self._jobs:
+                self._jobs[job_id]["session_id"] = None
+
+    def for_session(self, session_id: str, job_type: str | None = None) -> list[str]:
+        with self._lock:
+            return [
+                job_id for job_id, job in self._jobs.items()
+                if job["session_id"] == session_id and job_type in (None, job["job_type"])
+            ]
+
+
+@st.cache_resource
+def get_active_jobs() -> ActiveJobs:
+    """The single ActiveJobs registry shared by every session in this process."""
+    return ActiveJobs()
+
+
+def track_job(job_id: str, job_type: str, company_id: str, first_poll_in: int,
+              deadline: float, meta: dict | None = None):
+    """
+    Registers a job the current session just submitted, and hands it to the
+    job worker. `meta` carries what the worker needs to store the result
+    (e.g. the analysis cache key).
+    """
+    ctx = get_script_run_ctx(suppress_warning=True)
+    session_id = ctx.session_id if ctx is not None else "background"
+    bind_log_context(company_id=company_id, job_id=job_id)
+    get_active_jobs().add(job_id, session_id, job_type, company_id)
+    now = time.time()
+    get_job_store().create(job_id, {
+        "job_type": job_type,
+        "company_id": company_id,
+        "status": "Pending",
+        "submitted_at": now,
+        "updated_at": now,
+        "next_poll_at": now + first_poll_in,
+        "deadline": deadline,
+        "lease_owner": None,
+        "lease_expires_at": 0,
+        "instance": INSTANCE_ID,  # Admission control on other instances counts this job
+        "analyst": session_id,
+        "meta": meta or {}
+    })
+
+    # Cancel whatever is still running once Streamlit drops the session
+    if ctx is not None and "_jobs_finalizer" not in st.session_state:
+        st.session_state["_jobs_finalizer"] = weakref.finalize(session_anchor(), _on_session_end, session_id)
+
+
+def finish_job(job_id: str, status: str, **fields) -> bool:
+    """
+    Records how a job ended ("Complete", "Failed", ...). Only a pending job
+    can end, so whichever of the worker and a cancel gets there first wins;
+    returns False if the job had already ended.
+    """
+    get_active_jobs().remove(job_id)
+    return get_job_store().finish(job_id, status=status, updated_at=time.time(), **fields)
+
+
+def hand_off_job(job_id: str):
+    """For a job the session stops waiting for; the worker still saves its result."""
+    get_active_jobs().detach(job_id)
+    get_job_store().update(job_id, unattended=True, updated_at=time.time())
+
+
+def cancel_job(job_id: str, reason: str) -> bool:
+    """
+    Cancels a job on the backend and marks it cancelled in Firestore, unless
+    it already ended. Returns whether the backend confirmed it stopped the job.
+    """
+    get_active_jobs().remove(job_id)
+    try:
+        stopped = get_cancel_backend().cancel(job_id)
+    except requests.exceptions.RequestException as e:
+        logger.error(f"Could not cancel job {job_id} on the backend: {e}")
+        stopped = False
+    job = get_job_store().get(job_id) or {}
+    now = time.time()
+    if not finish_job(job_id, "Cancelled", cancel_reason=reason):
+        logger.info(f"Job {job_id} had already ended; not marking it cancelled ({reason})")
+        return stopped
+    observe_finished_job(job, "Cancelled", now)
+    if job.get("job_type") == "analyze" and job.get("company_id"):
+        get_repository().mark_company_cancelled(job["company_id"])
+    logger.info(f"Cancelled job {job_id} ({reason}); backend stopped it: {stopped}")
+    return stopped
+
+
+def cancel_session_jobs(session_id: str, reason: str, job_type: str | None = None):
+    for job_id in get_active_jobs().for_session(session_id, job_type):
+        cancel_job(job_id, reason)
+
+
+def cancel_current_session_jobs(reason: str, job_type: str | None = None):
+    ctx = get_script_run_ctx(suppress_warning=True)
+    if ctx is not None:
+        cancel_session_jobs(ctx.session_id, reason, job_type)
+
+
+def _on_session_end(session_id: str):
+    # Finalizers run on whichever thread drops the session; don't block it on HTTP
+    threading.Thread(
+        target=cancel_session_jobs,
+        args=(session_id, "The analyst's session ended"),
+        name=f"cancel-jobs-{session_id[:8]}",
+        daemon=True
+    ).start()
+
+
+# --- Status box UI ---
+def _request_cancel(job_id: str, label: str):
+    # Runs at the start of the rerun the click triggers, after the polling run has stopped
+    cancel_job(job_id, "Cancelled by the analyst")
+    st.session_state["cancelled_job_notice"] = f"{label} was cancelled (Job ID: {job_id})."
+
+
+def cancel_button(job_id: str, label: str):
+    """A button that stops the running job. Clicking it also stops this script run's polling."""
+    st.button(
+        f"✖ Cancel {label.lower()}",
+        key=f"cancel_job_{job_id}",
+        on_click=_request_cancel,
+        args=(job_id, label)
+    )
+
+
+def cancelled_job_notice():
+    """Shows the confirmation after a job was cancelled from its status box."""
+    notice = st.session_state.pop("cancelled_job_notice", None)
+    if notice:
+        st.info(notice, icon="✖")
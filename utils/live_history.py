@@ -0,0 +1,274 @@
+# utils/live_history.py
+"""
+A live view of the Analysis History, shared by every session.
+
+One Firestore snapshot listener per process (the repository's
+`watch_analyses`) watches the companies whose analysis is in progress or
+complete. The first snapshot loads them all; after that Firestore only
+sends the documents that changed, and each change is applied to an
+in-memory list kept sorted by `updated_at`. Pages read the list instead of querying Firestore, so a new analysis, or one that just
+completed, shows up within a refresh without any further collection scans.
+
+If the listener fails (Firestore closes it, e.g. when its index is
+missing), it is restarted, at most every RESTART_INTERVAL_SECONDS. Until
+it delivers a snapshot, pages wait for it only once per process and then
+fall back to a direct query, rerun at most every FALLBACK_REFRESH_SECONDS.
+
+Only the fields the history page displays are kept as rows; the report
+itself is read from Firestore when an analyst loads it. The same changes
+also update a full-text index over the reports (utils/search_index.py),
+which the page's search box queries.
+
+Other components can `subscribe` to the listener's changes instead of
+opening a listener of their own (the analytics mirror does, see
+utils/analytics_mirror.py). A subscriber that joins after the first
+snapshot gets the listener restarted, so it too starts from every
+document.
+"""
+import bisect
+import threading
+import time
+import streamlit as st
+from utils.app_logging import get_logger
+from utils.repository import get_repository
+from utils.metrics import get_metrics
+from utils.search_index import SearchIndex
+
+logger = get_logger(__name__)
+
+LIVE_STATUSES = ["Pending", "Complete"]
+SUMMARY_FIELDS = ("company_analysed", "analysis_status", "created_at", "updated_at", "report_version")
+FIRST_SNAPSHOT_TIMEOUT = 10  # Seconds the first page waits for the listener before querying directly
+FALLBACK_REFRESH_SECONDS = 60  # How stale the direct query's results may get while the listener is down
+RESTART_INTERVAL_SECONDS = 60  # Least time between listener restarts
+
+
+def _sort_key(row: dict) -> tuple:
+    return (row.get("updated_at") or "", row["company_id"])
+
+
+class LiveAnalysisHistory:
+    """Analyses kept in sync with Firestore, newest first."""
+
+    def __init__(self, statuses: list[str] = LIVE_STATUSES):
+        self.statuses = statuses
+        self.version = 0  # Bumped on every batch of changes applied
+        self._rows = []  # Sorted oldest first; read in reverse
+        self._by_id = {}  # company_id -> row
+        self.index = SearchIndex()
+        self.restarts = 0
+        self._ready = threading.Event()
+        self._watch = None
+        self._watch_failed = False
+        self._started_at = 0.0
+        self._resync = False  # The next snapshot is a restarted listener's full one
+        self._waited = False
+        self._fallback = None  # (rows, fetched at) from the direct query
+        self._fallback_lock = threading.Lock()
+        self._subscribers = []
+        self._delivered = False  # Whether any snapshot has been passed on to the subscribers
+        self._lock = threading.Lock()
+
+    def start(self):
+        self._started_at = time.monotonic()
+        self._watch_failed = False
+        self._watch = get_repository().watch_analyses(self.statuses, self.apply_changes, self._on_watch_error)
+
+    def stop(self):
+        if self._watch is not None:
+            self._watch.unsubscribe()
+            self._watch = None
+
+    def subscribe(self, on_changes):
+        """
+        Calls `on_changes(changes)`, from the listener's thread, with every
+        batch of (change type, company_id, data) tuples applied here; the
+        first batch it gets has every document.
+        """
+        with self._lock:
+            self._subscribers.append(on_changes)
+            if not self._delivered:
+                return  # It will get the first snapshot
+            self._started_at = time.monotonic()
+            self._resync = True
+        logger.info("Restarting the Analysis History listener for a new subscriber")
+        self._restart()
+
+    def unsubscribe(self, on_changes):
+        with self._lock:
+            if on_changes in self._subscribers:
+                self._subscribers.remove(on_changes)
+
+    def ensure_listening(self):
+        """Restarts the listener if it failed, or hasn't delivered a snapshot in RESTART_INTERVAL_SECONDS."""
+        with self._lock:
+            active = self._watch is not None and getattr(self._watch, "is_active", True) and not self._watch_failed
+            if active and self._ready.is_set():
+                return
+            if time.monotonic() - self._started_at < RESTART_INTERVAL_SECONDS:
+                return
+            self._started_at = time.monotonic()  # Other callers leave it to this one
+            self._resync = True
+        logger.warning("Restarting the Analysis History listener")
+        self._restart()
+
+    def _restart(self):
+        try:
+            self.stop()
+        except Exception as e:
+            logger.error(f"Could not stop the Analysis History listener: {e}")
+        try:
+            self.start()
+            self.restarts += 1
+        except Exception as e:
+            logger.error(f"Could not restart the Analysis History listener: {e}")
+
+    def _on_watch_error(self, error: Exception):
+        self._watch_failed = True
+
+    def apply_changes(self, changes: list[tuple[str, str, dict]]):
+        """Applies (change type, company_id, data) tuples from the listener."""
+        with self._lock:
+            if self._resync:
+                # A restarted listener sends everything again; drop what it no longer matches
+                self._rows, self._by_id, self.index = [], {}, SearchIndex()
+                self._resync = False
+            for change_type, company_id, data in changes:
+                self._remove(company_id)
+                if change_type != "REMOVED":
+                    row = {field: data.get(field) for field in SUMMARY_FIELDS}
+                    row["company_id"] = company_id
+                    bisect.insort(self._rows, row, key=_sort_key)
+                    self._by_id[company_id] = row
+            self.version += 1
+            self._delivered = True
+            subscribers = list(self._subscribers)
+        # Indexed and passed on outside the lock, so pages can read rows meanwhile
+        for on_changes in subscribers:
+            try:
+                on_changes(changes)
+            except Exception as e:
+                logger.error(f"A subscriber failed to handle {len(changes)} analysis changes: {e}")
+        for change_type, company_id, data in changes:
+            try:
+                if change_type == "REMOVED":
+                    self.index.remove(company_id)
+                else:
+                    self.index.upsert(company_id, data)
+            except Exception as e:
+                logger.error(f"Could not index the report for {company_id}: {e}")
+        if not self._ready.is_set():
+            logger.info("Analysis History listener is live")
+        self._ready.set()
+        self._fallback = None
+
+    def wait_until_ready(self, timeout: float) -> bool:
+        return self._ready.wait(timeout)
+
+    def is_ready(self) -> bool:
+        """Whether the listener has delivered a snapshot. Only the first caller waits for it."""
+        if self._ready.is_set():
+            return True
+        with self._lock:
+            waited, self._waited = self._waited, True
+        return False if waited else self._ready.wait(FIRST_SNAPSHOT_TIMEOUT)
+
+    def fallback_rows(self) -> list[dict]:
+        """Completed analyses from a direct query, rerun at most every FALLBACK_REFRESH_SECONDS."""
+        with self._fallback_lock:
+            if self._fallback is None:
+                logger.warning("Analysis History listener is not ready; querying Firestore directly")
+            elif time.monotonic() - self._fallback[1] < FALLBACK_REFRESH_SECONDS:
+                return self._fallback[0]
+            rows = get_repository().list_analyses()
+            self._fallback = (rows, time.monotonic())
+            return rows
+
+    def view_version(self) -> tuple:
+        """Changes whenever the rows or search results may have: a batch from the listener, or a new fallback query."""
+        if self.is_ready():
+            return ("live", self.version)
+        self.fallback_rows()  # Re-queries when due
+        fallback = self._fallback
+        return ("fallback", fallback[1] if fallback else 0.0)
+
+    def rows(self, status: str | None = None) -> list[dict]:
+        """The analyses, newest first, optionally only those with `status`."""
+        with self._lock:
+            return [row for row in reversed(self._rows) if status in (None, row["analysis_status"])]
+
+    def search(self, query: str, **filters) -> list[dict]:
+        """Rows matching `query` and `filters` (see SearchIndex.search), best match first."""
+        results = self.index.search(query, **filters)
+        with self._lock:
+            return [
+                {**self._by_id[result["company_id"]], "matched_fields": result["matched_fields"]}
+                for result in results if result["company_id"] in self._by_id
+            ]
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = {"analyses": len(self._rows), "version": self.version, "ready": self._ready.is_set(),
+                     "restarts": self.restarts}
+        return {**stats, "search_index": self.index.stats()}
+
+    # --- Internals (call with the lock held) ---
+    def _remove(self, company_id: str):
+        row = self._by_id.pop(company_id, None)
+        if row is None:
+            return
+        index = bisect.bisect_left(self._rows, _sort_key(row), key=_sort_key)
+        while self._rows[index] is not row:
+            index += 1
+        del self._rows[index]
+
+
+@st.cache_resource
+def get_live_history() -> LiveAnalysisHistory:
+    """The single live history shared by every session in this process."""
+    history = LiveAnalysisHistory()
+    history.start()
+    get_metrics().register_stats("live_history", history.stats)
+    logger.info("Started the Analysis History listener")
+    return history
+
+
+def list_analyses() -> list[dict]:
+    """
+    The history page's analyses, newest first. Falls back to a direct
+    query while the listener isn't delivering snapshots.
+    """
+    history = get_live_history()
+    history.ensure_listening()
+    if history.is_ready():
+        return history.rows()
+    return history.fallback_rows()
+
+
+def history_version() -> tuple:
+    """
+    Changes whenever `list_analyses` or `search_analyses` may return
+    something new. Cheap, so pages can check it on a timer and redraw only
+    when it moves.
+    """
+    history = get_live_history()
+    history.ensure_listening()
+    return history.view_version()
+
+
+def search_analyses(query: str, **filters) -> list[dict] | None:
+    """
+    The history page's search: analyses whose reports match `query`, best
+    match first, each with the report fields it matched in. None while the
+    listener (which feeds the search index) isn't delivering snapshots.
+    """
+    history = get_live_history()
+    history.ensure_listening()
+    if not history.is_ready():
+        return None
+    return history.search(query, **filters)
+
+
+def analysis_industries() -> list[str]:
+    """Every industry in the indexed reports, for the search filters."""
+    return get_live_history().index.industries()
@@ -0,0 +1,253 @@
+# utils/metrics.py
+"""
+Process-wide metrics, in Prometheus text format.
+
+What each analysis costs, for capacity planning: how long jobs take by
+type, how many status polls they need, Firestore document reads and
+writes by collection and by the page that caused them, bytes uploaded,
+and how often the analysis and deal note caches answer instead of the
+backend. The shared components (job worker, admission controller, circuit
+breaker, ...) also register their `stats()`, which are reported as gauges.
+
+With METRICS_PORT set, a small HTTP server on that port serves everything
+at /metrics for Prometheus to scrape, separate from the app's own port.
+Without it (the default) the metrics are still collected, and
+`get_metrics().render()` returns the same text.
+"""
+import math
+import os
+import threading
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+from utils.app_logging import get_logger, get_log_pipeline
+
+logger = get_logger(__name__)
+
+METRICS_PORT = int(st.secrets.get("METRICS_PORT", 0))  # 0 leaves the endpoint off
+METRICS_HOST = st.secrets.get("METRICS_HOST", "0.0.0.0")
+
+JOB_DURATION_BUCKETS = (5, 15, 30, 60, 120, 240, 480, 900, 1800, 3600)
+POLL_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55)
+
+
+def _label_text(names: tuple, values: tuple) -> str:
+    if not names:
+        return ""
+    pairs = []
+    for name, value in zip(names, values):
+        escaped = str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        pairs.append(f'{name}="{escaped}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+def _number(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def _flatten(stats: dict, prefix: str = "") -> dict:
+    """{"running": {"analyze": 2}} -> {"running.analyze": 2}"""
+    flat = {}
+    for key, value in stats.items():
+        if isinstance(value, dict):
+            flat.update(_flatten(value, f"{prefix}{key}."))
+        else:
+            flat[f"{prefix}{key}"] = value
+    return flat
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, labels: tuple = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self._values = defaultdict(float)
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(labels.get(name, "") for name in self.labels)
+        with self._lock:
+            self._values[key] += amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(tuple(labels.get(name, "") for name in self.labels), 0.0)
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = sorted(self._values.items())
+        for key, value in values:
+            lines.append(f"{self.name}{_label_text(self.labels, key)} {_number(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, buckets: tuple, labels: tuple = ()):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self.labels = labels
+        self._series = {}  # label values -> [bucket counts, sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(labels.get(name, "") for name in self.labels)
+        with self._lock:
+            series = self._series.setdefault(key, [[0] * len(self.buckets), 0.0, 0])
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = sorted((key, (list(counts), total, count)) for key, (counts, total, count) in self._series.items())
+        for key, (counts, total, count) in series:
+            for bound, bucket_count in zip(self.buckets, counts):
+                labels = _label_text(self.labels + ("le",), key + (_number(bound),))
+                lines.append(f"{self.name}_bucket{labels} {bucket_count}")
+            labels = _label_text(self.labels, key)
+            lines.append(f"{self.name}_sum{labels} {_number(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """The app's counters and histograms, plus the stats of shared components."""
+
+    def __init__(self):
+        self.job_duration = Histogram(
+            "vc_analyst_job_duration_seconds", "Backend job time from submit to its final status.",
+            JOB_DURATION_BUCKETS, ("job_type", "status")
+        )
+        self.job_polls = Histogram(
+            "vc_analyst_job_polls", "Status polls each backend job needed.",
+            POLL_COUNT_BUCKETS, ("job_type", "status")
+        )
+        self.jobs_submitted = Counter("vc_analyst_jobs_submitted_total", "Backend jobs submitted.", ("job_type",))
+        self.status_polls = Counter("vc_analyst_status_polls_total", "Job status requests sent to the backend.")
+        self.firestore_reads = Counter(
+            "vc_analyst_firestore_reads_total", "Firestore documents read.", ("collection", "page")
+        )
+        self.firestore_writes = Counter(
+            "vc_analyst_firestore_writes_total", "Firestore documents written.", ("collection", "page")
+        )
+        self.upload_bytes = Counter("vc_analyst_upload_bytes_total", "Bytes put into storage.", ("source",))
+        self.cache_lookups = Counter(
+            "vc_analyst_cache_lookups_total", "Cache lookups, by cache and result.", ("cache", "result")
+        )
+        self.page_runs = Counter("vc_analyst_page_runs_total", "Script runs of each page.", ("page",))
+        self._metrics = [
+            self.job_duration, self.job_polls, self.jobs_submitted, self.status_polls, self.firestore_reads,
+            self.firestore_writes, self.upload_bytes, self.cache_lookups, self.page_runs
+        ]
+        self._stats = {}  # component name -> stats() callable
+        self._lock = threading.Lock()
+
+    def register_stats(self, component: str, stats):
+        """Reports the numbers in `stats()` as gauges, read on every scrape."""
+        with self._lock:
+            self._stats[component] = stats
+
+    def _component_lines(self) -> list[str]:
+        name = "vc_analyst_component_stat"
+        lines = [f"# HELP {name} Current stats() of the app's shared components.", f"# TYPE {name} gauge"]
+        with self._lock:
+            components = sorted(self._stats.items())
+        for component, stats in components:
+            try:
+                values = stats()
+            except Exception as e:
+                logger.error(f"Could not read stats of {component}: {e}")
+                continue
+            for stat, value in sorted(_flatten(values).items()):
+                if isinstance(value, (int, float)):
+                    lines.append(f"{name}{_label_text(('component', 'stat'), (component, stat))} {_number(value)}")
+        return lines
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        lines.extend(self._component_lines())
+        return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    registry = None
+
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+        body = self.registry.render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # Scrapes would flood the app's log
+
+
+def serve_metrics(registry: MetricsRegistry, host: str, port: int) -> ThreadingHTTPServer:
+    handler = type("Handler", (_MetricsHandler,), {"registry": registry})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    return server
+
+
+@st.cache_resource
+def get_metrics() -> MetricsRegistry:
+    """The single MetricsRegistry shared by every session in this process."""
+    registry = MetricsRegistry()
+    registry.register_stats("logging", get_log_pipeline().stats)
+    if METRICS_PORT:
+        try:
+            serve_metrics(registry, METRICS_HOST, METRICS_PORT)
+            logger.info(f"Serving metrics on {METRICS_HOST}:{METRICS_PORT}/metrics")
+        except OSError as e:
+            # e.g. another process on this machine already serves them
+            logger.error(f"Could not serve metrics on port {METRICS_PORT}: {e}")
+    return registry
+
+
+def current_page() -> str:
+    """The page script of the calling script run, or "background" for worker threads."""
+    ctx = get_script_run_ctx(suppress_warning=True)
+    if ctx is None:
+        return "background"
+    try:
+        page = ctx.pages_manager.get_pages()[ctx.page_script_hash]
+        return os.path.basename(str(page["script_path"]))
+    except (KeyError, AttributeError):
+        return "unknown"
+
+
+def count_reads(collection: str, documents: int = 1):
+    get_metrics().firestore_reads.inc(documents, collection=collection, page=current_page())
+
+
+def count_writes(collection: str, documents: int = 1):
+    get_metrics().firestore_writes.inc(documents, collection=collection, page=current_page())
+
+
+def count_cache_lookup(cache: str, hit: bool):
+    get_metrics().cache_lookups.inc(cache=cache, result="hit" if hit else "miss")
+
+
+def observe_finished_job(job: dict, status: str, finished_at: float):
+    """Records a job's duration and poll count once it has a final status."""
+    metrics = get_metrics()
+    job_type = job.get("job_type") or "unknown"
+    if job.get("submitted_at"):
+        metrics.job_duration.observe(max(0.0, finished_at - job["submitted_at"]), job_type=job_type, status=status)
+    metrics.job_polls.observe(job.get("poll_count", 0), job_type=job_type, status=status)
@@ -0,0 +1,191 @@
+# utils/preprocessing.py
+"""
+Optional client-side pre-processing for Run Analysis.
+
+Before a job is submitted, every document (browser uploads, legacy
+uploads and public URLs) is staged to a temporary directory on local disk
+and handed to a process pool, which extracts text, page/slide counts and
+an outline (see utils/doc_extract.py). Oversized or unreadable files are
+rejected before we pay for a backend job. After the company is created,
+the extracted artifacts are stored next to the documents, and their URLs
+are sent to the backend with `documents_url` so it can skip or shorten
+its own parsing. Documents whose embedded images could be shrunk are
+replaced by the slimmer copy.
+"""
+import io
+import json
+import multiprocessing
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+import requests
+import streamlit as st
+from utils.app_logging import get_logger
+from utils.doc_extract import process_document
+from utils.uploads import get_upload_backend, object_name, stream_to_storage, MAX_DOCUMENT_MB
+
+logger = get_logger(__name__)
+
+PREPROCESS_WORKERS = int(st.secrets.get("PREPROCESS_WORKERS", max(1, (os.cpu_count() or 2) - 1)))
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+
+
+@st.cache_resource
+def get_preprocess_pool() -> ProcessPoolExecutor:
+    # "spawn" so workers don't inherit the Streamlit server's threads
+    return ProcessPoolExecutor(
+        max_workers=PREPROCESS_WORKERS,
+        mp_context=multiprocessing.get_context("spawn")
+    )
+
+
+def _download_url(url: str, dest_path: str, max_bytes: int) -> str | None:
+    """Streams a URL to disk. Returns an error message, or None on success."""
+    try:
+        with requests.get(url, stream=True, timeout=30) as response:
+            response.raise_for_status()
+            written = 0
+            with open(dest_path, "wb") as f:
+                for chunk in response.iter_content(DOWNLOAD_CHUNK_SIZE):
+                    written += len(chunk)
+                    if written > max_bytes:
+                        return f"File is larger than the {max_bytes // 1024 // 1024} MB limit."
+                    f.write(chunk)
+    except requests.exceptions.RequestException as e:
+        return f"Could not download the document: {e}"
+    return None
+
+
+def _url_file_name(url: str, index: int) -> str:
+    name = url.split("?", 1)[0].rstrip("/").rsplit("/", 1)[-1]
+    return name or f"document_{index}"
+
+
+def _stage_inputs(workdir: str, direct_company_id: str | None, direct_files: list[dict],
+                  uploaded_files: list, doc_urls: list[str], max_bytes: int) -> list[dict]:
+    """Copies every input document to local disk, one file at a time."""
+    backend = get_upload_backend()
+    staged = []
+    for index, file in enumerate(direct_files):
+        item = {"file_name": file["name"], "source": "upload", "path": os.path.join(workdir, f"{index}_upload")}
+        try:
+            backend.download(object_name(direct_company_id, file["name"]), item["path"])
+        except Exception as e:
+            item["error"] = f"Could not read the uploaded file back from storage: {e}"
+        staged.append(item)
+
+    for index, file in enumerate(uploaded_files):
+        item = {"file_name": file.name, "source": "upload", "path": os.path.join(workdir, f"{index}_legacy")}
+        file.seek(0)
+        with open(item["path"], "wb") as f:
+            shutil.copyfileobj(file, f, DOWNLOAD_CHUNK_SIZE)
+        file.seek(0)  # The uploader reads it again later
+        staged.append(item)
+
+    for index, url in enumerate(doc_urls):
+        item = {"file_name": _url_file_name(url, index), "source": "url", "source_url": url,
+                "path": os.path.join(workdir, f"{index}_url")}
+        error = _download_url(url, item["path"], max_bytes)
+        if error:
+            item["error"] = error
+        staged.append(item)
+    return staged
+
+
+def preprocess_documents(direct_company_id: str | None = None, direct_files: list[dict] = (),
+                         uploaded_files: list = (), doc_urls: list[str] = ()) -> dict:
+    """
+    Runs extraction for every input document in the process pool.
+    Returns a batch to pass to `publish_artifacts` (or `discard_preprocessing`).
+    Results with an `error` should be rejected.
+    """
+    max_bytes = MAX_DOCUMENT_MB * 1024 * 1024
+    workdir = tempfile.mkdtemp(prefix="preprocess_")
+    staged = _stage_inputs(workdir, direct_company_id, list(direct_files), list(uploaded_files), list(doc_urls), max_bytes)
+
+    results = []
+    pool = get_preprocess_pool()
+    futures = {}
+    for item in staged:
+        if "error" in item:
+            results.append(item)
+        else:
+            futures[pool.submit(process_document, item["path"], item["file_name"], max_bytes)] = item
+
+    for future in as_completed(futures):
+        item = futures[future]
+        try:
+            item.update(future.result())
+        except BrokenProcessPool:
+            # A worker died (usually on a malformed file); start a fresh pool next time
+            get_preprocess_pool.clear()
+            item["error"] = f"{item['file_name']} crashed the document parser; it is probably corrupt."
+        except Exception as e:
+            item["error"] = f"Could not pre-process {item['file_name']}: {e}"
+        results.append(item)
+
+    return {"workdir": workdir, "results": results}
+
+
+def discard_preprocessing(batch: dict):
+    shutil.rmtree(batch["workdir"], ignore_errors=True)
+
+
+def _store(backend, name: str, path_or_bytes, content_type: str) -> str:
+    if isinstance(path_or_bytes, bytes):
+        stream_to_storage(backend, name, io.BytesIO(path_or_bytes), content_type, len(path_or_bytes))
+    else:
+        with open(path_or_bytes, "rb") as f:
+            stream_to_storage(backend, name, f, content_type, os.path.getsize(path_or_bytes))
+    return backend.finalize(name)["url"]
+
+
+def publish_artifacts(company_id: str, batch: dict, uploaded_urls: dict[str, str]) -> tuple[list[dict], dict[str, str]]:
+    """
+    Stores the extracted artifacts (and any slimmed documents) under the
+    company. Returns the artifact list for the job payload and a map of
+    original document URL -> slimmed document URL.
+    """
+    backend = get_upload_backend()
+    artifacts = []
+    replacements = {}
+    try:
+        for result in batch["results"]:
+            if "error" in result or "skipped" in result:
+                continue
+            source_url = result.get("source_url") or uploaded_urls.get(result["file_name"])
+            if not source_url:
+                continue
+
+            document_url = source_url
+            if result.get("compressed_path"):
+                document_url = _store(
+                    backend, object_name(company_id, result["file_name"], folder="slim"),
+                    result["compressed_path"], "application/octet-stream"
+                )
+                replacements[source_url] = document_url
+
+            extracted = {
+                key: result.get(key)
+                for key in ("file_name", "size_bytes", "page_count", "slide_count", "outline", "text")
+            }
+            artifact_url = _store(
+                backend, object_name(company_id, f"{result['file_name']}.json", folder="artifacts"),
+                json.dumps(extracted).encode("utf-8"), "application/json"
+            )
+            artifacts.append({
+                "file_name": result["file_name"],
+                "source_url": source_url,
+                "document_url": document_url,
+                "artifact_url": artifact_url,
+                "page_count": result.get("page_count"),
+                "slide_count": result.get("slide_count")
+            })
+    except Exception as e:
+        # Artifacts are an optimisation; the backend can still parse the originals
+        logger.error(f"Could not publish pre-processing artifacts for {company_id}: {e}")
+    finally:
+        discard_preprocessing(batch)
+    return artifacts, replacements
@@ -0,0 +1,257 @@
+# utils/profiling.py
+"""
+Opt-in sampling profiler for page runs.
+
+Every page calls `profile_page()`. With "Profile page runs" switched on in
+the sidebar, each run of the page is sampled: a background thread reads
+the script thread's stack every PROFILE_INTERVAL_MS and counts the stacks
+it sees, from the page script down into Firestore, pandas or Streamlit.
+Sampling adds little overhead and needs nothing installed.
+
+A run can't show its own finished profile, so the sidebar's debug panel
+shows the last completed run: its hottest functions (self and total time)
+and the collapsed stacks, which any flame graph viewer (speedscope,
+flamegraph.pl) can open. With PROFILE_DUMP_DIR set, every profile is also
+written there for offline comparison.
+"""
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter, OrderedDict
+import pandas as pd
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+from utils.app_logging import get_logger
+from utils.metrics import get_metrics
+
+logger = get_logger(__name__)
+
+PROFILE_INTERVAL_MS = float(st.secrets.get("PROFILE_INTERVAL_MS", 5))
+PROFILE_MAX_SECONDS = int(st.secrets.get("PROFILE_MAX_SECONDS", 120))  # Pages that wait on jobs run for minutes
+PROFILE_DUMP_DIR = st.secrets.get("PROFILE_DUMP_DIR", "")
+PROFILE_TOP_N = 25
+MAX_PROFILED_SESSIONS = 100
+
+APP_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _is_app_file(path: str) -> bool:
+    return path.startswith(APP_ROOT) and "site-packages" not in path
+
+
+def _function_name(code) -> str:
+    path = code.co_filename
+    if _is_app_file(path):
+        path = os.path.relpath(path, APP_ROOT)
+    elif "site-packages" in path:
+        path = path.split("site-packages" + os.sep, 1)[1]
+    return f"{code.co_name} ({path}:{code.co_firstlineno})"
+
+
+class RunProfile:
+    """The stacks sampled during one run of a page."""
+
+    def __init__(self, page: str, session_id: str):
+        self.page = page
+        self.session_id = session_id
+        self.started_at = time.time()
+        self.duration = 0.0
+        self.stacks = Counter()  # (root function, ..., leaf function) -> samples
+
+    @property
+    def samples(self) -> int:
+        return sum(self.stacks.values())
+
+    def top_functions(self, n: int = PROFILE_TOP_N) -> pd.DataFrame:
+        """The `n` functions with the most samples, by self time then total time."""
+        own = Counter()
+        total = Counter()
+        for stack, count in self.stacks.items():
+            own[stack[-1]] += count
+            for function in set(stack):
+                total[function] += count
+        samples = self.samples or 1
+        rows = [
+            {"Function": function, "Self %": 100 * own[function] / samples, "Total %": 100 * count / samples}
+            for function, count in total.items()
+        ]
+        rows.sort(key=lambda row: (row["Self %"], row["Total %"]), reverse=True)
+        return pd.DataFrame(rows[:n], columns=["Function", "Self %", "Total %"])
+
+    def collapsed(self) -> str:
+        """Collapsed ("folded") stacks, one "root;...;leaf count" line per stack."""
+        return "\n".join(f"{';'.join(stack)} {count}" for stack, count in self.stacks.most_common())
+
+    def dump(self, directory: str) -> str:
+        """Writes the collapsed stacks and the top functions; returns the base path."""
+        os.makedirs(directory, exist_ok=True)
+        stamp = time.strftime("%Y%m%d-%H%M%S", time.gmtime(self.started_at)) + f"{self.started_at % 1:.3f}"[1:]
+        page = os.path.splitext(self.page)[0]
+        base = os.path.join(directory, f"{stamp}_{page}_{self.session_id[:8]}")
+        with open(f"{base}.folded", "w") as f:
+            f.write(self.collapsed())
+        with open(f"{base}.json", "w") as f:
+            json.dump({
+                "page": self.page,
+                "started_at": self.started_at,
+                "duration": self.duration,
+                "samples": self.samples,
+                "interval_ms": PROFILE_INTERVAL_MS,
+                "top_functions": self.top_functions().to_dict(orient="records")
+            }, f, indent=2)
+        return base
+
+
+class RunSampler(threading.Thread):
+    """Samples one script thread's stack until the run ends."""
+
+    def __init__(self, thread: threading.Thread, profile: RunProfile, on_done):
+        super().__init__(name=f"profiler-{profile.session_id[:8]}", daemon=True)
+        self.target = thread
+        self.profile = profile
+        self.on_done = on_done
+        self._stopped = threading.Event()
+
+    def stop(self):
+        self._stopped.set()
+
+    def run(self):
+        interval = PROFILE_INTERVAL_MS / 1000
+        deadline = time.time() + PROFILE_MAX_SECONDS
+        last_app_sample = time.time()
+        while not self._stopped.wait(interval) and self.target.is_alive() and time.time() < deadline:
+            frame = sys._current_frames().get(self.target.ident)
+            stack = self._app_stack(frame)
+            if stack:
+                self.profile.stacks[stack] += 1
+                last_app_sample = time.time()
+        self.profile.duration = last_app_sample - self.profile.started_at
+        self.on_done(self.profile)
+
+    @staticmethod
+    def _app_stack(frame) -> tuple | None:
+        """The stack from the outermost app frame down; None while the thread is outside the app."""
+        frames = []
+        while frame is not None:
+            frames.append(frame)
+            frame = frame.f_back
+        # Frames below the page script are Streamlit's script runner
+        for depth in range(len(frames) - 1, -1, -1):
+            if _is_app_file(frames[depth].f_code.co_filename):
+                return tuple(_function_name(f.f_code) for f in reversed(frames[:depth + 1]))
+        return None
+
+
+class ProfileStore:
+    """Each session's running sampler and its last finished profile."""
+
+    def __init__(self, dump_dir: str):
+        self.dump_dir = dump_dir
+        self._samplers = {}
+        self._profiles = OrderedDict()
+        self._lock = threading.Lock()
+
+    def start(self, session_id: str, page: str):
+        """Profiles the calling script thread's run, after finishing the session's previous one."""
+        profile = RunProfile(page, session_id)
+        sampler = RunSampler(threading.current_thread(), profile, self._finish)
+        with self._lock:
+            previous = self._samplers.get(session_id)
+            self._samplers[session_id] = sampler
+        if previous is not None:
+            previous.stop()
+            previous.join(timeout=1)  # So last_profile() has it
+        sampler.start()
+
+    def stop(self, session_id: str):
+        with self._lock:
+            sampler = self._samplers.pop(session_id, None)
+            self._profiles.pop(session_id, None)
+        if sampler is not None:
+            sampler.stop()
+
+    def last_profile(self, session_id: str) -> RunProfile | None:
+        with self._lock:
+            return self._profiles.get(session_id)
+
+    def _finish(self, profile: RunProfile):
+        if not profile.samples:
+            return
+        with self._lock:
+            self._profiles[profile.session_id] = profile
+            self._profiles.move_to_end(profile.session_id)
+            while len(self._profiles) > MAX_PROFILED_SESSIONS:
+                self._profiles.popitem(last=False)
+        if self.dump_dir:
+            try:
+                base = profile.dump(self.dump_dir)
+                logger.info(f"Saved profile of {profile.page} to {base}.folded")
+            except OSError as e:
+                logger.error(f"Could not save profile of {profile.page}: {e}")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"profiling_sessions": len(self._samplers), "stored_profiles": len(self._profiles)}
+
+
+@st.cache_resource
+def get_profile_store() -> ProfileStore:
+    """The single ProfileStore shared by every session in this process."""
+    store = ProfileStore(dump_dir=PROFILE_DUMP_DIR)
+    get_metrics().register_stats("profile_store", store.stats)
+    return store
+
+
+def _debug_panel(profile: RunProfile | None):
+    with st.sidebar.expander("Profile of the last run", expanded=True):
+        if profile is None:
+            st.caption("Rerun the page (or use it) to see a profile here.")
+            return
+        st.caption(
+            f"{profile.page}: {profile.duration:.2f}s, {profile.samples} samples "
+            f"every {PROFILE_INTERVAL_MS:g} ms."
+        )
+        st.dataframe(
+            profile.top_functions(),
+            hide_index=True,
+            column_config={
+                "Self %": st.column_config.NumberColumn(format="%.1f"),
+                "Total %": st.column_config.NumberColumn(format="%.1f")
+            }
+        )
+        st.download_button(
+            "Download flame graph stacks",
+            profile.collapsed(),
+            file_name=f"{os.path.splitext(profile.page)[0]}.folded",
+            help="Collapsed stacks; open them in speedscope.app or flamegraph.pl."
+        )
+        if PROFILE_DUMP_DIR:
+            st.caption(f"Profiles are also saved to {PROFILE_DUMP_DIR}.")
+
+
+def profile_page():
+    """
+    Call near the top of every page, after the auth check. Shows the
+    profiling switch in the sidebar and, while it's on, profiles this run
+    and shows the previous run's profile.
+    """
+    ctx = get_script_run_ctx()
+    if ctx is None:
+        return
+    # A plain widget's state is dropped when another page runs, so mirror it
+    enabled = st.sidebar.toggle(
+        "Profile page runs",
+        value=st.session_state.get("profiling_enabled", False),
+        help="Samples each run of the page to show where its time goes."
+    )
+    st.session_state["profiling_enabled"] = enabled
+
+    store = get_profile_store()
+    if not enabled:
+        store.stop(ctx.session_id)
+        return
+    page = os.path.basename(sys._getframe(1).f_code.co_filename)
+    store.start(ctx.session_id, page)
+    _debug_panel(store.last_profile(ctx.session_id))
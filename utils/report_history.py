@@ -0,0 +1,98 @@
+# utils/report_history.py
+"""
+Helpers for keeping every version of an analysis report.
+
+Versions are stored as a chain: version 1 is a full snapshot, and each
+later version is a delta against the one before it. Every
+SNAPSHOT_INTERVAL versions a full snapshot is written again, so rebuilding
+any version never replays more than SNAPSHOT_INTERVAL - 1 deltas.
+
+Nothing in here talks to Firestore; see firebase_client for persistence.
+"""
+import copy
+
+SNAPSHOT_INTERVAL = 5
+
+
+def version_doc_id(version: int) -> str:
+    """Zero-padded document ID so versions sort correctly as strings."""
+    return f"v{version:06d}"
+
+
+def is_snapshot_version(version: int) -> bool:
+    return (version - 1) % SNAPSHOT_INTERVAL == 0
+
+
+def snapshot_base(version: int) -> int:
+    """Returns the snapshot version a given version is rebuilt from."""
+    return version - ((version - 1) % SNAPSHOT_INTERVAL)
+
+
+def diff_reports(old: dict, new: dict, path: tuple = ()) -> list[dict]:
+    """
+    Returns the list of operations that turns `old` into `new`.
+    Dicts are compared key by key; any other value (including lists)
+    is replaced whole when it changes.
+    """
+    ops = []
+    for key in sorted(old.keys() - new.keys()):
+        ops.append({"op": "del", "path": [*path, key]})
+
+    for key in sorted(new.keys()):
+        value = new[key]
+        if key not in old:
+            ops.append({"op": "set", "path": [*path, key], "value": value})
+        elif isinstance(value, dict) and isinstance(old[key], dict):
+            ops.extend(diff_reports(old[key], value, (*path, key)))
+        elif value != old[key]:
+            ops.append({"op": "set", "path": [*path, key], "value": value})
+    return ops
+
+
+def apply_delta(report: dict, ops: list[dict]) -> dict:
+    """Returns a new report with the delta operations applied."""
+    result = copy.deepcopy(report)
+    for op in ops:
+        *parents, leaf = op["path"]
+        target = result
+        for key in parents:
+            target = target.setdefault(key, {})
+        if op["op"] == "set":
+            target[leaf] = copy.deepcopy(op["value"])
+        elif op["op"] == "del":
+            target.pop(leaf, None)
+    return result
+
+
+def build_version_entry(version: int, previous_report: dict | None, new_report: dict, created_at: str) -> dict:
+    """Builds the Firestore document for one report version."""
+    if previous_report is None or is_snapshot_version(version):
+        return {
+            "version": version,
+            "kind": "snapshot",
+            "report": new_report,
+            "created_at": created_at
+        }
+    return {
+        "version": version,
+        "kind": "delta",
+        "ops": diff_reports(previous_report, new_report),
+        "created_at": created_at
+    }
+
+
+def rebuild_report(entries: list[dict]) -> dict | None:
+    """
+    Rebuilds a report from its version entries, oldest first.
+    The first entry must be a snapshot; returns None if the chain is broken.
+    """
+    if not entries or entries[0].get("kind") != "snapshot":
+        return None
+
+    report = copy.deepcopy(entries[0]["report"])
+    for entry in entries[1:]:
+        if entry.get("kind") == "snapshot":
+            report = copy.deepcopy(entry["report"])
+        else:
+            report = apply_delta(report, entry.get("ops", []))
+    return report
@@ -0,0 +1,174 @@
+# utils/report_store.py
+"""
+Process-wide store for analysis reports.
+
+Reports are large, and every analyst who opens the same company gets the
+same report, so sessions no longer keep their own copies. A session keeps
+only the report's content hash in `st.session_state`, and the report itself
+lives once in this store. Entries are reference-counted by the sessions
+holding them; unreferenced entries are evicted least-recently-used once the
+store goes over its memory budget.
+
+Reports in the store are shared between sessions: treat them as read-only.
+"""
+import hashlib
+import json
+import threading
+import weakref
+from collections import OrderedDict
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+from utils.app_logging import get_logger
+from utils.metrics import get_metrics
+
+logger = get_logger(__name__)
+
+REPORT_STORE_MAX_MB = int(st.secrets.get("REPORT_STORE_MAX_MB", 512))
+
+# Session "slots" that can hold a report
+API_RESPONSE = "api_response"
+PRE_QA_BACKUP = "l1_api_response_backup"
+
+
+def _serialize(report: dict) -> bytes:
+    return json.dumps(report, sort_keys=True, separators=(",", ":"), default=str).encode("utf-8")
+
+
+def report_key(report: dict) -> str:
+    """Content hash of a report; identical reports share one key."""
+    return hashlib.sha256(_serialize(report)).hexdigest()
+
+
+class ReportStore:
+    """Reference-counted, content-addressed LRU store of reports."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self._entries = OrderedDict()  # key -> {"report", "size", "refs"}
+        self._holders = {}             # session_id -> {slot: key}
+        self._lock = threading.Lock()
+
+    def assign(self, session_id: str, slot: str, report: dict) -> str:
+        """Points a session's slot at `report`, storing it if it's new."""
+        payload = _serialize(report)
+        key = hashlib.sha256(payload).hexdigest()
+        with self._lock:
+            slots = self._holders.setdefault(session_id, {})
+            if slots.get(slot) == key:
+                self._entries.move_to_end(key)
+                return key
+
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = {"report": report, "size": len(payload), "refs": 0}
+                self._entries[key] = entry
+                self.total_bytes += entry["size"]
+            entry["refs"] += 1
+            self._entries.move_to_end(key)
+
+            old_key = slots.get(slot)
+            slots[slot] = key
+            if old_key:
+                self._release(old_key)
+            self._evict()
+        return key
+
+    def unassign(self, session_id: str, slot: str):
+        with self._lock:
+            key = self._holders.get(session_id, {}).pop(slot, None)
+            if key:
+                self._release(key)
+                self._evict()
+
+    def release_session(self, session_id: str):
+        """Drops every reference held by a session (e.g. when it ends)."""
+        with self._lock:
+            for key in self._holders.pop(session_id, {}).values():
+                self._release(key)
+            self._evict()
+
+    def get(self, key: str) -> dict | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return entry["report"]
+
+    def size_of(self, key: str) -> int:
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry["size"] if entry else 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "sessions": len(self._holders),
+                "total_bytes": self.total_bytes,
+                "max_bytes": self.max_bytes
+            }
+
+    def _release(self, key: str):
+        entry = self._entries.get(key)
+        if entry:
+            entry["refs"] = max(entry["refs"] - 1, 0)
+
+    def _evict(self):
+        # Only unreferenced reports can go; a live session must never lose its report.
+        if self.total_bytes <= self.max_bytes:
+            return
+        for key in [k for k, e in self._entries.items() if e["refs"] == 0]:
+            self.total_bytes -= self._entries.pop(key)["size"]
+            if self.total_bytes <= self.max_bytes:
+                return
+        logger.warning(
+            f"Report store is over budget ({self.total_bytes} / {self.max_bytes} bytes) "
+            "with every remaining report in use."
+        )
+
+
+@st.cache_resource
+def get_report_store() -> ReportStore:
+    """The single ReportStore shared by every session in this process."""
+    store = ReportStore(max_bytes=REPORT_STORE_MAX_MB * 1024 * 1024)
+    get_metrics().register_stats("report_store", store.stats)
+    return store
+
+
+def _session_id() -> str:
+    ctx = get_script_run_ctx()
+    if ctx is None:
+        raise RuntimeError("Session reports can only be used from a Streamlit script run.")
+
+    # Release the session's reports once Streamlit drops its session state
+    if "_report_store_finalizer" not in st.session_state:
+        from utils.session_memory import session_anchor  # session_memory imports this module
+        st.session_state["_report_store_finalizer"] = weakref.finalize(
+            session_anchor(), get_report_store().release_session, ctx.session_id
+        )
+    return ctx.session_id
+
+
+# --- Session helpers used by the pages ---
+def set_session_report(report: dict, slot: str = API_RESPONSE):
+    """Stores `report` and keeps only its key in this session's state."""
+    key = get_report_store().assign(_session_id(), slot, report)
+    st.session_state[f"{slot}_key"] = key
+
+
+def get_session_report(slot: str = API_RESPONSE) -> dict | None:
+    """Returns this session's report for `slot`, or None if it has none."""
+    key = st.session_state.get(f"{slot}_key")
+    if not key:
+        return None
+    report = get_report_store().get(key)
+    if report is None:
+        logger.warning(f"Report {key[:12]} for slot '{slot}' is no longer in the store.")
+    return report
+
+
+def clear_session_report(slot: str = API_RESPONSE):
+    get_report_store().unassign(_session_id(), slot)
+    st.session_state.pop(f"{slot}_key", None)
@@ -0,0 +1,482 @@
+# utils/repository.py
+"""
+Storage for companies, their documents and reports, and the fund config
+(plus the analysis cache and deal notes, which point at reports).
+
+The app reads and writes these through `get_repository()`, which returns
+one of three interchangeable implementations, picked by REPOSITORY_BACKEND:
+
+- "firestore" (default): Firestore and Cloud Storage, via firebase_client;
+- "memory": plain dicts in this process;
+- "sqlite": a local SQLite file (REPOSITORY_SQLITE_PATH), which survives
+  restarts and can be shared by processes on one machine: updates that
+  read before they write each run in one database transaction.
+
+The offline implementations don't need credentials or network access, so
+the rest of the app can be load-tested and profiled on a laptop. Set
+REPOSITORY_READ_LATENCY_MS / REPOSITORY_WRITE_LATENCY_MS to add a delay to
+every call (with REPOSITORY_LATENCY_JITTER as a fraction of it), to mimic
+the round trips the real backend would cost.
+
+Reports are kept with the same snapshot/delta history as in Firestore (see
+utils/report_history.py), so saving and rebuilding versions costs the same
+CPU on every implementation.
+"""
+import abc
+import copy
+from contextlib import contextmanager
+import json
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+import streamlit as st
+from utils.app_logging import get_logger
+from utils.report_history import version_doc_id, snapshot_base, build_version_entry, rebuild_report
+from utils.rollups import (
+    ROLLUPS_COLLECTION, CONTRIBUTION_FIELD, report_contribution, rollup_deltas, shard_doc_id, pick_shard,
+    all_shard_doc_ids, apply_deltas, combine_shards
+)
+from utils.metrics import get_metrics
+
+logger = get_logger(__name__)
+
+REPOSITORY_BACKEND = st.secrets.get("REPOSITORY_BACKEND", "firestore")  # "firestore", "memory" or "sqlite"
+REPOSITORY_SQLITE_PATH = st.secrets.get(
+    "REPOSITORY_SQLITE_PATH", os.path.join(tempfile.gettempdir(), "vc_analyst_repository.sqlite3")
+)
+READ_LATENCY_MS = float(st.secrets.get("REPOSITORY_READ_LATENCY_MS", 0))
+WRITE_LATENCY_MS = float(st.secrets.get("REPOSITORY_WRITE_LATENCY_MS", 0))
+LATENCY_JITTER = float(st.secrets.get("REPOSITORY_LATENCY_JITTER", 0.2))
+ANALYSIS_CACHE_TTL_DAYS = int(st.secrets.get("ANALYSIS_CACHE_TTL_DAYS", 30))
+
+READ_METHODS = (
+    "get_current_report", "get_report_version", "get_previous_report", "list_analyses",
+    "get_cached_analysis", "get_deal_note", "get_latest_deal_note", "load_fund_config", "get_portfolio_rollups"
+)
+WRITE_METHODS = (
+    "create_company", "mark_company_cancelled", "record_document", "upload_document",
+    "save_report", "store_cached_analysis", "store_deal_note", "update_fund_config"
+)
+
+
+class FirestoreRepository:
+    """Firestore and Cloud Storage. Connects on first use."""
+
+    def __init__(self):
+        # Imported here so the offline implementations don't need firebase-admin
+        from utils import firebase_client
+        self._fb = firebase_client
+
+    def reserve_company_id(self) -> str:
+        return self._fb.reserve_company_id()
+
+    def create_company(self, company_name: str, company_id: str | None = None) -> str:
+        return self._fb.create_company_record(company_name, company_id)
+
+    def mark_company_cancelled(self, company_id: str):
+        self._fb.mark_company_cancelled(company_id)
+
+    def record_document(self, company_id: str, file_name: str, file_type: str, file_url: str):
+        self._fb.record_document(company_id, file_name, file_type, file_url)
+
+    def upload_document(self, company_id: str, file) -> str:
+        return self._fb.upload_document(company_id, file)
+
+    def save_report(self, company_id: str, report: dict) -> int | None:
+        return self._fb.save_analysis_to_firestore(company_id, report)
+
+    def get_current_report(self, company_id: str) -> dict | None:
+        return self._fb.get_current_report(company_id)
+
+    def get_report_version(self, company_id: str, version: int) -> dict | None:
+        return self._fb.get_report_version(company_id, version)
+
+    def get_previous_report(self, company_id: str) -> dict | None:
+        return self._fb.get_previous_report(company_id)
+
+    def list_analyses(self) -> list[dict]:
+        return self._fb.get_all_analyses()
+
+    def get_portfolio_rollups(self) -> dict:
+        return self._fb.get_portfolio_rollups()
+
+    def get_cached_analysis(self, cache_key: str) -> dict | None:
+        return self._fb.get_cached_analysis(cache_key)
+
+    def store_cached_analysis(self, cache_key: str, company_id: str, report_version: int):
+        self._fb.store_cached_analysis(cache_key, company_id, report_version)
+
+    def get_deal_note(self, company_id: str, content_hash: str) -> dict | None:
+        return self._fb.get_deal_note(company_id, content_hash)
+
+    def get_latest_deal_note(self, company_id: str) -> dict | None:
+        return self._fb.get_latest_deal_note(company_id)
+
+    def store_deal_note(self, company_id: str, content_hash: str, slide_url: str):
+        self._fb.store_deal_note(company_id, content_hash, slide_url)
+
+    def watch_analyses(self, statuses: list[str], on_changes, on_error=None):
+        return self._fb.watch_analyses(statuses, on_changes, on_error)
+
+    def load_fund_config(self) -> dict:
+        return self._fb.load_fund_config()
+
+    def update_fund_config(self, field: str, data):
+        self._fb.update_fund_config(field, data)
+
+
+class _Watch:
+    def __init__(self, repository, statuses: list[str], on_changes):
+        self.repository = repository
+        self.statuses = statuses
+        self.on_changes = on_changes
+        self.is_active = True
+
+    def unsubscribe(self):
+        self.is_active = False
+        self.repository._unwatch(self)
+
+
+class _LocalRepository(abc.ABC):
+    """
+    What the offline implementations share. Everything is a JSON-like
+    record under (collection, key), laid out like the Firestore documents;
+    subclasses only store and fetch records and files. `watch_analyses`
+    only sees writes made through this process.
+    """
+
+    def __init__(self):
+        self._watches = []
+        self._lock = threading.RLock()
+
+    # --- Storage primitives, per implementation ---
+    @abc.abstractmethod
+    def _get(self, collection: str, key: str) -> dict | None:
+        ...
+
+    @abc.abstractmethod
+    def _put(self, collection: str, key: str, data: dict):
+        ...
+
+    @abc.abstractmethod
+    def _list(self, collection: str) -> list[tuple[str, dict]]:
+        ...
+
+    @abc.abstractmethod
+    def _put_file(self, name: str, data: bytes, content_type: str) -> str:
+        """Stores a file's bytes and returns its URL."""
+
+    def _transaction(self):
+        """Wraps an update that reads before it writes. In-process only, unless overridden."""
+        return self._lock
+
+    # --- Companies ---
+    def reserve_company_id(self) -> str:
+        return uuid.uuid4().hex[:20]
+
+    def create_company(self, company_name: str, company_id: str | None = None) -> str:
+        if not company_name:
+            raise ValueError("Company name cannot be empty.")
+        company_id = company_id or self.reserve_company_id()
+        created_at = datetime.now().isoformat()
+        self._write_company(company_id, {
+            "company_analysed": company_name,
+            "analysis_status": "Pending",
+            "created_at": created_at,
+            "updated_at": created_at
+        })
+        return company_id
+
+    def mark_company_cancelled(self, company_id: str):
+        with self._transaction():
+            company = self._get("companies", company_id)
+            if company and company.get("analysis_status") == "Pending":
+                self._write_company(company_id, {
+                    **company, "analysis_status": "Cancelled", "updated_at": datetime.now().isoformat()
+                })
+
+    # --- Documents ---
+    def record_document(self, company_id: str, file_name: str, file_type: str, file_url: str):
+        self._put("documents", f"{company_id}/{uuid.uuid4().hex}", {
+            "file_name": file_name,
+            "file_type": file_type,
+            "storage_url": file_url,
+            "uploaded_at": datetime.now().isoformat()
+        })
+
+    def upload_document(self, company_id: str, file) -> str:
+        file.seek(0)
+        data = file.read()
+        file_url = self._put_file(f"companies/{company_id}/{file.name}", data, file.type)
+        get_metrics().upload_bytes.inc(len(data), source="server")
+        self.record_document(company_id, file.name, file.type, file_url)
+        return file_url
+
+    # --- Reports ---
+    def save_report(self, company_id: str, report: dict) -> int | None:
+        """Same versioning and rollups as firebase_client._save_report_version."""
+        with self._transaction():
+            current = self._get("companies", company_id) or {}
+            previous_report = current.get("analysis_report")
+            version = current.get("report_version", 0)
+            saved_at = datetime.now().isoformat()
+            if previous_report is not None and version == 0:
+                version = 1
+                self._put("report_versions", f"{company_id}/{version_doc_id(version)}", build_version_entry(
+                    version, None, previous_report, current.get("updated_at", saved_at)
+                ))
+            version += 1
+            self._put("report_versions", f"{company_id}/{version_doc_id(version)}",
+                      build_version_entry(version, previous_report, report, saved_at))
+            contribution = report_contribution(report)
+            deltas = rollup_deltas(current.get(CONTRIBUTION_FIELD), contribution, previous_report is None, saved_at)
+            shard = pick_shard()
+            for name, doc_deltas in deltas.items():
+                doc_id = shard_doc_id(name, shard)
+                doc = self._get(ROLLUPS_COLLECTION, doc_id) or {}
+                self._put(ROLLUPS_COLLECTION, doc_id, apply_deltas(doc, doc_deltas))
+            self._write_company(company_id, {
+                **current,
+                "analysis_report": report,
+                "analysis_status": "Complete",
+                "report_version": version,
+                "updated_at": saved_at,
+                CONTRIBUTION_FIELD: contribution
+            })
+        return version
+
+    def get_current_report(self, company_id: str) -> dict | None:
+        company = self._get("companies", company_id)
+        return company.get("analysis_report") if company else None
+
+    def get_report_version(self, company_id: str, version: int) -> dict | None:
+        chain = [
+            self._get("report_versions", f"{company_id}/{version_doc_id(v)}")
+            for v in range(snapshot_base(version), version + 1)
+        ]
+        if None in chain:
+            return None
+        return rebuild_report(chain)
+
+    def get_previous_report(self, company_id: str) -> dict | None:
+        current_version = (self._get("companies", company_id) or {}).get("report_version", 0)
+        if current_version < 2:
+            return None
+        return self.get_report_version(company_id, current_version - 1)
+
+    def get_portfolio_rollups(self) -> dict:
+        docs = {doc_id: self._get(ROLLUPS_COLLECTION, doc_id) for doc_id in all_shard_doc_ids()}
+        return combine_shards({doc_id: doc for doc_id, doc in docs.items() if doc is not None})
+
+    def list_analyses(self) -> list[dict]:
+        analyses = [
+            {**data, "company_id": company_id}
+            for company_id, data in self._list("companies")
+            if data.get("analysis_status") == "Complete"
+        ]
+        return sorted(analyses, key=lambda a: a.get("updated_at") or "", reverse=True)
+
+    # --- Analysis result cache ---
+    def get_cached_analysis(self, cache_key: str) -> dict | None:
+        entry = self._get("analysis_cache", cache_key)
+        if not entry or entry["expires_at"] <= time.time():
+            return None
+        report = self.get_report_version(entry["company_id"], entry["report_version"])
+        if report is None:
+            return None
+        return {"report": report, "company_id": entry["company_id"], "created_at": entry["created_at"]}
+
+    def store_cached_analysis(self, cache_key: str, company_id: str, report_version: int):
+        self._put("analysis_cache", cache_key, {
+            "company_id": company_id,
+            "report_version": report_version,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "expires_at": time.time() + ANALYSIS_CACHE_TTL_DAYS * 86400
+        })
+
+    # --- Deal notes ---
+    def get_deal_note(self, company_id: str, content_hash: str) -> dict | None:
+        return self._get("deal_notes", f"{company_id}/{content_hash}")
+
+    def get_latest_deal_note(self, company_id: str) -> dict | None:
+        return (self._get("companies", company_id) or {}).get("deal_note")
+
+    def store_deal_note(self, company_id: str, content_hash: str, slide_url: str):
+        entry = {"slide_url": slide_url, "created_at": datetime.now(timezone.utc).isoformat()}
+        with self._transaction():
+            self._put("deal_notes", f"{company_id}/{content_hash}", entry)
+            company = self._get("companies", company_id) or {}
+            self._write_company(company_id, {**company, "deal_note": {**entry, "content_hash": content_hash}})
+
+    # --- Fund config ---
+    def load_fund_config(self) -> dict:
+        return self._get("settings", "fund_config") or {}
+
+    def update_fund_config(self, field: str, data):
+        with self._transaction():
+            self._put("settings", "fund_config", {**self.load_fund_config(), field: data})
+
+    # --- Change notifications ---
+    def watch_analyses(self, statuses: list[str], on_changes, on_error=None):
+        """
+        Like firebase_client.watch_analyses, for writes made through this
+        repository. Changes are delivered on the writer's thread, so errors
+        reach the writer instead of `on_error`.
+        """
+        watch = _Watch(self, statuses, on_changes)
+        with self._lock:
+            self._watches.append(watch)
+            initial = [
+                ("ADDED", company_id, data) for company_id, data in self._list("companies")
+                if data.get("analysis_status") in statuses
+            ]
+        on_changes(initial)
+        return watch
+
+    def _unwatch(self, watch: _Watch):
+        with self._lock:
+            if watch in self._watches:
+                self._watches.remove(watch)
+
+    def _write_company(self, company_id: str, data: dict):
+        with self._lock:
+            before = self._get("companies", company_id)
+            self._put("companies", company_id, data)
+            watches = list(self._watches)
+        for watch in watches:
+            was_in = before is not None and before.get("analysis_status") in watch.statuses
+            is_in = data.get("analysis_status") in watch.statuses
+            if is_in:
+                watch.on_changes([("MODIFIED" if was_in else "ADDED", company_id, data)])
+            elif was_in:
+                watch.on_changes([("REMOVED", company_id, data)])
+
+
+class InMemoryRepository(_LocalRepository):
+    """Everything in dicts, for benchmarks and single-process tests. Nothing is persisted."""
+
+    def __init__(self):
+        super().__init__()
+        self._records = {}  # collection -> {key: record}
+        self._files = {}  # object name -> (bytes, content type)
+
+    def _get(self, collection: str, key: str) -> dict | None:
+        with self._lock:
+            record = self._records.get(collection, {}).get(key)
+            # Copies, so callers can't change what's stored (as with a real database)
+            return copy.deepcopy(record)
+
+    def _put(self, collection: str, key: str, data: dict):
+        with self._lock:
+            self._records.setdefault(collection, {})[key] = copy.deepcopy(data)
+
+    def _list(self, collection: str) -> list[tuple[str, dict]]:
+        with self._lock:
+            return [(key, copy.deepcopy(record)) for key, record in self._records.get(collection, {}).items()]
+
+    def _put_file(self, name: str, data: bytes, content_type: str) -> str:
+        with self._lock:
+            self._files[name] = (data, content_type)
+        return f"memory://{name}"
+
+
+class SqliteRepository(_LocalRepository):
+    """A local SQLite file, with each record stored as JSON."""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS records (
+            collection TEXT NOT NULL, key TEXT NOT NULL, data TEXT NOT NULL,
+            PRIMARY KEY (collection, key)
+        );
+        CREATE TABLE IF NOT EXISTS files (name TEXT PRIMARY KEY, content_type TEXT, data BLOB NOT NULL);
+    """
+
+    def __init__(self, path: str):
+        super().__init__()
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        # One connection shared by every thread; the lock serializes its use
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(self.SCHEMA)
+
+    def _query(self, sql: str, params: tuple = ()) -> list[tuple]:
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def _get(self, collection: str, key: str) -> dict | None:
+        rows = self._query("SELECT data FROM records WHERE collection = ? AND key = ?", (collection, key))
+        return json.loads(rows[0][0]) if rows else None
+
+    def _put(self, collection: str, key: str, data: dict):
+        self._query("INSERT OR REPLACE INTO records VALUES (?, ?, ?)", (collection, key, json.dumps(data)))
+
+    def _list(self, collection: str) -> list[tuple[str, dict]]:
+        rows = self._query("SELECT key, data FROM records WHERE collection = ?", (collection,))
+        return [(key, json.loads(data)) for key, data in rows]
+
+    @contextmanager
+    def _transaction(self):
+        # IMMEDIATE takes the file's write lock before the first read, so
+        # another process can't write in between
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def _put_file(self, name: str, data: bytes, content_type: str) -> str:
+        self._query("INSERT OR REPLACE INTO files VALUES (?, ?, ?)", (name, content_type, data))
+        return f"sqlite://{os.path.abspath(self.path)}/{name}"
+
+
+class LatencyInjectingRepository:
+    """Wraps a repository and sleeps before each read or write, to mimic a remote store."""
+
+    def __init__(self, repository, read_ms: float, write_ms: float, jitter: float = LATENCY_JITTER):
+        self.repository = repository
+        self.read_ms = read_ms
+        self.write_ms = write_ms
+        self.jitter = jitter
+
+    def __getattr__(self, name: str):
+        attr = getattr(self.repository, name)
+        delay_ms = self.read_ms if name in READ_METHODS else self.write_ms if name in WRITE_METHODS else 0
+        if not delay_ms or not callable(attr):
+            return attr
+
+        def delayed(*args, **kwargs):
+            time.sleep(delay_ms * random.uniform(1 - self.jitter, 1 + self.jitter) / 1000)
+            return attr(*args, **kwargs)
+        return delayed
+
+
+def make_repository(backend: str, sqlite_path: str = REPOSITORY_SQLITE_PATH,
+                    read_latency_ms: float = 0, write_latency_ms: float = 0):
+    if backend == "memory":
+        repository = InMemoryRepository()
+    elif backend == "sqlite":
+        repository = SqliteRepository(sqlite_path)
+    elif backend == "firestore":
+        repository = FirestoreRepository()
+    else:
+        raise ValueError(f"Unknown repository backend: {backend}")
+    if read_latency_ms or write_latency_ms:
+        repository = LatencyInjectingRepository(repository, read_latency_ms, write_latency_ms)
+    return repository
+
+
+@st.cache_resource
+def get_repository():
+    """The single repository shared by every session in this process."""
+    if REPOSITORY_BACKEND != "firestore":
+        logger.info(f"Using the {REPOSITORY_BACKEND} repository")
+    return make_repository(REPOSITORY_BACKEND, REPOSITORY_SQLITE_PATH, READ_LATENCY_MS, WRITE_LATENCY_MS)
@@ -0,0 +1,170 @@
+# utils/rollups.py
+"""
+Portfolio rollups: aggregates over every saved report, kept up to date on
+each save instead of recomputed by scanning the companies.
+
+Three kinds of document in the `portfolio_rollups` collection:
+
+    industries  per claimed industry: analyses, running stats of the mean
+                factor score, and of each factor's score
+    factors     per scoring factor: running stats of its score
+    months      per month (YYYY-MM): reports saved, and companies whose
+                first report was saved
+
+Running stats are a count, a sum and a sum of squares, so a save only
+ever adds numbers to them: Firestore applies those as increments, without
+reading the documents first. Each save picks one of ROLLUP_SHARDS copies
+of each document at random, so saves don't all queue on the same three
+documents; readers add the shards up (`combine_shards`).
+
+Each company document keeps the `rollup_contribution` of its current
+report. When the company is re-analysed, that contribution is taken out
+before the new one is added, so every company counts once, at its
+current report. Reports saved before rollups existed have no recorded
+contribution, so nothing is taken out for them. Month counts are events
+and are never taken back out.
+
+Nothing in here talks to Firestore; see firebase_client for persistence.
+"""
+import math
+import random
+
+ROLLUPS_COLLECTION = "portfolio_rollups"
+ROLLUP_DOCS = ("industries", "factors", "months")
+ROLLUP_SHARDS = 5  # Copies of each document; Firestore sustains about one write a second per document
+CONTRIBUTION_FIELD = "rollup_contribution"
+FACTOR_SUFFIX = "_assessment"
+
+
+def shard_doc_id(name: str, shard: int) -> str:
+    return f"{name}-{shard}"
+
+
+def all_shard_doc_ids() -> list[str]:
+    return [shard_doc_id(name, shard) for name in ROLLUP_DOCS for shard in range(ROLLUP_SHARDS)]
+
+
+def pick_shard() -> int:
+    return random.randrange(ROLLUP_SHARDS)
+
+
+def report_contribution(report: dict | None) -> dict:
+    """What one report adds to the rollups: {"industry", "mean_score", "factors": {factor: score}}."""
+    report = report or {}
+    industry = (report.get("l1_analysis_report") or {}).get("industry_analysis") or {}
+    factors = {
+        key.removesuffix(FACTOR_SUFFIX): float(assessment["score"])
+        for key, assessment in (report.get("scoring_report") or {}).items()
+        if isinstance(assessment, dict) and isinstance(assessment.get("score"), (int, float))
+        and not isinstance(assessment.get("score"), bool)
+    }
+    return {
+        "industry": industry.get("claimed_industry") or "Unknown",
+        "mean_score": sum(factors.values()) / len(factors) if factors else None,
+        "factors": factors
+    }
+
+
+def _add_stats(stats: dict, value: float | None, sign: int):
+    if value is None:
+        return
+    stats["count"] = stats.get("count", 0) + sign
+    stats["sum"] = stats.get("sum", 0.0) + sign * value
+    stats["sum_squares"] = stats.get("sum_squares", 0.0) + sign * value * value
+
+
+def _add_contribution(deltas: dict, contribution: dict, sign: int):
+    industry = deltas["industries"].setdefault("by_industry", {}).setdefault(contribution["industry"], {})
+    industry["analyses"] = industry.get("analyses", 0) + sign
+    _add_stats(industry.setdefault("mean_score", {}), contribution["mean_score"], sign)
+    factors = deltas["factors"].setdefault("by_factor", {})
+    for factor, score in contribution["factors"].items():
+        _add_stats(industry.setdefault("factors", {}).setdefault(factor, {}), score, sign)
+        _add_stats(factors.setdefault(factor, {}), score, sign)
+
+
+def rollup_deltas(previous_contribution: dict | None, contribution: dict, first_report: bool,
+                  saved_at: str) -> dict[str, dict]:
+    """
+    What saving a report adds to each rollup document (keyed by ROLLUP_DOCS),
+    as nested dicts of numbers to add. `previous_contribution` is what the
+    company's current report added, or None if it never was counted.
+    """
+    deltas = {name: {} for name in ROLLUP_DOCS}
+    if previous_contribution is not None:
+        _add_contribution(deltas, previous_contribution, -1)
+    _add_contribution(deltas, contribution, 1)
+    deltas["months"]["by_month"] = {
+        saved_at[:7]: {"reports_saved": 1, "companies_completed": 1 if first_report else 0}
+    }
+    return {name: _without_empty_maps(doc) for name, doc in deltas.items()}
+
+
+def _without_empty_maps(deltas: dict) -> dict:
+    # A merge write of an empty map would replace the stats already stored there
+    pruned = {}
+    for key, value in deltas.items():
+        if isinstance(value, dict):
+            value = _without_empty_maps(value)
+            if not value:
+                continue
+        pruned[key] = value
+    return pruned
+
+
+def apply_deltas(doc: dict, deltas: dict) -> dict:
+    """`doc` with the numbers in `deltas` added, as Firestore's increments would. Doesn't change `doc`."""
+    merged = dict(doc)
+    for key, value in deltas.items():
+        if isinstance(value, dict):
+            merged[key] = apply_deltas(merged.get(key) or {}, value)
+        else:
+            merged[key] = merged.get(key, 0) + value
+    return merged
+
+
+def combine_shards(docs: dict[str, dict]) -> dict[str, dict]:
+    """Shard documents (keyed by shard doc ID) added up into one document per ROLLUP_DOCS name."""
+    rollups = {name: {} for name in ROLLUP_DOCS}
+    for doc_id, doc in docs.items():
+        name = doc_id.rsplit("-", 1)[0]
+        if name in rollups:
+            rollups[name] = apply_deltas(rollups[name], doc)
+    return rollups
+
+
+def summarize(stats: dict) -> dict:
+    """{"count", "mean", "stddev"} from running stats."""
+    count = stats.get("count", 0)
+    if count <= 0:
+        return {"count": 0, "mean": None, "stddev": None}
+    mean = stats["sum"] / count
+    variance = max(0.0, stats["sum_squares"] / count - mean * mean)  # Clamped against rounding
+    return {"count": count, "mean": round(mean, 3), "stddev": round(math.sqrt(variance), 3)}
+
+
+def portfolio_summary(rollups: dict[str, dict | None]) -> dict:
+    """
+    Combined rollup documents (see `combine_shards`) with running stats
+    turned into counts, means and standard deviations. Entries everything
+    was taken back out of are left out.
+    """
+    industries = (rollups.get("industries") or {}).get("by_industry", {})
+    factors = (rollups.get("factors") or {}).get("by_factor", {})
+    return {
+        "industries": {
+            name: {
+                "analyses": industry["analyses"],
+                "mean_score": summarize(industry.get("mean_score", {})),
+                "factors": {
+                    factor: summarize(stats) for factor, stats in industry.get("factors", {}).items()
+                    if stats.get("count", 0) > 0
+                }
+            }
+            for name, industry in sorted(industries.items()) if industry.get("analyses", 0) > 0
+        },
+        "factors": {
+            factor: summarize(stats) for factor, stats in sorted(factors.items()) if stats.get("count", 0) > 0
+        },
+        "months": dict(sorted((rollups.get("months") or {}).get("by_month", {}).items()))
+    }
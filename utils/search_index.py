@@ -0,0 +1,244 @@
+# utils/search_index.py
+"""
+Full-text search over stored analyses, for the Analysis History page.
+
+An in-memory inverted index over the parts of each report analysts look
+deals up by: the company name, founders, competitors and substitutes,
+industries, risks and discrepancy findings, and the section summaries.
+Results are ranked with BM25, with matches in the company name, founders,
+competitors and industries counting for more than matches in long text,
+and can be filtered by industry, date and mean factor score.
+
+The index is updated one company at a time, as the live history listener
+(utils/live_history.py) delivers changed documents, so it never needs a
+rebuild or a collection scan. The last query word also matches as a
+prefix, so results come up while the analyst is still typing.
+"""
+import bisect
+import math
+import re
+import threading
+from collections import defaultdict
+
+# Weight of a match in each field, relative to one in running text
+FIELD_WEIGHTS = {
+    "company": 5.0,
+    "founders": 3.0,
+    "competitors": 3.0,
+    "industries": 3.0,
+    "risks": 1.5,
+    "summaries": 1.0
+}
+BM25_K1 = 1.2
+BM25_B = 0.75
+MIN_PREFIX_LENGTH = 2
+MAX_PREFIX_TERMS = 50  # Expansions of a partly typed word, most common first
+
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the this to was were will with".split()
+)
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> list[str]:
+    return [t for t in _TOKEN.findall(text.lower()) if t not in STOPWORDS]
+
+
+def _texts(items, *keys) -> list[str]:
+    """Strings from a list of strings, or from `keys` of a list of dicts."""
+    texts = []
+    for item in items or []:
+        if isinstance(item, str):
+            texts.append(item)
+        elif isinstance(item, dict):
+            texts.extend(str(item[k]) for k in keys if item.get(k))
+    return texts
+
+
+def report_fields(data: dict) -> dict[str, list[str]]:
+    """The searchable text of a company document, by field."""
+    report = data.get("analysis_report") or {}
+    l1 = report.get("l1_analysis_report") or {}
+    founders = l1.get("founder_analysis") or {}
+    industry = l1.get("industry_analysis") or {}
+    product = l1.get("product_analysis") or {}
+    competition = l1.get("competition_analysis") or {}
+    externalities = l1.get("externalities_analysis") or {}
+    discrepancies = report.get("discrepancy_report") or {}
+
+    risks = _texts(externalities.get("identified_risks"), "category", "risk_description")
+    for assessment in (report.get("scoring_report") or {}).values():
+        if isinstance(assessment, dict):
+            risks += _texts(assessment.get("identified_risks"), "factor")
+    risks += _texts(discrepancies.get("assessed_findings"), "claim", "finding_summary")
+    risks += _texts(founders.get("identified_gaps"))
+
+    return {
+        "company": [data.get("company_analysed") or l1.get("company_analysed") or ""],
+        "founders": _texts(founders.get("founder_profiles"), "name")
+        + [skill for profile in founders.get("founder_profiles") or []
+           for skill in _texts(profile.get("top_5_skillsets")) + _texts(profile.get("special_skills"))],
+        "competitors": _texts(competition.get("direct_competitors"), "name")
+        + _texts(product.get("direct_substitutes"), "name"),
+        "industries": [industry.get("claimed_industry") or "", industry.get("activity_based_industry") or ""],
+        "risks": risks,
+        "summaries": [
+            section["summary"] for section in l1.values()
+            if isinstance(section, dict) and isinstance(section.get("summary"), str)
+        ]
+    }
+
+
+def _mean_score(data: dict) -> float | None:
+    scoring = (data.get("analysis_report") or {}).get("scoring_report") or {}
+    scores = [
+        a["score"] for a in scoring.values()
+        if isinstance(a, dict) and isinstance(a.get("score"), (int, float))
+    ]
+    return sum(scores) / len(scores) if scores else None
+
+
+class SearchIndex:
+    """BM25 over weighted report fields, updated one company at a time."""
+
+    def __init__(self):
+        self._postings = defaultdict(dict)  # term -> {company_id: weighted term frequency}
+        self._doc_terms = {}  # company_id -> {term: {field, ...}}
+        self._doc_lengths = {}  # company_id -> weighted length
+        self._meta = {}  # company_id -> {"industries", "updated_at", "mean_score"}
+        self._total_length = 0.0
+        self._vocabulary = []  # Sorted terms, rebuilt when stale, for prefix matches
+        self._vocabulary_stale = False
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._doc_lengths)
+
+    def upsert(self, company_id: str, data: dict):
+        """(Re)indexes one company document; documents without a report are dropped."""
+        if not data.get("analysis_report"):
+            self.remove(company_id)
+            return
+        frequencies = defaultdict(float)
+        fields = defaultdict(set)
+        for field, texts in report_fields(data).items():
+            weight = FIELD_WEIGHTS[field]
+            for text in texts:
+                for term in tokenize(text):
+                    frequencies[term] += weight
+                    fields[term].add(field)
+        industry = (data.get("analysis_report") or {}).get("l1_analysis_report", {}).get("industry_analysis") or {}
+        meta = {
+            "industries": {i for i in (industry.get("claimed_industry"), industry.get("activity_based_industry")) if i},
+            "updated_at": data.get("updated_at") or "",
+            "mean_score": _mean_score(data)
+        }
+        with self._lock:
+            self._remove(company_id)
+            for term, frequency in frequencies.items():
+                if term not in self._postings:
+                    self._vocabulary_stale = True
+                self._postings[term][company_id] = frequency
+            self._doc_terms[company_id] = dict(fields)
+            length = sum(frequencies.values())
+            self._doc_lengths[company_id] = length
+            self._total_length += length
+            self._meta[company_id] = meta
+
+    def remove(self, company_id: str):
+        with self._lock:
+            self._remove(company_id)
+
+    def industries(self) -> list[str]:
+        with self._lock:
+            return sorted({i for meta in self._meta.values() for i in meta["industries"]})
+
+    def search(self, query: str = "", industries: list[str] | None = None, since: str | None = None,
+               min_score: float | None = None, limit: int = 50) -> list[dict]:
+        """
+        [{"company_id", "score", "matched_fields"}], best match first; with
+        an empty query, every company that passes the filters, newest first.
+        `since` is an ISO date compared with `updated_at`.
+        """
+        terms = tokenize(query)
+        with self._lock:
+            candidates = None
+            if industries or since or min_score is not None:
+                candidates = {
+                    company_id for company_id, meta in self._meta.items()
+                    if (not industries or meta["industries"] & set(industries))
+                    and (not since or meta["updated_at"] >= since)
+                    and (min_score is None or (meta["mean_score"] is not None and meta["mean_score"] >= min_score))
+                }
+            if not terms:
+                ids = candidates if candidates is not None else self._meta.keys()
+                newest = sorted(ids, key=lambda company_id: self._meta[company_id]["updated_at"], reverse=True)
+                return [{"company_id": company_id, "score": 0.0, "matched_fields": []} for company_id in newest[:limit]]
+
+            scores = defaultdict(float)
+            for i, term in enumerate(terms):
+                expansions = self._prefix_terms(term) if i == len(terms) - 1 else [term]
+                for expansion in expansions:
+                    self._score_term(expansion, scores, candidates)
+            best = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:limit]
+            return [
+                {"company_id": company_id, "score": round(score, 3), "matched_fields": self._matched(company_id, terms)}
+                for company_id, score in best
+            ]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"documents": len(self._doc_lengths), "terms": len(self._postings)}
+
+    # --- Internals (call with the lock held) ---
+    def _remove(self, company_id: str):
+        terms = self._doc_terms.pop(company_id, None)
+        if terms is None:
+            return
+        for term in terms:
+            postings = self._postings[term]
+            postings.pop(company_id, None)
+            if not postings:
+                del self._postings[term]
+                self._vocabulary_stale = True
+        self._total_length -= self._doc_lengths.pop(company_id)
+        self._meta.pop(company_id, None)
+
+    def _prefix_terms(self, prefix: str) -> list[str]:
+        if prefix in self._postings or len(prefix) < MIN_PREFIX_LENGTH:
+            return [prefix]
+        if self._vocabulary_stale:
+            self._vocabulary = sorted(self._postings)
+            self._vocabulary_stale = False
+        start = bisect.bisect_left(self._vocabulary, prefix)
+        matches = []
+        for term in self._vocabulary[start:]:
+            if not term.startswith(prefix):
+                break
+            matches.append(term)
+        matches.sort(key=lambda term: len(self._postings[term]), reverse=True)
+        return matches[:MAX_PREFIX_TERMS]
+
+    def _score_term(self, term: str, scores: dict, candidates: set | None):
+        postings = self._postings.get(term)
+        if not postings:
+            return
+        documents = len(self._doc_lengths)
+        idf = math.log(1 + (documents - len(postings) + 0.5) / (len(postings) + 0.5))
+        average_length = self._total_length / documents
+        for company_id, frequency in postings.items():
+            if candidates is not None and company_id not in candidates:
+                continue
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * self._doc_lengths[company_id] / average_length)
+            scores[company_id] += idf * frequency * (BM25_K1 + 1) / (frequency + norm)
+
+    def _matched(self, company_id: str, terms: list[str]) -> list[str]:
+        doc_terms = self._doc_terms.get(company_id, {})
+        fields = set()
+        for i, term in enumerate(terms):
+            if i == len(terms) - 1 and term not in doc_terms:
+                # The partly typed last word
+                fields.update(f for t, fs in doc_terms.items() if t.startswith(term) for f in fs)
+            else:
+                fields.update(doc_terms.get(term, ()))
+        return [field for field in FIELD_WEIGHTS if field in fields]
@@ -0,0 +1,275 @@
+# utils/session_memory.py
+"""
+Keeps per-session memory in check on a single instance.
+
+Every page calls `track_session()` on each rerun. That records how many
+bytes the session is holding (its large session_state values plus the
+reports it references in the shared report store) and when it was last
+active. Sessions that sit idle, or the longest-idle sessions when the
+instance goes over SESSION_MEMORY_BUDGET_MB, have their large objects
+spilled to a local disk cache, as long as no script run of theirs is in
+progress. The next time such a session reruns, `track_session()` loads
+them back before the page reads them.
+"""
+import os
+import pickle
+import tempfile
+import threading
+import time
+import weakref
+import streamlit as st
+from streamlit import runtime
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+from utils.app_logging import get_logger, bind_log_context
+from utils.report_store import get_report_store, set_session_report, API_RESPONSE, PRE_QA_BACKUP
+from utils.metrics import get_metrics, current_page
+
+logger = get_logger(__name__)
+
+SESSION_MEMORY_BUDGET_MB = int(st.secrets.get("SESSION_MEMORY_BUDGET_MB", 256))
+SESSION_IDLE_SECONDS = int(st.secrets.get("SESSION_IDLE_SECONDS", 15 * 60))
+SESSION_SPILL_DIR = st.secrets.get(
+    "SESSION_SPILL_DIR", os.path.join(tempfile.gettempdir(), "vc_analyst_sessions")
+)
+# Sessions must be idle at least this long before budget pressure can spill them
+MIN_IDLE_SECONDS = 60
+
+# Large session_state values we can safely move to disk
+SPILLABLE_KEYS = ("chat_history", "qa_questions_list")
+REPORT_SLOTS = (API_RESPONSE, PRE_QA_BACKUP)
+
+
+def _object_size(value) -> int:
+    try:
+        return len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+    except Exception:
+        return 0
+
+
+class SessionMemoryManager:
+    """Tracks session sizes and spills idle sessions to disk."""
+
+    def __init__(self, budget_bytes: int, idle_seconds: int, spill_dir: str):
+        self.budget_bytes = budget_bytes
+        self.idle_seconds = idle_seconds
+        self.spill_dir = spill_dir
+        # session_id -> {"anchor": weakref, "run": weakref to its latest script thread,
+        #                "last_seen", "bytes", "spill_path"}
+        self._sessions = {}
+        self._lock = threading.Lock()
+        os.makedirs(spill_dir, exist_ok=True)
+
+    def touch(self, session_id: str, anchor: "SessionAnchor", size_bytes: int):
+        with self._lock:
+            record = self._sessions.setdefault(session_id, {"spill_path": None})
+            record["anchor"] = weakref.ref(anchor)
+            record["run"] = weakref.ref(threading.current_thread())
+            record["last_seen"] = time.time()
+            record["bytes"] = size_bytes
+
+    def heartbeat(self, session_id: str, active: bool = True):
+        """Records the calling script run, and with `active`, that the analyst is using the session."""
+        with self._lock:
+            record = self._sessions.get(session_id)
+            if record:
+                record["run"] = weakref.ref(threading.current_thread())
+                if active:
+                    record["last_seen"] = time.time()
+
+    def take_spill(self, session_id: str) -> dict | None:
+        """Returns (and removes) a session's spilled objects, if it has any."""
+        with self._lock:
+            record = self._sessions.get(session_id)
+            path = record.get("spill_path") if record else None
+            if not path:
+                return None
+            record["spill_path"] = None
+
+        try:
+            with open(path, "rb") as f:
+                return pickle.load(f)
+        except Exception as e:
+            logger.error(f"Could not rehydrate session {session_id} from {path}: {e}")
+            return None
+        finally:
+            if os.path.exists(path):
+                os.remove(path)
+
+    def sweep(self, current_session_id: str):
+        """Drops dead sessions and spills idle ones until under budget."""
+        now = time.time()
+        with self._lock:
+            for session_id, record in list(self._sessions.items()):
+                if record["anchor"]() is None:
+                    self._forget(session_id)
+
+            in_memory = [
+                (session_id, record) for session_id, record in self._sessions.items()
+                if not record["spill_path"] and session_id != current_session_id
+            ]
+            total = sum(record["bytes"] for record in self._sessions.values() if not record["spill_path"])
+
+            # Longest-idle first
+            for session_id, record in sorted(in_memory, key=lambda item: item[1]["last_seen"]):
+                idle_for = now - record["last_seen"]
+                over_budget = total > self.budget_bytes and idle_for >= MIN_IDLE_SECONDS
+                if idle_for < self.idle_seconds and not over_budget:
+                    continue
+                if self._spill(session_id, record):
+                    total -= record["bytes"]
+
+    def stats(self) -> dict:
+        with self._lock:
+            live = [r for r in self._sessions.values() if not r["spill_path"]]
+            return {
+                "sessions": len(self._sessions),
+                "spilled_sessions": len(self._sessions) - len(live),
+                "in_memory_bytes": sum(r["bytes"] for r in live),
+                "budget_bytes": self.budget_bytes
+            }
+
+    def _spill(self, session_id: str, record: dict) -> bool:
+        # A run that starts after this check blocks in take_spill until the spill is done
+        run = record["run"]()
+        if run is not None and run.is_alive():
+            return False
+        state = _session_state(session_id)
+        if state is None:
+            return False
+
+        store = get_report_store()
+        spilled = {"state": {}, "reports": {}}
+        try:
+            for key in SPILLABLE_KEYS:
+                if key in state:
+                    spilled["state"][key] = state[key]
+            for slot in REPORT_SLOTS:
+                report_key = state[f"{slot}_key"] if f"{slot}_key" in state else None
+                report = store.get(report_key) if report_key else None
+                if report is not None:
+                    spilled["reports"][slot] = report
+
+            if not spilled["state"] and not spilled["reports"]:
+                return False
+
+            path = os.path.join(self.spill_dir, f"{session_id}.pkl")
+            with open(path, "wb") as f:
+                pickle.dump(spilled, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+            # Only drop the in-memory copies once they're safely on disk
+            for key in spilled["state"]:
+                del state[key]
+            for slot in spilled["reports"]:
+                store.unassign(session_id, slot)
+                del state[f"{slot}_key"]
+        except Exception as e:
+            logger.error(f"Could not spill session {session_id}: {e}")
+            return False
+
+        record["spill_path"] = path
+        logger.info(f"Spilled idle session {session_id} ({record['bytes']} bytes) to disk.")
+        return True
+
+    def _forget(self, session_id: str):
+        record = self._sessions.pop(session_id)
+        path = record.get("spill_path")
+        if path and os.path.exists(path):
+            os.remove(path)
+
+
+@st.cache_resource
+def get_session_memory_manager() -> SessionMemoryManager:
+    """The single SessionMemoryManager shared by every session in this process."""
+    manager = SessionMemoryManager(
+        budget_bytes=SESSION_MEMORY_BUDGET_MB * 1024 * 1024,
+        idle_seconds=SESSION_IDLE_SECONDS,
+        spill_dir=SESSION_SPILL_DIR
+    )
+    get_metrics().register_stats("session_memory", manager.stats)
+    return manager
+
+
+def _session_state(session_id: str):
+    """
+    Another session's SessionState, or None if it has gone. Looked up when
+    needed rather than kept: anything in session_state that referred back
+    to the state would keep it alive until the cyclic garbage collector
+    ran. Streamlit has no public way to reach another session.
+    """
+    if not runtime.exists():
+        return None
+    try:
+        info = runtime.get_instance()._session_mgr.get_session_info(session_id)
+    except Exception as e:
+        logger.warning(f"Could not look up session {session_id}: {e}")
+        return None
+    return info.session.session_state if info else None
+
+
+class SessionAnchor:
+    """
+    Kept in session_state, so it lives exactly as long as the session.
+    `ctx.session_state` is a wrapper made for each script run and dropped
+    with it, so weak references and finalizers point here instead. Holds
+    nothing, so it doesn't keep the session alive.
+    """
+
+
+def session_anchor() -> SessionAnchor:
+    anchor = st.session_state.get("_session_anchor")
+    if anchor is None:
+        anchor = st.session_state["_session_anchor"] = SessionAnchor()
+    return anchor
+
+
+def _session_bytes() -> int:
+    store = get_report_store()
+    size = sum(_object_size(st.session_state[key]) for key in SPILLABLE_KEYS if key in st.session_state)
+    for slot in REPORT_SLOTS:
+        report_key = st.session_state.get(f"{slot}_key")
+        if report_key:
+            size += store.size_of(report_key)
+    return size
+
+
+def track_session():
+    """
+    Call at the top of every page. Restores anything this session had
+    spilled to disk, records its current size, and spills other idle
+    sessions if the instance is over budget.
+    """
+    ctx = get_script_run_ctx()
+    if ctx is None:
+        return
+    bind_log_context(company_id=st.session_state.get("current_company_id"))
+    get_metrics().page_runs.inc(page=current_page())
+    manager = get_session_memory_manager()
+
+    spilled = manager.take_spill(ctx.session_id)
+    if spilled:
+        for key, value in spilled["state"].items():
+            st.session_state[key] = value
+        for slot, report in spilled["reports"].items():
+            set_session_report(report, slot)
+        logger.info(f"Rehydrated session {ctx.session_id} from disk.")
+
+    manager.touch(ctx.session_id, session_anchor(), _session_bytes())
+    manager.sweep(ctx.session_id)
+
+
+def keep_session_alive():
+    """Marks this session active; call from long-running loops so it isn't spilled mid-run."""
+    ctx = get_script_run_ctx(suppress_warning=True)
+    if ctx is not None:
+        get_session_memory_manager().heartbeat(ctx.session_id)
+
+
+def track_fragment_run():
+    """
+    Call at the top of fragments that rerun on a timer. Keeps the session
+    from being spilled during the run, but doesn't count as activity, so a
+    tab left open still goes idle.
+    """
+    ctx = get_script_run_ctx(suppress_warning=True)
+    if ctx is not None:
+        get_session_memory_manager().heartbeat(ctx.session_id, active=False)
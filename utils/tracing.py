@@ -0,0 +1,192 @@
+# utils/tracing.py
+"""
+OpenTelemetry-style tracing for the analysis flow.
+
+One trace follows an analysis through every stage it passes: the upload
+on the Run Analysis page, admission and the `/analyze/all` submit, the
+session waiting on the job, the job's time queued and running on the
+backend (as seen by the job worker), saving the report, and rendering it.
+Spans carry `company_id` and `job_id` attributes, and requests to the
+backend carry the W3C `traceparent` header, so backend spans can join the
+same trace.
+
+Spans are recorded with explicit parents rather than an ambient context:
+the stages of one trace run in different threads (the script thread, the
+job worker) and different script runs. The parent of a later stage is
+passed along as a `traceparent` string (on the job record, or in
+session_state).
+
+TRACE_EXPORTER picks where finished spans go: "none" (the default),
+"console" (one log line per span) or "file" (JSON lines in TRACE_FILE).
+`python -m perf.trace_breakdown traces.jsonl` turns a trace file into
+per-stage latency breakdowns.
+"""
+import json
+import os
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+import streamlit as st
+from utils.app_logging import get_logger
+from utils.metrics import get_metrics
+
+logger = get_logger(__name__)
+
+TRACE_EXPORTER = st.secrets.get("TRACE_EXPORTER", "none")  # "none", "console" or "file"
+TRACE_FILE = st.secrets.get("TRACE_FILE", "traces.jsonl")
+
+STATUS_OK = "OK"
+STATUS_ERROR = "ERROR"
+
+
+def parse_traceparent(value: str | None) -> tuple[str, str] | None:
+    """(trace_id, parent span_id) from a `traceparent` header value, or None if it isn't one."""
+    parts = (value or "").split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    return parts[1], parts[2]
+
+
+class Span:
+    """One timed stage of a trace."""
+
+    def __init__(self, tracer: "Tracer", name: str, trace_id: str, parent_id: str | None,
+                 attributes: dict, start_time: float | None = None):
+        self.tracer = tracer
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.attributes = {k: v for k, v in attributes.items() if v is not None}
+        self.start_time = start_time or time.time()
+        self.end_time = None
+        self.status = STATUS_OK
+        self.status_message = None
+
+    @property
+    def traceparent(self) -> str:
+        """This span as a W3C `traceparent` value, for children elsewhere."""
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    def set_attribute(self, key: str, value):
+        if value is not None:
+            self.attributes[key] = value
+
+    def set_error(self, message: str):
+        self.status = STATUS_ERROR
+        self.status_message = message
+
+    def end(self, end_time: float | None = None):
+        """Finishes the span and exports it; later calls do nothing."""
+        if self.end_time is not None:
+            return
+        self.end_time = end_time or time.time()
+        self.tracer.export(self)
+
+    def to_dict(self) -> dict:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_span_id": self.parent_id,
+            "name": self.name,
+            "start_time_unix_nano": int(self.start_time * 1e9),
+            "end_time_unix_nano": int(self.end_time * 1e9),
+            "duration_ms": round((self.end_time - self.start_time) * 1000, 1),
+            "attributes": self.attributes,
+            "status": {"code": self.status, "message": self.status_message}
+        }
+
+
+class ConsoleExporter:
+    def export(self, span: Span):
+        attributes = " ".join(f"{k}={v}" for k, v in span.attributes.items())
+        logger.info(
+            f"span {span.name} {(span.end_time - span.start_time) * 1000:.0f}ms {span.status} "
+            f"trace={span.trace_id} {attributes}"
+        )
+
+
+class FileExporter:
+    """Appends each span to a JSON lines file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def export(self, span: Span):
+        line = json.dumps(span.to_dict(), default=str)
+        try:
+            with self._lock, open(self.path, "a") as f:
+                f.write(line + "\n")
+        except OSError as e:
+            logger.error(f"Could not write span {span.name} to {self.path}: {e}")
+
+
+class Tracer:
+    """Creates spans and hands finished ones to the exporter (if any)."""
+
+    def __init__(self, exporter=None):
+        self.exporter = exporter
+        self.exported = 0
+
+    def start_span(self, name: str, parent: "Span | str | None" = None,
+                   start_time: float | None = None, **attributes) -> Span:
+        """
+        Starts a span; call `end()` on it when the stage is over. `parent`
+        is a Span, a `traceparent` value, or None to start a new trace.
+        """
+        if isinstance(parent, Span):
+            trace_id, parent_id = parent.trace_id, parent.span_id
+        else:
+            trace_id, parent_id = parse_traceparent(parent) or (secrets.token_hex(16), None)
+        return Span(self, name, trace_id, parent_id, attributes, start_time)
+
+    @contextmanager
+    def span(self, name: str, parent: "Span | str | None" = None, **attributes):
+        """A span around a block; exceptions mark it as failed."""
+        current = self.start_span(name, parent, **attributes)
+        try:
+            yield current
+        except Exception as e:
+            current.set_error(f"{type(e).__name__}: {e}")
+            raise
+        finally:
+            # Also ends it when Streamlit stops the script (st.stop, a rerun)
+            current.end()
+
+    def export(self, span: Span):
+        if self.exporter is None:
+            return
+        try:
+            self.exporter.export(span)
+            self.exported += 1
+        except Exception as e:
+            logger.error(f"Could not export span {span.name}: {e}")
+
+    def stats(self) -> dict:
+        return {"exporter": type(self.exporter).__name__ if self.exporter else None, "exported_spans": self.exported}
+
+
+@st.cache_resource
+def get_tracer() -> Tracer:
+    """The single Tracer shared by every session in this process."""
+    if TRACE_EXPORTER == "console":
+        tracer = Tracer(ConsoleExporter())
+    elif TRACE_EXPORTER == "file":
+        logger.info(f"Writing trace spans to {TRACE_FILE}")
+        tracer = Tracer(FileExporter(TRACE_FILE))
+    else:
+        tracer = Tracer()
+    get_metrics().register_stats("tracer", tracer.stats)
+    return tracer
+
+
+def trace_headers(parent: "Span | str | None") -> dict:
+    """The `traceparent` header for a backend request made within `parent`."""
+    if isinstance(parent, Span):
+        return {"traceparent": parent.traceparent}
+    return {"traceparent": parent} if parse_traceparent(parent) else {}
@@ -0,0 +1,434 @@
+# utils/uploads.py
+"""
+Direct-to-storage uploads.
+
+`st.file_uploader` holds every uploaded file in the Streamlit server's
+memory. Instead, the server here only opens a resumable upload session per
+file, and the browser PUTs the bytes straight to Cloud Storage in chunks
+(see components/direct_upload). The Streamlit instance never sees the
+file contents.
+
+The bucket needs a CORS rule allowing PUT from the app's origin and
+exposing the `Range` response header, so the browser can resume uploads.
+
+`LocalResumableBackend` is a stand-in for GCS that keeps objects on local
+disk. It speaks the same session/chunk interface, so `stream_to_storage`
+and the finalize step can be exercised without cloud credentials.
+"""
+import base64
+import hashlib
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+import requests
+import streamlit as st
+import streamlit.components.v1 as components
+from utils.app_logging import get_logger
+from utils.repository import get_repository
+from utils.metrics import get_metrics
+
+logger = get_logger(__name__)
+
+UPLOAD_BACKEND = st.secrets.get("UPLOAD_BACKEND", "gcs")  # "gcs" or "local"
+DIRECT_UPLOADS_ENABLED = str(st.secrets.get("DIRECT_UPLOADS_ENABLED", "true")).lower() == "true"
+LOCAL_UPLOAD_DIR = st.secrets.get(
+    "LOCAL_UPLOAD_DIR", os.path.join(tempfile.gettempdir(), "vc_analyst_uploads")
+)
+# GCS requires every chunk except the last to be a multiple of 256 KiB
+CHUNK_SIZE = 32 * 256 * 1024  # 8 MiB
+
+ALLOWED_EXTENSIONS = ("pdf", "docx", "pptx")
+MAX_DOCUMENT_MB = int(st.secrets.get("MAX_DOCUMENT_MB", 100))
+
+# Background uploads for pipelined submission
+UPLOAD_WORKERS = 4
+DIRECT_UPLOAD_WAIT_SECONDS = 30 * 60
+
+
+def safe_file_name(file_name: str) -> str:
+    """`file_name` without any directories or control characters, so it can't escape the company's folder."""
+    name = re.split(r"[\\/]", file_name)[-1]
+    name = "".join(ch for ch in name if ch.isprintable()).strip(". ")
+    return name or "document"
+
+
+def object_name(company_id: str, file_name: str, folder: str | None = None) -> str:
+    prefix = f"companies/{company_id}/{folder}/" if folder else f"companies/{company_id}/"
+    return prefix + safe_file_name(file_name)
+
+
+def content_md5(fileobj) -> str:
+    """`md5:` and the base64 MD5 of a file's contents: how Cloud Storage identifies an object's contents."""
+    digest = hashlib.md5()
+    for chunk in iter(lambda: fileobj.read(CHUNK_SIZE), b""):
+        digest.update(chunk)
+    return f"md5:{base64.b64encode(digest.digest()).decode()}"
+
+
+def upload_rejection(file: dict) -> str | None:
+    """Why a browser upload (name/size/type) isn't accepted, or None if it is."""
+    extension = file["name"].rsplit(".", 1)[-1].lower() if "." in file["name"] else ""
+    if extension not in ALLOWED_EXTENSIONS:
+        return f"Only {', '.join(ALLOWED_EXTENSIONS)} files can be uploaded."
+    if file["size"] > MAX_DOCUMENT_MB * 1024 * 1024:
+        return f"File is larger than the {MAX_DOCUMENT_MB} MB limit."
+    return None
+
+
+def guess_pitch_deck(file_names: list[str]) -> int:
+    """Index of the file most likely to be the pitch deck (first file if none look like one)."""
+    for index, name in enumerate(file_names):
+        if re.search(r"deck|pitch", name, re.IGNORECASE):
+            return index
+    return 0
+
+
+class GcsResumableBackend:
+    """Resumable upload sessions against the app's Cloud Storage bucket."""
+
+    supports_browser_uploads = True
+
+    def __init__(self, gcs_bucket):
+        self.bucket = gcs_bucket
+
+    def create_session(self, name: str, content_type: str, size: int, origin: str | None = None) -> str:
+        blob = self.bucket.blob(name)
+        return blob.create_resumable_upload_session(content_type=content_type, size=size, origin=origin)
+
+    def upload_chunk(self, session_url: str, data: bytes, offset: int, total: int) -> int:
+        """Sends one chunk and returns how many bytes the server now has."""
+        end = offset + len(data) - 1
+        response = requests.put(
+            session_url,
+            data=data,
+            headers={"Content-Range": f"bytes {offset}-{end}/{total}"},
+            timeout=60
+        )
+        if response.status_code in (200, 201):
+            return total
+        if response.status_code == 308:
+            persisted = response.headers.get("Range")  # e.g. "bytes=0-8388607"
+            return int(persisted.split("-")[1]) + 1 if persisted else 0
+        response.raise_for_status()
+        raise RuntimeError(f"Unexpected upload response: {response.status_code}")
+
+    def download(self, name: str, dest_path: str):
+        self.bucket.blob(name).download_to_filename(dest_path)
+
+    def content_hash(self, name: str) -> str | None:
+        """Storage-computed hash of an object, without downloading it."""
+        blob = self.bucket.get_blob(name)
+        return f"md5:{blob.md5_hash}" if blob is not None and blob.md5_hash else None
+
+    def finalize(self, name: str) -> dict | None:
+        blob = self.bucket.get_blob(name)
+        if blob is None:
+            return None
+        # Make file public (for demo purposes)
+        blob.make_public()
+        return {"url": blob.public_url, "size": blob.size, "content_type": blob.content_type}
+
+
+class LocalResumableBackend:
+    """Fake GCS for tests and offline development: objects live on local disk."""
+
+    supports_browser_uploads = False
+
+    def __init__(self, root_dir: str):
+        self.root_dir = root_dir
+        self._sessions = {}  # session id -> {"name", "content_type", "size"}
+        self._lock = threading.Lock()
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.root_dir, name)
+
+    def create_session(self, name: str, content_type: str, size: int, origin: str | None = None) -> str:
+        session_id = f"local-session://{uuid.uuid4().hex}"
+        path = self._path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        open(path + ".partial", "wb").close()
+        with self._lock:
+            self._sessions[session_id] = {"name": name, "content_type": content_type, "size": size}
+        return session_id
+
+    def upload_chunk(self, session_url: str, data: bytes, offset: int, total: int) -> int:
+        with self._lock:
+            session = self._sessions[session_url]
+        partial = self._path(session["name"]) + ".partial"
+        persisted = os.path.getsize(partial)
+        if offset != persisted:
+            # Same contract as GCS: tell the caller where to resume from
+            return persisted
+        with open(partial, "ab") as f:
+            f.write(data)
+        persisted += len(data)
+        if persisted >= total:
+            os.replace(partial, self._path(session["name"]))
+            with self._lock:
+                self._sessions.pop(session_url, None)
+        return persisted
+
+    def download(self, name: str, dest_path: str):
+        shutil.copyfile(self._path(name), dest_path)
+
+    def content_hash(self, name: str) -> str | None:
+        path = self._path(name)
+        if not os.path.exists(path):
+            return None
+        with open(path, "rb") as f:
+            return content_md5(f)
+
+    def finalize(self, name: str) -> dict | None:
+        path = self._path(name)
+        if not os.path.exists(path):
+            return None
+        return {"url": f"file://{os.path.abspath(path)}", "size": os.path.getsize(path), "content_type": None}
+
+
+@st.cache_resource
+def get_upload_backend():
+    if UPLOAD_BACKEND == "local":
+        logger.info(f"Using local upload backend at {LOCAL_UPLOAD_DIR}")
+        return LocalResumableBackend(LOCAL_UPLOAD_DIR)
+    # Imported here so the local backend doesn't need firebase-admin
+    from utils.firebase_client import get_bucket
+    return GcsResumableBackend(get_bucket())
+
+
+def direct_uploads_available() -> bool:
+    return DIRECT_UPLOADS_ENABLED and get_upload_backend().supports_browser_uploads
+
+
+def stream_to_storage(backend, name: str, fileobj, content_type: str, size: int) -> int:
+    """
+    Copies a file-like object into storage one chunk at a time, resuming from
+    whatever the server reports it already has. Never reads the whole file.
+    """
+    session_url = backend.create_session(name, content_type, size)
+    offset = 0
+    while offset < size:
+        fileobj.seek(offset)
+        chunk = fileobj.read(CHUNK_SIZE)
+        if not chunk:
+            raise IOError(f"Unexpected end of file while uploading {name} at byte {offset}.")
+        offset = backend.upload_chunk(session_url, chunk, offset, size)
+    get_metrics().upload_bytes.inc(offset, source="stream")
+    return offset
+
+
+def _finalize_direct_upload(company_id: str, file: dict) -> str | None:
+    stored = get_upload_backend().finalize(object_name(company_id, file["name"]))
+    if stored is None:
+        return None
+    get_repository().record_document(company_id, file["name"], file["type"], stored["url"])
+    get_metrics().upload_bytes.inc(stored["size"] or 0, source="browser")
+    return stored["url"]
+
+
+def finalize_direct_uploads(company_id: str, files: list[dict]) -> list[str]:
+    """
+    Confirms each browser upload landed, records it under the company's
+    documents and returns the public URLs.
+    """
+    file_urls = []
+    for file in files:
+        file_url = _finalize_direct_upload(company_id, file)
+        if file_url is None:
+            raise FileNotFoundError(f"{file['name']} was not found in storage. Please upload it again.")
+        file_urls.append(file_url)
+    return file_urls
+
+
+# --- Background uploads (for pipelined submission) ---
+@st.cache_resource
+def get_upload_executor() -> ThreadPoolExecutor:
+    return ThreadPoolExecutor(max_workers=UPLOAD_WORKERS, thread_name_prefix="doc-upload")
+
+
+class DirectUploadWatcher:
+    """
+    Watches storage for browser uploads still in flight, on one thread for
+    every session, so waiting on them doesn't hold an upload worker. Each
+    file is checked with a back-off from 2 up to 30 seconds.
+    """
+
+    def __init__(self, wait_seconds: int = DIRECT_UPLOAD_WAIT_SECONDS):
+        self.wait_seconds = wait_seconds
+        self._watches = []  # {"company_id", "file", "future", "deadline", "delay", "next_check_at"}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="direct-upload-watcher", daemon=True)
+        self._thread.start()
+
+    def watch(self, company_id: str, file: dict) -> Future:
+        future = Future()
+        now = time.time()
+        with self._lock:
+            self._watches.append({"company_id": company_id, "file": file, "future": future,
+                                  "deadline": now + self.wait_seconds, "delay": 2, "next_check_at": now})
+        self._wake.set()
+        return future
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"watched_uploads": len(self._watches)}
+
+    def _run(self):
+        while True:
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.error(f"Direct upload watcher tick failed: {e}")
+            with self._lock:
+                next_check_at = min((w["next_check_at"] for w in self._watches), default=None)
+            self._wake.wait(None if next_check_at is None else max(next_check_at - time.time(), 0))
+            self._wake.clear()
+
+    def run_once(self):
+        """Checks every upload that is due; resolves the ones that landed or ran out of time."""
+        now = time.time()
+        with self._lock:
+            due = [w for w in self._watches if w["next_check_at"] <= now]
+        for watch in due:
+            file = watch["file"]
+            try:
+                file_url = _finalize_direct_upload(watch["company_id"], file)
+            except Exception as e:
+                self._resolve(watch, error=e)
+                continue
+            if file_url:
+                self._resolve(watch, result=file_url)
+            elif time.time() >= watch["deadline"]:
+                self._resolve(watch, error=TimeoutError(f"{file['name']} did not finish uploading in time."))
+            else:
+                watch["next_check_at"] = time.time() + watch["delay"]
+                watch["delay"] = min(watch["delay"] * 2, 30)
+
+    def _resolve(self, watch: dict, result: str | None = None, error: Exception | None = None):
+        with self._lock:
+            self._watches.remove(watch)
+        if error is not None:
+            watch["future"].set_exception(error)
+        else:
+            watch["future"].set_result(result)
+
+
+@st.cache_resource
+def get_direct_upload_watcher() -> DirectUploadWatcher:
+    watcher = DirectUploadWatcher()
+    get_metrics().register_stats("direct_upload_watcher", watcher.stats)
+    return watcher
+
+
+def upload_in_background(company_id: str, uploaded_files: list) -> list[Future]:
+    """Starts uploading server-side files; each future resolves to the file's URL."""
+    executor = get_upload_executor()
+    return [executor.submit(get_repository().upload_document, company_id, file) for file in uploaded_files]
+
+
+def await_direct_uploads(company_id: str, files: list[dict]) -> list[Future]:
+    """Watches storage for browser uploads still in flight; each future resolves to the file's URL."""
+    watcher = get_direct_upload_watcher()
+    return [watcher.watch(company_id, file) for file in files]
+
+
+# --- Browser uploader component ---
+_direct_upload_component = components.declare_component(
+    "direct_upload",
+    path=os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "components", "direct_upload")
+)
+
+def _request_origin() -> str | None:
+    origin = st.secrets.get("UPLOAD_ORIGIN")
+    if origin:
+        return origin
+    try:
+        return st.context.headers.get("Origin")
+    except Exception:
+        return None
+
+def _deck_first(files: list[dict], pitch_deck: str | None) -> list[dict]:
+    """`files` with the pitch deck first: the analyst's choice if it's among them, otherwise our guess."""
+    names = [f["name"] for f in files]
+    deck = files[names.index(pitch_deck) if pitch_deck in names else guess_pitch_deck(names)]
+    return [deck] + [f for f in files if f is not deck]
+
+def direct_file_uploader(key: str, quiet: bool = False, pitch_deck: str | None = None) -> dict:
+    """
+    Renders the browser-to-storage uploader. With `quiet`, the browser keeps
+    uploading but stops reporting progress, so it can't trigger a rerun
+    while a long-running submission is in progress. The browser uploads
+    `pitch_deck` (a file name) first, or our guess at it if that isn't one
+    of the selected files; files not yet started follow a later change.
+
+    Files of a type we don't accept, or over MAX_DOCUMENT_MB, get no upload
+    session; the browser's own checks can be bypassed.
+
+    Returns a dict with the reserved `company_id`, the selected `files`
+    (name/size/type), the names of `completed` and `failed` uploads (failed
+    includes the `rejected` ones, which maps names to the reason), and
+    `done` once every selected file has finished one way or the other.
+    """
+    state_key = f"{key}_state"
+    state = st.session_state.setdefault(
+        state_key, {"company_id": None, "selection": None, "sessions": [], "rejected": {}}
+    )
+
+    if state["sessions"]:
+        # Same sessions, reordered if the analyst has since picked another pitch deck
+        state["sessions"] = _deck_first(state["sessions"], pitch_deck)
+
+    value = _direct_upload_component(
+        sessions=state["sessions"],
+        rejected=state["rejected"],
+        quiet=quiet,
+        extensions=[f".{ext}" for ext in ALLOWED_EXTENSIONS],
+        key=key,
+        default=None
+    ) or {}
+
+    files = value.get("files", [])
+    selection = [(f["name"], f["size"]) for f in files]
+    if files and selection != state["selection"]:
+        # A new set of files was picked: open one resumable session per file
+        # and rerun so the component can start sending bytes.
+        if not state["company_id"]:
+            state["company_id"] = get_repository().reserve_company_id()
+        backend = get_upload_backend()
+        origin = _request_origin()
+        rejections = {f["name"]: upload_rejection(f) for f in files}
+        state["rejected"] = {name: reason for name, reason in rejections.items() if reason}
+        accepted = [f for f in files if f["name"] not in state["rejected"]]
+        # The browser uploads in this order, so put the pitch deck first
+        state["sessions"] = [
+            {
+                "name": f["name"],
+                "url": backend.create_session(
+                    object_name(state["company_id"], f["name"]), f["type"], f["size"], origin=origin
+                )
+            }
+            for f in (_deck_first(accepted, pitch_deck) if accepted else [])
+        ]
+        state["selection"] = selection
+        st.rerun()
+
+    completed = value.get("completed", [])
+    failed = list(dict.fromkeys(value.get("failed", []) + list(state["rejected"])))
+    return {
+        "company_id": state["company_id"],
+        "files": files,
+        "completed": completed,
+        "failed": failed,
+        "rejected": state["rejected"],
+        "done": bool(files) and len(completed) + len(failed) == len(files)
+    }
+
+def reset_direct_uploader(key: str):
+    """Forgets the reserved company and sessions after a submission."""
+    st.session_state.pop(f"{key}_state", None)
+    st.session_state.pop(key, None)